@@ -228,6 +228,10 @@ Issues
     socket used by NSS. You cannot pass this socket to any Python
     library function expecting a socket. The two are not compatible.
 
+    To use NSS sockets with asyncio use the nss.aio module, it puts
+    the socket in NSPR non-blocking mode and only waits on the
+    underlying osfd for readiness, all IO is still performed by NSPR.
+
     Here are some reasons for this incompatibility, perhaps in the
     future we can find a solution but the immediate goal of the NSS
     Python binding was to expose NSS through Python, not necessarily
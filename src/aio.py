@@ -0,0 +1,597 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+asyncio support for `nss.io.Socket` and `nss.ssl.SSLSocket`.
+
+The socket methods of the binding block the calling thread. This
+module puts a socket in non-blocking mode (PR_SockOpt_Nonblocking) and
+registers the underlying OS socket (`Socket.fileno()`) with the
+asyncio event loop. Whenever NSPR reports PR_WOULD_BLOCK_ERROR the
+operation waits for the OS socket to become ready and is retried.
+
+Because a socket may be layered (e.g. SSL) the readiness waited for is
+not always the one the caller asked for, a TLS read may first need to
+write handshake data. `Socket.poll_flags()` asks the NSPR layers what
+must be waited for, this module honors it.
+
+`AsyncSocket` provides awaitable connect, accept, recv, sendall and
+handshake operations::
+
+    sock = AsyncSocket(ssl.SSLSocket(net_addr.family))
+    await sock.connect(net_addr)
+    await sock.handshake()
+    await sock.sendall(b'GET / HTTP/1.0\\r\\n\\r\\n')
+    reply = await sock.recv(1024)
+
+`create_connection()` and `start_server()` connect `NSSTransport`
+objects to standard `asyncio.Protocol` objects so asyncio servers and
+clients can terminate TLS with NSS.
+
+A socket handed to this module must only be used through it, and only
+from the thread running the event loop.
+"""
+from __future__ import absolute_import
+
+import asyncio
+import collections
+
+from nss import error, io
+
+__all__ = [
+    'AsyncSocket',
+    'NSSTransport',
+    'Server',
+    'create_connection',
+    'start_server',
+]
+
+# The largest number of buffers passed to one sendv() call.
+_MAX_SENDV_BUFFERS = 16
+
+
+def _would_block(exc):
+    return exc.errno == error.PR_WOULD_BLOCK_ERROR
+
+
+class AsyncSocket(object):
+    """
+    Wrap a `nss.io.Socket` (or `nss.ssl.SSLSocket`) for use with asyncio.
+
+    The socket is switched to non-blocking mode. The underlying NSPR
+    socket is available as the `sock` attribute.
+    """
+
+    def __init__(self, sock, loop=None):
+        sock.set_socket_option(io.PR_SockOpt_Nonblocking, True)
+        self.sock = sock
+        self._loop = loop
+        self._fd = sock.fileno()
+        self._waiters = {io.PR_POLL_READ: [], io.PR_POLL_WRITE: []}
+
+    def __repr__(self):
+        return '<%s fd=%d sock=%r>' % (
+            self.__class__.__name__,
+            self._fd,
+            self.sock,
+        )
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    def fileno(self):
+        return self._fd
+
+    def _wake(self, flag):
+        waiters = self._waiters[flag]
+        self._waiters[flag] = []
+        self._stop_watching(flag)
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(flag)
+
+    def _start_watching(self, flag):
+        if flag == io.PR_POLL_READ:
+            self.loop.add_reader(self._fd, self._wake, flag)
+        else:
+            self.loop.add_writer(self._fd, self._wake, flag)
+
+    def _stop_watching(self, flag):
+        if flag == io.PR_POLL_READ:
+            self.loop.remove_reader(self._fd)
+        else:
+            self.loop.remove_writer(self._fd)
+
+    async def wait(self, in_flags):
+        """
+        Wait until the socket can make progress on in_flags (a bitwise
+        OR of PR_POLL_READ and PR_POLL_WRITE). Returns the PR_POLL_*
+        flag which became ready.
+        """
+        poll_flags, out_flags = self.sock.poll_flags(in_flags)
+        if out_flags:
+            # The layer is already ready, e.g. SSL has buffered data.
+            return out_flags
+        if not poll_flags & (io.PR_POLL_READ | io.PR_POLL_WRITE):
+            poll_flags = in_flags
+
+        waiter = self.loop.create_future()
+        flags = [
+            flag
+            for flag in (io.PR_POLL_READ, io.PR_POLL_WRITE)
+            if poll_flags & flag
+        ]
+        for flag in flags:
+            if not self._waiters[flag]:
+                self._start_watching(flag)
+            self._waiters[flag].append(waiter)
+        try:
+            return await waiter
+        finally:
+            for flag in flags:
+                waiters = self._waiters[flag]
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        self._stop_watching(flag)
+
+    async def _call(self, in_flags, func, *args):
+        while True:
+            try:
+                return func(*args)
+            except error.NSPRError as e:
+                if not _would_block(e):
+                    raise
+            await self.wait(in_flags)
+
+    async def connect(self, addr):
+        """
+        Connect to the `nss.io.NetworkAddress` addr.
+        """
+        try:
+            self.sock.connect(addr)
+            return
+        except error.NSPRError as e:
+            if e.errno != error.PR_IN_PROGRESS_ERROR:
+                raise
+        while True:
+            await self.wait(io.PR_POLL_WRITE)
+            try:
+                self.sock.connect_continue(io.PR_POLL_WRITE)
+                return
+            except error.NSPRError as e:
+                if e.errno != error.PR_IN_PROGRESS_ERROR:
+                    raise
+
+    async def accept(self):
+        """
+        Accept a connection on a listening socket. Returns an
+        (AsyncSocket, NetworkAddress) pair.
+        """
+        sock, addr = await self._call(io.PR_POLL_READ, self.sock.accept)
+        return self.__class__(sock, self._loop), addr
+
+    async def handshake(self):
+        """
+        Perform the SSL handshake of an `nss.ssl.SSLSocket`.
+        """
+        while True:
+            in_flags = self.sock.do_handshake_step()
+            if not in_flags:
+                return
+            await self.wait(in_flags)
+
+    def auth_certificate_complete(self, error=0):
+        """
+        Resume a handshake paused by an auth certificate callback which
+        returned `nss.ssl.SECWouldBlock`, see
+        `nss.ssl.SSLSocket.auth_certificate_complete()`. Must be called
+        from the event loop thread, from another thread use
+        loop.call_soon_threadsafe().
+        """
+        self.sock.auth_certificate_complete(error)
+        # The socket will not become ready on its own, wake handshake().
+        for flag in (io.PR_POLL_READ, io.PR_POLL_WRITE):
+            self._wake(flag)
+
+    async def recv(self, amount):
+        """
+        Receive up to amount bytes. Returns an empty bytes object at EOF.
+        """
+        return await self._call(io.PR_POLL_READ, self.sock.recv, amount)
+
+    async def recv_into(self, buffer, nbytes=0):
+        """
+        Receive up to nbytes (default len(buffer)) into buffer. Returns
+        the number of bytes received, 0 at EOF.
+        """
+        return await self._call(
+            io.PR_POLL_READ, self.sock.recv_into, buffer, nbytes
+        )
+
+    async def sendv(self, buffers):
+        """
+        Send as much of the sequence of buffers as the socket accepts
+        without blocking, waiting if it accepts nothing. Returns the
+        number of bytes sent.
+        """
+        return await self._call(io.PR_POLL_WRITE, self.sock.sendv, buffers)
+
+    async def sendall(self, data):
+        """
+        Send all of data, any object supporting the buffer protocol.
+        """
+        view = memoryview(data).cast('B')
+        sent = 0
+        while sent < len(view):
+            sent += await self.sendv([view[sent:]])
+
+    def shutdown(self, how=io.PR_SHUTDOWN_BOTH):
+        self.sock.shutdown(how)
+
+    def close(self):
+        """
+        Stop watching the socket, cancel pending waits and close it.
+        """
+        for flag, waiters in self._waiters.items():
+            if waiters and self._loop is not None:
+                self._stop_watching(flag)
+            self._waiters[flag] = []
+            for waiter in waiters:
+                waiter.cancel()
+        self.sock.close()
+
+
+class NSSTransport(asyncio.Transport):
+    """
+    An `asyncio.Transport` over an `AsyncSocket`.
+
+    Received data is passed to the protocol's data_received(), an
+    `asyncio.BufferedProtocol` receives directly into the buffer it
+    provides. Writes are queued and sent with sendv() so several small
+    writes go out in one call (and one TLS record).
+    """
+
+    max_size = 256 * 1024
+
+    def __init__(self, asock, protocol, extra=None, server=None):
+        super(NSSTransport, self).__init__(extra)
+        self._extra.setdefault('socket', asock.sock)
+        self._asock = asock
+        self._loop = asock.loop
+        self._protocol = protocol
+        self._buffered = hasattr(protocol, 'get_buffer')
+        self._write_buffer = collections.deque()
+        self._write_size = 0
+        self._high_water = 64 * 1024
+        self._low_water = 16 * 1024
+        self._protocol_paused = False
+        self._closing = False
+        self._eof = False
+        self._closed = False
+        self._reading = asyncio.Event()
+        self._reading.set()
+        self._write_pending = asyncio.Event()
+        self._server = server
+        if server is not None:
+            server._attach(self)
+        self._loop.call_soon(protocol.connection_made, self)
+        self._reader = self._loop.create_task(self._read_loop())
+        self._writer = self._loop.create_task(self._write_loop())
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self._asock)
+
+    async def _read_loop(self):
+        if not self._buffered:
+            buf = bytearray(self.max_size)
+            view = memoryview(buf)
+        try:
+            while True:
+                await self._reading.wait()
+                if self._buffered:
+                    buf = self._protocol.get_buffer(-1)
+                n = await self._asock.recv_into(buf)
+                if n == 0:
+                    if not self._protocol.eof_received():
+                        self.close()
+                    return
+                if self._buffered:
+                    self._protocol.buffer_updated(n)
+                else:
+                    self._protocol.data_received(bytes(view[:n]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._fatal_error(exc)
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._write_pending.wait()
+                while self._write_buffer:
+                    buffers = list(self._write_buffer)[:_MAX_SENDV_BUFFERS]
+                    n = await self._asock.sendv(buffers)
+                    self._consume(n)
+                    self._maybe_resume_protocol()
+                self._write_pending.clear()
+                if self._closing:
+                    self._finish_close(None)
+                    return
+                if self._eof:
+                    self._asock.shutdown(io.PR_SHUTDOWN_SEND)
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._fatal_error(exc)
+
+    def _consume(self, n):
+        self._write_size -= n
+        while n:
+            data = self._write_buffer[0]
+            if len(data) > n:
+                self._write_buffer[0] = data[n:]
+                return
+            n -= len(data)
+            self._write_buffer.popleft()
+
+    def _maybe_pause_protocol(self):
+        if self._write_size > self._high_water and not self._protocol_paused:
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def _maybe_resume_protocol(self):
+        if self._protocol_paused and self._write_size <= self._low_water:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+
+    def _fatal_error(self, exc):
+        self._loop.call_exception_handler(
+            {
+                'message': 'Fatal error on NSS transport',
+                'exception': exc,
+                'transport': self,
+                'protocol': self._protocol,
+            }
+        )
+        self._force_close(exc)
+
+    def _force_close(self, exc):
+        if self._closed:
+            return
+        self._reader.cancel()
+        self._writer.cancel()
+        self._write_buffer.clear()
+        self._write_size = 0
+        self._finish_close(exc)
+
+    def _finish_close(self, exc):
+        if self._closed:
+            return
+        self._closed = True
+        self._closing = True
+        self._reader.cancel()
+        try:
+            self._asock.close()
+        finally:
+            self._loop.call_soon(self._call_connection_lost, exc)
+
+    def _call_connection_lost(self, exc):
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            if self._server is not None:
+                self._server._detach(self)
+                self._server = None
+
+    # BaseTransport
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self._reader.cancel()
+        if self._writer.done():
+            self._finish_close(None)
+        else:
+            self._write_pending.set()
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+        self._buffered = hasattr(protocol, 'get_buffer')
+
+    def get_protocol(self):
+        return self._protocol
+
+    # ReadTransport
+
+    def is_reading(self):
+        return self._reading.is_set() and not self._closing
+
+    def pause_reading(self):
+        self._reading.clear()
+
+    def resume_reading(self):
+        self._reading.set()
+
+    # WriteTransport
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        if high is None:
+            high = 64 * 1024 if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError(
+                'high (%r) must be >= low (%r) must be >= 0' % (high, low)
+            )
+        self._high_water = high
+        self._low_water = low
+        self._maybe_pause_protocol()
+
+    def get_write_buffer_limits(self):
+        return (self._low_water, self._high_water)
+
+    def get_write_buffer_size(self):
+        return self._write_size
+
+    def write(self, data):
+        if self._eof:
+            raise RuntimeError('Cannot call write() after write_eof()')
+        if self._closing:
+            return
+        if not data:
+            return
+        self._write_buffer.append(bytes(data))
+        self._write_size += len(data)
+        self._write_pending.set()
+        self._maybe_pause_protocol()
+
+    def write_eof(self):
+        if self._closing or self._eof:
+            return
+        self._eof = True
+        self._write_pending.set()
+
+    def can_write_eof(self):
+        return True
+
+    def abort(self):
+        self._force_close(None)
+
+
+async def _make_transport(
+    asock, protocol_factory, handshake, extra, server=None
+):
+    if handshake and hasattr(asock.sock, 'force_handshake'):
+        await asock.handshake()
+    protocol = protocol_factory()
+    transport = NSSTransport(asock, protocol, extra, server)
+    return transport, protocol
+
+
+async def create_connection(protocol_factory, sock, addr, handshake=True):
+    """
+    Connect sock (a `nss.io.Socket` or `nss.ssl.SSLSocket`) to the
+    `nss.io.NetworkAddress` addr and attach a protocol created by
+    protocol_factory. For an SSL socket the handshake is completed
+    first unless handshake is False. Returns (transport, protocol).
+    """
+    asock = AsyncSocket(sock)
+    try:
+        await asock.connect(addr)
+        return await _make_transport(
+            asock, protocol_factory, handshake, {'peername': addr}
+        )
+    except BaseException:
+        asock.close()
+        raise
+
+
+class Server(object):
+    """
+    Accepts connections on a listening socket, returned by
+    `start_server()`.
+    """
+
+    def __init__(self, listen_sock, protocol_factory, handshake):
+        self._listener = AsyncSocket(listen_sock)
+        self._protocol_factory = protocol_factory
+        self._handshake = handshake
+        self._connections = set()
+        self._transports = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = asyncio.Event()
+        self._accepting = self._listener.loop.create_task(self._serve())
+
+    @property
+    def sockets(self):
+        if self._closed.is_set():
+            return ()
+        return (self._listener.sock,)
+
+    async def _serve(self):
+        while True:
+            asock, addr = await self._listener.accept()
+            task = self._listener.loop.create_task(
+                self._start_connection(asock, addr)
+            )
+            self._connections.add(task)
+            task.add_done_callback(self._connections.discard)
+
+    async def _start_connection(self, asock, addr):
+        try:
+            await _make_transport(
+                asock,
+                self._protocol_factory,
+                self._handshake,
+                {'peername': addr},
+                self,
+            )
+        except asyncio.CancelledError:
+            asock.close()
+            raise
+        except error.NSPRError:
+            # The client went away or failed the handshake.
+            asock.close()
+
+    def _attach(self, transport):
+        self._transports.add(transport)
+        self._idle.clear()
+
+    def _detach(self, transport):
+        self._transports.discard(transport)
+        if not self._transports:
+            self._idle.set()
+
+    def is_serving(self):
+        return not self._closed.is_set()
+
+    def close(self):
+        """
+        Stop accepting connections, close the listening socket and the
+        established connections.
+        """
+        if self._closed.is_set():
+            return
+        self._accepting.cancel()
+        for task in self._connections:
+            task.cancel()
+        for transport in list(self._transports):
+            transport.close()
+        self._listener.close()
+        self._closed.set()
+
+    async def wait_closed(self):
+        """
+        Wait until the server is closed and the protocols of all its
+        connections got connection_lost().
+        """
+        await self._closed.wait()
+        await self._idle.wait()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+        await self.wait_closed()
+
+
+async def start_server(protocol_factory, listen_sock, handshake=True):
+    """
+    Serve connections accepted on listen_sock, a bound and listening
+    `nss.io.Socket` or `nss.ssl.SSLSocket`. Each connection gets a
+    protocol created by protocol_factory. For an SSL socket the
+    handshake is completed before the protocol is created unless
+    handshake is False. Returns a `Server`.
+    """
+    return Server(listen_sock, protocol_factory, handshake)
@@ -116,6 +116,8 @@ UnicodeOrNoneConvert(PyObject *obj, PyObject **param)
 #define PyInteger_Check(obj) (PyInt_Check(obj) || PyLong_Check(obj))
 #define PyBaseString_Check(obj) (PyString_Check(obj) || PyUnicode_Check(obj))
 
+typedef long Py_hash_t;
+
 /* returns new reference or NULL on error */
 static inline PyObject *
 PyBaseString_UTF8(PyObject *obj, char *name)
@@ -264,6 +266,29 @@ typedef enum RepresentationKindEnum {
 
 #define PyBoolAsPRBool(x) ((x) == Py_True ? PR_TRUE : PR_FALSE)
 
+/*
+ * Buffers smaller than this are processed while holding the GIL, the
+ * cost of releasing and re-acquiring it would exceed the work done.
+ */
+#define GIL_RELEASE_THRESHOLD 8192
+
+/*
+ * Like Py_BEGIN_ALLOW_THREADS/Py_END_ALLOW_THREADS but the GIL is only
+ * released if condition is true. Py_BLOCK_THREADS may not be used
+ * inside the block, use RESTORE_THREADS_IF instead.
+ */
+#define BEGIN_ALLOW_THREADS_IF(condition)               \
+{                                                       \
+    PyThreadState *_save = NULL;                        \
+    if (condition) _save = PyEval_SaveThread();
+
+#define RESTORE_THREADS_IF()                            \
+    if (_save) { PyEval_RestoreThread(_save); _save = NULL; }
+
+#define END_ALLOW_THREADS_IF()                          \
+    RESTORE_THREADS_IF()                                \
+}
+
 #define ASSIGN_REF(dst, obj)                    \
 do {                                            \
     PyObject *tmp;                              \
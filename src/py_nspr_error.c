@@ -193,19 +193,26 @@ set_nspr_error(const char *format, ...)
     }
 
     if ((kwds = PyDict_New()) == NULL) {
+        Py_XDECREF(error_message);
         return NULL;
     }
 
     if (error_message) {
         if (PyDict_SetItemString(kwds, "error_message", error_message) != 0) {
+            Py_DECREF(error_message);
+            Py_DECREF(kwds);
             return NULL;
         }
+        Py_DECREF(error_message);
     }
 
     exception_obj = PyObject_Call((PyObject *)&NSPRErrorType, empty_tuple, kwds);
     Py_DECREF(kwds);
 
-    PyErr_SetObject((PyObject *)&NSPRErrorType, exception_obj);
+    if (exception_obj) {
+        PyErr_SetObject((PyObject *)&NSPRErrorType, exception_obj);
+        Py_DECREF(exception_obj);
+    }
 
     return NULL;
 }
@@ -216,6 +223,7 @@ set_cert_verify_error(unsigned long usages, PyObject *log, const char *format, .
     va_list vargs;
     PyObject *error_message = NULL;
     PyObject *kwds = NULL;
+    PyObject *py_usages = NULL;
     PyObject *exception_obj = NULL;
 
     if (format) {
@@ -229,21 +237,34 @@ set_cert_verify_error(unsigned long usages, PyObject *log, const char *format, .
     }
 
     if ((kwds = PyDict_New()) == NULL) {
+        Py_XDECREF(error_message);
         return NULL;
     }
 
     if (error_message) {
         if (PyDict_SetItemString(kwds, "error_message", error_message) != 0) {
+            Py_DECREF(error_message);
+            Py_DECREF(kwds);
             return NULL;
         }
+        Py_DECREF(error_message);
     }
 
-    if (PyDict_SetItemString(kwds, "usages", PyLong_FromLong(usages)) != 0) {
+    if ((py_usages = PyLong_FromLong(usages)) == NULL) {
+        Py_DECREF(kwds);
         return NULL;
     }
 
+    if (PyDict_SetItemString(kwds, "usages", py_usages) != 0) {
+        Py_DECREF(py_usages);
+        Py_DECREF(kwds);
+        return NULL;
+    }
+    Py_DECREF(py_usages);
+
     if (log) {
         if (PyDict_SetItemString(kwds, "log", log) != 0) {
+            Py_DECREF(kwds);
             return NULL;
         }
     }
@@ -251,7 +272,10 @@ set_cert_verify_error(unsigned long usages, PyObject *log, const char *format, .
     exception_obj = PyObject_Call((PyObject *)&CertVerifyErrorType, empty_tuple, kwds);
     Py_DECREF(kwds);
 
-    PyErr_SetObject((PyObject *)&CertVerifyErrorType, exception_obj);
+    if (exception_obj) {
+        PyErr_SetObject((PyObject *)&CertVerifyErrorType, exception_obj);
+        Py_DECREF(exception_obj);
+    }
 
     return NULL;
 }
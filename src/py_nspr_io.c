@@ -44,6 +44,9 @@ _readline(Socket *self, long size);
 static PyObject *
 _recv(Socket *self, long requested_amount, unsigned int timeout);
 
+static long
+_recv_into(Socket *self, char *dst, long requested_amount, unsigned int timeout);
+
 /* ========================================================================== */
 /* ================================ Utilities =============================== */
 /* ========================================================================== */
@@ -71,6 +74,45 @@ PROsfd PR_FileDesc2NativeHandle(PRFileDesc *);
 #define SOCKETCLOSE close
 #endif
 
+/*
+ * Make room for at least min_space bytes after the buffered data in
+ * the readahead buffer. Already consumed space at the front of the
+ * buffer is reclaimed before growing it. Returns 0 on success, -1
+ * with an exception set on failure.
+ */
+static int
+readahead_reserve(ReadAhead *readahead, long min_space)
+{
+    char *buf;
+    long alloc_len;
+
+    if (readahead->alloc_len - (readahead->offset + readahead->len) >= min_space) {
+        return 0;
+    }
+
+    if (readahead->offset) {
+        memmove(readahead->buf, READAHEAD_DATA(readahead), readahead->len);
+        readahead->offset = 0;
+        if (readahead->alloc_len - readahead->len >= min_space) {
+            return 0;
+        }
+    }
+
+    alloc_len = readahead->alloc_len;
+    while (alloc_len - readahead->len < min_space) {
+        alloc_len += ALLOC_INCREMENT;
+    }
+
+    if ((buf = PyMem_REALLOC(readahead->buf, alloc_len)) == NULL) {
+        FREE_READAHEAD(readahead);
+        PyErr_NoMemory();
+        return -1;
+    }
+    readahead->buf = buf;
+    readahead->alloc_len = alloc_len;
+    return 0;
+}
+
 static PyObject *
 err_closed(void)
 {
@@ -2060,6 +2102,78 @@ Socket_connect(Socket *self, PyObject *args, PyObject *kwds)
     Py_RETURN_NONE;
 }
 
+PyDoc_STRVAR(Socket_connect_continue_doc,
+"connect_continue(out_flags)\n\
+\n\
+:Parameters:\n\
+    out_flags : integer\n\
+        the PR_POLL_* flags reported for the socket by a poll\n\
+\n\
+Complete a connection started by `Socket.connect()` on a non-blocking\n\
+socket, which raises a nss.error.NSPRError with an errno of\n\
+PR_IN_PROGRESS_ERROR. Once a poll reports the socket as writable call\n\
+connect_continue() with the reported flags. If the connection is still\n\
+in progress PR_IN_PROGRESS_ERROR is raised again, if the connection\n\
+failed the reason is raised as a nss.error.NSPRError.\n\
+");
+
+static PyObject *
+Socket_connect_continue(Socket *self, PyObject *args)
+{
+    int out_flags;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "i:connect_continue", &out_flags))
+        return NULL;
+
+    SOCKET_CHECK_OPEN(self);
+
+    if (PR_ConnectContinue(self->pr_socket, out_flags) != PR_SUCCESS) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(Socket_poll_flags_doc,
+"poll_flags(in_flags) -> (poll_flags, out_flags)\n\
+\n\
+:Parameters:\n\
+    in_flags : integer\n\
+        bitwise OR of the PR_POLL_* flags the caller wants to wait for\n\
+\n\
+Ask the socket's NSPR layers which conditions must be polled for on\n\
+the underlying OS socket (see `Socket.fileno()`) to make progress on\n\
+in_flags. A layer may need different conditions than the caller asked\n\
+for, for example an SSL socket in the middle of a handshake may have\n\
+to write before the caller's read can complete. If out_flags is non\n\
+zero the layer is already ready (e.g. decrypted data is buffered) and\n\
+the operation should be retried without waiting.\n\
+\n\
+This is intended for event loops which wait on the OS socket directly\n\
+instead of calling `Socket.poll()`.\n\
+");
+
+static PyObject *
+Socket_poll_flags(Socket *self, PyObject *args)
+{
+    int in_flags;
+    PRInt16 poll_flags;
+    PRInt16 out_flags = 0;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "i:poll_flags", &in_flags))
+        return NULL;
+
+    SOCKET_CHECK_OPEN(self);
+
+    poll_flags = self->pr_socket->methods->poll(self->pr_socket, in_flags, &out_flags);
+
+    return Py_BuildValue("(ii)", poll_flags, out_flags);
+}
+
 PyDoc_STRVAR(Socket_accept_doc,
 "accept(timeout=PR_INTERVAL_NO_TIMEOUT) -> (Socket, NetworkAddress)\n\
 \n\
@@ -2350,6 +2464,10 @@ Socket_close(Socket *self, PyObject *args)
 
     self->makefile_refs = 0;
 
+    if (self->pr_socket == NULL) {
+        Py_RETURN_NONE;
+    }
+
     Py_BEGIN_ALLOW_THREADS
     if (PR_Close(self->pr_socket) != PR_SUCCESS) {
         Py_BLOCK_THREADS
@@ -2405,7 +2523,7 @@ static PyObject *
 _readline(Socket *self, long size)
 {
     unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
-    long read_len, space_available, amount_read, line_len, tail_len;
+    long read_len, amount_read, line_len;
     PyObject *line = NULL;
 
     SOCKET_CHECK_OPEN(self);
@@ -2416,7 +2534,7 @@ _readline(Socket *self, long size)
             char *p, *beg, *end;
             /* Set the beginning and ending pointers which defines the
              * region inside of which a newline will be searched for. */
-            beg = self->readahead.buf;
+            beg = READAHEAD_DATA(&self->readahead);
             if (size > 0) {
                 end = beg + MIN(size, self->readahead.len);
             } else {
@@ -2437,20 +2555,14 @@ _readline(Socket *self, long size)
         }
     more_data:
         /* Need more data, try to read at least an ALLOC_INCREMENT chunk */
-        space_available = self->readahead.alloc_len - self->readahead.len;
-        if (space_available < ALLOC_INCREMENT) {
-            self->readahead.alloc_len += ALLOC_INCREMENT;
-            if ((self->readahead.buf = realloc(self->readahead.buf, self->readahead.alloc_len)) == NULL) {
-                /* ERROR */
-                FREE_READAHEAD(&self->readahead);
-                return PyErr_NoMemory();
-            }
+        if (readahead_reserve(&self->readahead, ALLOC_INCREMENT) < 0) {
+            return NULL;
         }
-        read_len = self->readahead.alloc_len - self->readahead.len;
+        read_len = self->readahead.alloc_len - (self->readahead.offset + self->readahead.len);
 
         Py_BEGIN_ALLOW_THREADS
         amount_read = PR_Recv(self->pr_socket,
-                              self->readahead.buf + self->readahead.len,
+                              READAHEAD_DATA(&self->readahead) + self->readahead.len,
                               read_len, 0, timeout);
         Py_END_ALLOW_THREADS
 
@@ -2466,14 +2578,11 @@ _readline(Socket *self, long size)
     }
     assert(0);                  /* should never reach here */
  return_line:
-    if ((line = PyBytes_FromStringAndSize(self->readahead.buf, line_len)) == NULL) {
+    if ((line = PyBytes_FromStringAndSize(READAHEAD_DATA(&self->readahead), line_len)) == NULL) {
         return NULL;
     }
-    memmove(PyBytes_AsString(line), self->readahead.buf, line_len);
     /* Subtract the data being returned from the cached readahead buffer */
-    tail_len = self->readahead.len - line_len;
-    memmove(self->readahead.buf, self->readahead.buf + line_len, tail_len);
-    self->readahead.len = tail_len;
+    CONSUME_READAHEAD(&self->readahead, line_len);
     return line;
 }
 
@@ -2592,41 +2701,66 @@ static PyObject *
 _recv(Socket *self, long requested_amount, unsigned int timeout)
 {
     PyObject *py_buf = NULL;
-    long read_len, amount_read, result_len, tail_len;
-    char *dst = NULL;
+    long result_len;
 
     SOCKET_CHECK_OPEN(self);
 
-    result_len = 0;
-    read_len = requested_amount;
+    /* Satisfied entirely from the readahead buffer? Copy just the data. */
+    if (self->readahead.len >= requested_amount) {
+        py_buf = PyBytes_FromStringAndSize(READAHEAD_DATA(&self->readahead), requested_amount);
+        if (py_buf != NULL) {
+            CONSUME_READAHEAD(&self->readahead, requested_amount);
+        }
+        return py_buf;
+    }
+
     if ((py_buf = PyBytes_FromStringAndSize(NULL, requested_amount)) == NULL) {
         return NULL;
     }
 
-    dst = PyBytes_AsString(py_buf);
+    if ((result_len = _recv_into(self, PyBytes_AS_STRING(py_buf),
+                                 requested_amount, timeout)) < 0) {
+        Py_DECREF(py_buf);
+        return NULL;
+    }
+
+    if (result_len != requested_amount) {
+        if (_PyBytes_Resize(&py_buf, result_len) < 0) {
+            return NULL;
+	}
+    }
+    return py_buf;
+}
+
+/*
+ * Receive up to requested_amount bytes into dst, first draining the
+ * readahead buffer. Returns the number of bytes stored in dst (0 at
+ * EOF) or -1 with an exception set on error.
+ */
+static long
+_recv_into(Socket *self, char *dst, long requested_amount, unsigned int timeout)
+{
+    long read_len, amount_read, result_len;
+
+    result_len = 0;
+    read_len = requested_amount;
 
     /* Is the read request already buffered? */
     if (self->readahead.len) {
         if (self->readahead.len >= requested_amount) {
             /* Yes, the readahead buffer satisfies the request */
-            result_len = requested_amount;
-            memmove(dst, self->readahead.buf, result_len);
-            if (self->readahead.len == result_len) {
-                FREE_READAHEAD(&self->readahead);
-            } else {
-                tail_len = self->readahead.len - result_len;
-                memmove(self->readahead.buf, self->readahead.buf + result_len, tail_len);
-                self->readahead.len = tail_len;
-            }
-            return py_buf;
+            memcpy(dst, READAHEAD_DATA(&self->readahead), requested_amount);
+            CONSUME_READAHEAD(&self->readahead, requested_amount);
+            return requested_amount;
         }
 
-        /* We'll completly empty the read ahead buffer satisfying this request so malloc
-         * the result string now, copy the read ahead portion into it and then free the
-         * read ahead. By eschewing the read ahead until it's needed again saves us an
-         * extra buffer copy on each subsequent read until it's needed again. */
+        /* We'll completly empty the read ahead buffer satisfying
+         * this request, copy the read ahead portion into dst and
+         * free the read ahead. By eschewing the read ahead until it's
+         * needed again saves us an extra buffer copy on each
+         * subsequent read until it's needed again. */
 
-        memmove(dst, self->readahead.buf, self->readahead.len);
+        memcpy(dst, READAHEAD_DATA(&self->readahead), self->readahead.len);
         dst += self->readahead.len;
         result_len += self->readahead.len;
         read_len = requested_amount - self->readahead.len;
@@ -2639,22 +2773,113 @@ _recv(Socket *self, long requested_amount, unsigned int timeout)
     Py_END_ALLOW_THREADS
 
     if (amount_read < 0) {
-        Py_DECREF(py_buf);
+        /* Report the bytes taken from the readahead buffer, they are no
+         * longer buffered. A persistent error is raised by the next
+         * call. */
+        if (result_len > 0) {
+            return result_len;
+        }
         FREE_READAHEAD(&self->readahead);
-        return set_nspr_error(NULL);
+        set_nspr_error(NULL);
+        return -1;
+    }
+
+    return result_len + amount_read;
+}
+
+PyDoc_STRVAR(Socket_recv_into_doc,
+"recv_into(buffer, nbytes=0, timeout=PR_INTERVAL_NO_TIMEOUT) -> int\n\
+\n\
+:Parameters:\n\
+    buffer : writable buffer object (e.g. bytearray or memoryview)\n\
+        buffer the received data is stored in\n\
+    nbytes : integer\n\
+        the maximum number of bytes to receive, if 0 the size of buffer\n\
+    timeout : integer\n\
+        optional timeout value expressed as a NSPR interval\n\
+\n\
+Like `Socket.recv()` but the data is stored directly into buffer\n\
+instead of a new bytes object. Returns the number of bytes received,\n\
+0 indicates the network connection is closed.\n\
+");
+
+static PyObject *
+Socket_recv_into(Socket *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"buffer", "nbytes", "timeout", NULL};
+    Py_buffer buffer;
+    long requested_amount = 0;
+    unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
+    long result_len;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "w*|lI:recv_into", kwlist,
+                                     &buffer, &requested_amount, &timeout))
+        return NULL;
+
+    if (requested_amount < 0 || requested_amount > buffer.len) {
+        PyErr_Format(PyExc_ValueError, "nbytes must be between 0 and the buffer size (%zd), not %ld",
+                     buffer.len, requested_amount);
+        PyBuffer_Release(&buffer);
+        return NULL;
     }
-    if (amount_read == 0) {
-        /* EOF */
+
+    if (requested_amount == 0) {
+        requested_amount = buffer.len;
     }
 
-    result_len += amount_read;
+    if (self->pr_socket == NULL) {
+        PyBuffer_Release(&buffer);
+        return err_closed();
+    }
 
-    if (result_len != requested_amount) {
-        if (_PyBytes_Resize(&py_buf, result_len) < 0) {
-            return NULL;
-	}
+    result_len = _recv_into(self, buffer.buf, requested_amount, timeout);
+    PyBuffer_Release(&buffer);
+
+    if (result_len < 0) {
+        return NULL;
     }
-    return py_buf;
+
+    return PyLong_FromLong(result_len);
+}
+
+PyDoc_STRVAR(Socket_readinto_doc,
+"readinto(buffer) -> int\n\
+\n\
+:Parameters:\n\
+    buffer : writable buffer object (e.g. bytearray or memoryview)\n\
+        buffer the data is stored in\n\
+\n\
+Read up to len(buffer) bytes into buffer, see `Socket.read()`.\n\
+Returns the number of bytes read, 0 indicates the network connection\n\
+is closed.\n\
+");
+
+static PyObject *
+Socket_readinto(Socket *self, PyObject *args)
+{
+    Py_buffer buffer;
+    long result_len;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "w*:readinto", &buffer))
+        return NULL;
+
+    if (self->pr_socket == NULL) {
+        PyBuffer_Release(&buffer);
+        return err_closed();
+    }
+
+    result_len = _recv_into(self, buffer.buf, buffer.len, PR_INTERVAL_NO_TIMEOUT);
+    PyBuffer_Release(&buffer);
+
+    if (result_len < 0) {
+        return NULL;
+    }
+
+    return PyLong_FromLong(result_len);
 }
 
 PyDoc_STRVAR(Socket_read_doc,
@@ -2676,7 +2901,7 @@ Socket_read(Socket *self, PyObject *args, PyObject *kwds)
     long requested_amount = -1;
     unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
     PyObject *py_buf = NULL;
-    long read_len, space_available, amount_read;
+    long read_len, amount_read;
 
     TraceMethodEnter(self);
 
@@ -2692,20 +2917,14 @@ Socket_read(Socket *self, PyObject *args, PyObject *kwds)
 
     /* Otherwise read until EOF */
     do {
-        read_len = ALLOC_INCREMENT;
-        space_available = self->readahead.alloc_len - self->readahead.len;
-        if (space_available < read_len) {
-            self->readahead.alloc_len += ALLOC_INCREMENT;
-            if ((self->readahead.buf = PyMem_REALLOC(self->readahead.buf, self->readahead.alloc_len)) == NULL) {
-                FREE_READAHEAD(&self->readahead);
-                return PyErr_NoMemory();
-            }
+        if (readahead_reserve(&self->readahead, ALLOC_INCREMENT) < 0) {
+            return NULL;
         }
-        read_len = self->readahead.alloc_len - self->readahead.len;
+        read_len = self->readahead.alloc_len - (self->readahead.offset + self->readahead.len);
 
         Py_BEGIN_ALLOW_THREADS
         amount_read = PR_Recv(self->pr_socket,
-                              self->readahead.buf + self->readahead.len,
+                              READAHEAD_DATA(&self->readahead) + self->readahead.len,
                               read_len, 0, timeout);
         Py_END_ALLOW_THREADS
 
@@ -2723,7 +2942,7 @@ Socket_read(Socket *self, PyObject *args, PyObject *kwds)
 
     } while (amount_read != 0);
 
-    if ((py_buf = PyBytes_FromStringAndSize(self->readahead.buf, self->readahead.len)) == NULL) {
+    if ((py_buf = PyBytes_FromStringAndSize(READAHEAD_DATA(&self->readahead), self->readahead.len)) == NULL) {
         return NULL;
     }
 
@@ -2900,137 +3119,459 @@ Socket_sendall(Socket *self, PyObject *args, PyObject *kwds)
     return PyLong_FromLong(amount);
 }
 
-PyDoc_STRVAR(Socket_send_to_doc,
-"send_to(buf, addr, timeout=PR_INTERVAL_NO_TIMEOUT) -> amount\n\
+PyDoc_STRVAR(Socket_sendv_doc,
+"sendv(buffers, timeout=PR_INTERVAL_NO_TIMEOUT) -> amount\n\
 \n\
 :Parameters:\n\
-    buf : buffer\n\
-        a buffer of data to transmit\n\
-    addr : NetworkAddress object\n\
-        a NetworkAddress object to send to\n\
+    buffers : sequence of buffer objects\n\
+        the buffers of data to transmit, in order\n\
     timeout : integer\n\
         optional timeout value expressed as a NSPR interval\n\
 \n\
-Socket.send_to() blocks until all bytes are sent (unless the socket is in\n\
+Transmit the concatenation of the buffers in a single gather write\n\
+(PR_Writev) without first joining them into one string. Any object\n\
+supporting the buffer protocol (bytes, bytearray, memoryview, ...)\n\
+may be used.\n\
+\n\
+On an SSL socket NSS coalesces small buffers into full size TLS\n\
+records, so for example a response header and body are sent together\n\
+rather than as two separate records.\n\
+\n\
+Socket.sendv() blocks until all bytes are sent (unless the socket is in\n\
 non-blocking mode), a timeout occurs, or an error occurs. In the case\n\
-of a timeout or an error then a nss.error.NSPRError will be raised.\n\
+of a timeout or an error before any data was sent a\n\
+nss.error.NSPRError will be raised.\n\
 \n\
 The function returns the number of bytes actually transmitted.\n\
-\n\
-Note: Socket.send_to() is usually used with a UDP socket.\n\
 ");
 
 static PyObject *
-Socket_send_to(Socket *self, PyObject *args, PyObject *kwds)
+Socket_sendv(Socket *self, PyObject *args, PyObject *kwds)
 {
-    static char *kwlist[] = {"buf", "addr", "timeout", NULL};
-    char *buf = NULL;
-    Py_ssize_t len = 0;
-    NetworkAddress *py_netaddr = NULL;
+    static char *kwlist[] = {"buffers", "timeout", NULL};
+    PyObject *py_buffers = NULL;
+    PyObject *py_seq = NULL;
     unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
-    int amount;
+    Py_ssize_t n_buffers, n_acquired, i, j;
+    Py_buffer *buffers = NULL;
+    PRIOVec iov[PR_MAX_IOVECTOR_SIZE];
+    PRInt32 iov_size, iov_total, amount;
+    long total = 0;
+    PRErrorCode error = 0;
+    PyObject *result = NULL;
 
     TraceMethodEnter(self);
 
-#if PY_MAJOR_VERSION >= 3
-    // Py3 uses y# for bytes parameter
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "y#O!|I:send_to", kwlist,
-                                     &buf, &len, &NetworkAddressType, &py_netaddr, &timeout))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|I:sendv", kwlist,
+                                     &py_buffers, &timeout))
         return NULL;
-#else
-    // Py2 uses s# for string parameter
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "s#O!|I:send_to", kwlist,
-                                     &buf, &len, &NetworkAddressType, &py_netaddr, &timeout))
-        return NULL;
-#endif
-
-    SOCKET_CHECK_FAMILY(py_netaddr);
 
-    ASSIGN_REF(self->py_netaddr, py_netaddr);
+    SOCKET_CHECK_OPEN(self);
 
-    Py_BEGIN_ALLOW_THREADS
-    amount = PR_SendTo(self->pr_socket, buf, len, 0, &py_netaddr->pr_netaddr, timeout);
-    Py_END_ALLOW_THREADS
+    if ((py_seq = PySequence_Fast(py_buffers, "buffers must be a sequence")) == NULL) {
+        return NULL;
+    }
 
-    if (amount < 0) {
-        return set_nspr_error(NULL);
+    n_buffers = PySequence_Fast_GET_SIZE(py_seq);
+    if ((buffers = PyMem_New(Py_buffer, n_buffers)) == NULL) {
+        Py_DECREF(py_seq);
+        return PyErr_NoMemory();
     }
 
-    return PyLong_FromLong(amount);
-}
+    for (n_acquired = 0; n_acquired < n_buffers; n_acquired++) {
+        if (PyObject_GetBuffer(PySequence_Fast_GET_ITEM(py_seq, n_acquired),
+                               &buffers[n_acquired], PyBUF_SIMPLE) < 0) {
+            goto exit;
+        }
+        if (buffers[n_acquired].len > PR_INT32_MAX) {
+            PyErr_Format(PyExc_OverflowError, "buffer %zd is too large (%zd bytes)",
+                         n_acquired, buffers[n_acquired].len);
+            n_acquired++;
+            goto exit;
+        }
+    }
 
-PyDoc_STRVAR(Socket_get_sock_name_doc,
-"get_sock_name() -> NetworkAddress\n\
-\n\
-Return the network address for this socket.\n\
-");
+    Py_BEGIN_ALLOW_THREADS
+    i = 0;
+    while (i < n_buffers) {
+        /* Gather as many buffers as PR_Writev accepts in one call */
+        for (iov_size = 0, iov_total = 0;
+             i < n_buffers && iov_size < PR_MAX_IOVECTOR_SIZE &&
+             buffers[i].len <= PR_INT32_MAX - iov_total;
+             i++) {
+            if (buffers[i].len == 0) {
+                continue;
+            }
+            iov[iov_size].iov_base = buffers[i].buf;
+            iov[iov_size].iov_len = buffers[i].len;
+            iov_total += buffers[i].len;
+            iov_size++;
+        }
 
-static PyObject *
-Socket_get_sock_name(Socket *self, PyObject *args)
-{
-    PRNetAddr pr_netaddr;
-    PyObject *py_netaddr = NULL;
+        if (iov_size == 0) {
+            continue;
+        }
 
-    Py_BEGIN_ALLOW_THREADS
-    if (PR_GetSockName(self->pr_socket, &pr_netaddr) != PR_SUCCESS) {
-        Py_BLOCK_THREADS
-        return set_nspr_error(NULL);
+        if ((amount = PR_Writev(self->pr_socket, iov, iov_size, timeout)) < 0) {
+            error = PR_GetError();
+            break;
+        }
+        total += amount;
+        if (amount < iov_total) {
+            break;
+        }
     }
     Py_END_ALLOW_THREADS
 
-    if ((py_netaddr = NetworkAddress_new_from_PRNetAddr(&pr_netaddr)) == NULL) {
-        return NULL;
+    if (error && total == 0) {
+        PR_SetError(error, 0);
+        set_nspr_error(NULL);
+    } else {
+        result = PyLong_FromLong(total);
     }
 
-    return py_netaddr;
-}
-
-PyDoc_STRVAR(Socket_get_peer_name_doc,
-"get_peer_name() -> NetworkAddress\n\
-\n\
-Return the network address for the connected peer socket.\n\
-");
-
-static PyObject *
-Socket_get_peer_name(Socket *self, PyObject *args)
-{
-    PRNetAddr pr_netaddr;
-    PyObject *py_netaddr = NULL;
-
-    if (PR_GetPeerName(self->pr_socket, &pr_netaddr) != PR_SUCCESS)
-        return set_nspr_error(NULL);
-    if ((py_netaddr = NetworkAddress_new_from_PRNetAddr(&pr_netaddr)) == NULL) {
-        return NULL;
+ exit:
+    for (j = 0; j < n_acquired; j++) {
+        PyBuffer_Release(&buffers[j]);
     }
+    PyMem_Free(buffers);
+    Py_DECREF(py_seq);
 
-    return py_netaddr;
+    return result;
 }
 
-PyDoc_STRVAR(Socket_fileno_doc,
-"fileno() -> integer\n\
+PyDoc_STRVAR(Socket_sendfile_doc,
+"sendfile(file, offset=0, count=None, headers=b'', trailers=b'', timeout=PR_INTERVAL_NO_TIMEOUT) -> amount\n\
 \n\
-Return the integer file descriptor of the socket.\n\
+:Parameters:\n\
+    file : file object or integer file descriptor\n\
+        the file whose contents are transmitted, a file object must\n\
+        have a fileno() method\n\
+    offset : integer\n\
+        the file position at which to start sending\n\
+    count : integer or None\n\
+        the number of bytes of file data to send, if None send until\n\
+        the end of the file is reached\n\
+    headers : buffer\n\
+        data sent before the file data\n\
+    trailers : buffer\n\
+        data sent after the file data\n\
+    timeout : integer\n\
+        optional timeout value expressed as a NSPR interval\n\
+\n\
+Transmit the contents of a file without reading it into Python\n\
+objects first. For a plain TCP socket PR_SendFile is used which lets\n\
+the kernel copy the file data directly to the socket. For a layered\n\
+socket (e.g. SSLSocket) the file is memory mapped (or read in large\n\
+chunks) and written through the socket's layers. In both cases the\n\
+GIL is released for the whole transfer.\n\
+\n\
+The position of a file object is left at the end of the data sent.\n\
+Because NSPR limits file offsets and transfer sizes to 32 bits offset\n\
+must be less than 4GB and the total amount sent less than 2GB,\n\
+otherwise OverflowError is raised. With count=None the file size\n\
+is checked before anything is sent.\n\
+\n\
+The function returns the number of bytes actually transmitted,\n\
+including the headers and trailers.\n\
 ");
 
 static PyObject *
-Socket_fileno(Socket *self)
+Socket_sendfile(Socket *self, PyObject *args, PyObject *kwds)
 {
-    PROsfd sock_fd = -1;
+    static char *kwlist[] = {"file", "offset", "count", "headers", "trailers", "timeout", NULL};
+    PyObject *py_file = NULL;
+    PyObject *py_count = Py_None;
+    PY_LONG_LONG offset = 0;
+    PY_LONG_LONG count = 0;
+    Py_buffer headers = {0};
+    Py_buffer trailers = {0};
+    unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
+    PRSendFileData send_data;
+    PRFileDesc *pr_file = NULL;
+    PRFileInfo64 file_info;
+    PRInt32 amount;
+    int fd, file_fd;
+    PyObject *result = NULL;
+    PyObject *py_ret = NULL;
 
-    if ((sock_fd = PR_FileDesc2NativeHandle(self->pr_socket)) == -1) {
-        return set_nspr_error(NULL);
-    }
+    TraceMethodEnter(self);
 
-#if SIZEOF_SOCKET_T <= SIZEOF_LONG
-    return PyLong_FromLong((long)sock_fd);
+#if PY_MAJOR_VERSION >= 3
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|LOy*y*I:sendfile", kwlist,
+                                     &py_file, &offset, &py_count,
+                                     &headers, &trailers, &timeout))
+        return NULL;
 #else
-    return PyLong_FromLongLong((PY_LONG_LONG)sock_fd);
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|LOs*s*I:sendfile", kwlist,
+                                     &py_file, &offset, &py_count,
+                                     &headers, &trailers, &timeout))
+        return NULL;
 #endif
-}
 
-PyDoc_STRVAR(Socket_makefile_doc,
-"makefile([mode[, buffersize]]) -> file object\n\
-\n\
+    if (self->pr_socket == NULL) {
+        err_closed();
+        goto exit;
+    }
+
+    if (offset < 0 || offset > PR_UINT32_MAX) {
+        PyErr_Format(PyExc_OverflowError, "offset must be between 0 and %u, not %lld",
+                     PR_UINT32_MAX, offset);
+        goto exit;
+    }
+
+    if (py_count != Py_None) {
+        if ((count = PyLong_AsLongLong(py_count)) == -1 && PyErr_Occurred()) {
+            goto exit;
+        }
+        if (count < 0) {
+            PyErr_Format(PyExc_ValueError, "count must not be negative, not %lld", count);
+            goto exit;
+        }
+    }
+
+    if ((fd = PyObject_AsFileDescriptor(py_file)) < 0) {
+        goto exit;
+    }
+
+#ifdef NO_DUP
+    PyErr_SetString(PyExc_NotImplementedError, "sendfile is not supported on this platform");
+    goto exit;
+#else
+    /* PR_Close on the imported descriptor must not close the caller's file */
+    if ((file_fd = dup(fd)) < 0) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto exit;
+    }
+    if ((pr_file = PR_ImportFile(file_fd)) == NULL) {
+        close(file_fd);
+        set_nspr_error(NULL);
+        goto exit;
+    }
+#endif
+
+    if (py_count == Py_None) {
+        /* Everything from offset to the end of the file is sent */
+        if (PR_GetOpenFileInfo64(pr_file, &file_info) != PR_SUCCESS) {
+            set_nspr_error(NULL);
+            goto exit;
+        }
+        count = MAX(file_info.size - offset, 0);
+    }
+
+    if (count + headers.len + trailers.len > PR_INT32_MAX) {
+        PyErr_Format(PyExc_OverflowError, "cannot send more than %d bytes in one call",
+                     PR_INT32_MAX);
+        goto exit;
+    }
+
+    send_data.fd = pr_file;
+    send_data.file_offset = (PRUint32)offset;
+    send_data.file_nbytes = py_count == Py_None ? 0 : (PRSize)count;
+    send_data.header = headers.buf;
+    send_data.hlen = headers.len;
+    send_data.trailer = trailers.buf;
+    send_data.tlen = trailers.len;
+
+    if (py_count != Py_None && count == 0) {
+        /* A file_nbytes of 0 means send to the end of the file */
+        send_data.fd = NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    if (send_data.fd == NULL) {
+        PRIOVec iov[2];
+        PRInt32 iov_size = 0;
+
+        if (send_data.hlen) {
+            iov[iov_size].iov_base = (char *)send_data.header;
+            iov[iov_size++].iov_len = send_data.hlen;
+        }
+        if (send_data.tlen) {
+            iov[iov_size].iov_base = (char *)send_data.trailer;
+            iov[iov_size++].iov_len = send_data.tlen;
+        }
+        amount = iov_size ? PR_Writev(self->pr_socket, iov, iov_size, timeout) : 0;
+    } else if (PR_GetLayersIdentity(self->pr_socket) == PR_NSPR_IO_LAYER) {
+        amount = PR_SendFile(self->pr_socket, &send_data,
+                             PR_TRANSMITFILE_KEEP_OPEN, timeout);
+        /* e.g. a socket pair is not a real TCP socket, nothing was sent */
+        if (amount < 0 && PR_GetError() == PR_NOT_TCP_SOCKET_ERROR) {
+            amount = PR_EmulateSendFile(self->pr_socket, &send_data,
+                                        PR_TRANSMITFILE_KEEP_OPEN, timeout);
+        }
+    } else {
+        /* Every byte must pass through the upper layers (e.g. be
+         * encrypted by SSL), never hand the file to the kernel. */
+        amount = PR_EmulateSendFile(self->pr_socket, &send_data,
+                                    PR_TRANSMITFILE_KEEP_OPEN, timeout);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (amount < 0) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    /* Leave a file object positioned after the data sent, as a read would */
+    if (!PyLong_Check(py_file) && PyObject_HasAttrString(py_file, "seek")) {
+        PY_LONG_LONG file_amount = amount - headers.len - trailers.len;
+
+        if (file_amount < 0) {
+            file_amount = 0;
+        }
+        if ((py_ret = PyObject_CallMethod(py_file, "seek", "L", offset + file_amount)) == NULL) {
+            goto exit;
+        }
+        Py_DECREF(py_ret);
+    }
+
+    result = PyLong_FromLong(amount);
+
+ exit:
+    if (pr_file) {
+        PR_Close(pr_file);
+    }
+    if (headers.obj) {
+        PyBuffer_Release(&headers);
+    }
+    if (trailers.obj) {
+        PyBuffer_Release(&trailers);
+    }
+    return result;
+}
+
+PyDoc_STRVAR(Socket_send_to_doc,
+"send_to(buf, addr, timeout=PR_INTERVAL_NO_TIMEOUT) -> amount\n\
+\n\
+:Parameters:\n\
+    buf : buffer\n\
+        a buffer of data to transmit\n\
+    addr : NetworkAddress object\n\
+        a NetworkAddress object to send to\n\
+    timeout : integer\n\
+        optional timeout value expressed as a NSPR interval\n\
+\n\
+Socket.send_to() blocks until all bytes are sent (unless the socket is in\n\
+non-blocking mode), a timeout occurs, or an error occurs. In the case\n\
+of a timeout or an error then a nss.error.NSPRError will be raised.\n\
+\n\
+The function returns the number of bytes actually transmitted.\n\
+\n\
+Note: Socket.send_to() is usually used with a UDP socket.\n\
+");
+
+static PyObject *
+Socket_send_to(Socket *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"buf", "addr", "timeout", NULL};
+    char *buf = NULL;
+    Py_ssize_t len = 0;
+    NetworkAddress *py_netaddr = NULL;
+    unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
+    int amount;
+
+    TraceMethodEnter(self);
+
+#if PY_MAJOR_VERSION >= 3
+    // Py3 uses y# for bytes parameter
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "y#O!|I:send_to", kwlist,
+                                     &buf, &len, &NetworkAddressType, &py_netaddr, &timeout))
+        return NULL;
+#else
+    // Py2 uses s# for string parameter
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "s#O!|I:send_to", kwlist,
+                                     &buf, &len, &NetworkAddressType, &py_netaddr, &timeout))
+        return NULL;
+#endif
+
+    SOCKET_CHECK_FAMILY(py_netaddr);
+
+    ASSIGN_REF(self->py_netaddr, py_netaddr);
+
+    Py_BEGIN_ALLOW_THREADS
+    amount = PR_SendTo(self->pr_socket, buf, len, 0, &py_netaddr->pr_netaddr, timeout);
+    Py_END_ALLOW_THREADS
+
+    if (amount < 0) {
+        return set_nspr_error(NULL);
+    }
+
+    return PyLong_FromLong(amount);
+}
+
+PyDoc_STRVAR(Socket_get_sock_name_doc,
+"get_sock_name() -> NetworkAddress\n\
+\n\
+Return the network address for this socket.\n\
+");
+
+static PyObject *
+Socket_get_sock_name(Socket *self, PyObject *args)
+{
+    PRNetAddr pr_netaddr;
+    PyObject *py_netaddr = NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    if (PR_GetSockName(self->pr_socket, &pr_netaddr) != PR_SUCCESS) {
+        Py_BLOCK_THREADS
+        return set_nspr_error(NULL);
+    }
+    Py_END_ALLOW_THREADS
+
+    if ((py_netaddr = NetworkAddress_new_from_PRNetAddr(&pr_netaddr)) == NULL) {
+        return NULL;
+    }
+
+    return py_netaddr;
+}
+
+PyDoc_STRVAR(Socket_get_peer_name_doc,
+"get_peer_name() -> NetworkAddress\n\
+\n\
+Return the network address for the connected peer socket.\n\
+");
+
+static PyObject *
+Socket_get_peer_name(Socket *self, PyObject *args)
+{
+    PRNetAddr pr_netaddr;
+    PyObject *py_netaddr = NULL;
+
+    if (PR_GetPeerName(self->pr_socket, &pr_netaddr) != PR_SUCCESS)
+        return set_nspr_error(NULL);
+    if ((py_netaddr = NetworkAddress_new_from_PRNetAddr(&pr_netaddr)) == NULL) {
+        return NULL;
+    }
+
+    return py_netaddr;
+}
+
+PyDoc_STRVAR(Socket_fileno_doc,
+"fileno() -> integer\n\
+\n\
+Return the integer file descriptor of the socket.\n\
+");
+
+static PyObject *
+Socket_fileno(Socket *self)
+{
+    PROsfd sock_fd = -1;
+
+    if ((sock_fd = PR_FileDesc2NativeHandle(self->pr_socket)) == -1) {
+        return set_nspr_error(NULL);
+    }
+
+#if SIZEOF_SOCKET_T <= SIZEOF_LONG
+    return PyLong_FromLong((long)sock_fd);
+#else
+    return PyLong_FromLongLong((PY_LONG_LONG)sock_fd);
+#endif
+}
+
+PyDoc_STRVAR(Socket_makefile_doc,
+"makefile([mode[, buffersize]]) -> file object\n\
+\n\
 :Parameters:\n\
     mode : string\n\
         mode string identical to open(), e.g. 'r','w','rb', etc.\n\
@@ -3266,6 +3807,8 @@ Socket_methods[] = {
     {"set_socket_option", (PyCFunction)Socket_set_socket_option, METH_VARARGS,               Socket_set_socket_option_doc},
     {"get_socket_option", (PyCFunction)Socket_get_socket_option, METH_VARARGS,               Socket_get_socket_option_doc},
     {"connect",           (PyCFunction)Socket_connect,           METH_VARARGS|METH_KEYWORDS, Socket_connect_doc},
+    {"connect_continue",  (PyCFunction)Socket_connect_continue,  METH_VARARGS,               Socket_connect_continue_doc},
+    {"poll_flags",        (PyCFunction)Socket_poll_flags,        METH_VARARGS,               Socket_poll_flags_doc},
     {"accept",            (PyCFunction)Socket_accept,            METH_VARARGS|METH_KEYWORDS, Socket_accept_doc},
     {"accept_read",       (PyCFunction)Socket_accept_read,       METH_VARARGS|METH_KEYWORDS, Socket_accept_read_doc},
     {"bind",              (PyCFunction)Socket_bind,              METH_VARARGS,               Socket_bind_doc},
@@ -3273,12 +3816,16 @@ Socket_methods[] = {
     {"shutdown",          (PyCFunction)Socket_shutdown,          METH_VARARGS|METH_KEYWORDS, Socket_shutdown_doc},
     {"close"   ,          (PyCFunction)Socket_close,             METH_NOARGS,                Socket_close_doc},
     {"recv",              (PyCFunction)Socket_recv,              METH_VARARGS|METH_KEYWORDS, Socket_recv_doc},
+    {"recv_into",         (PyCFunction)Socket_recv_into,         METH_VARARGS|METH_KEYWORDS, Socket_recv_into_doc},
     {"read",              (PyCFunction)Socket_read,              METH_VARARGS|METH_KEYWORDS, Socket_read_doc},
+    {"readinto",          (PyCFunction)Socket_readinto,          METH_VARARGS,               Socket_readinto_doc},
     {"readline",          (PyCFunction)Socket_readline,          METH_VARARGS|METH_KEYWORDS, Socket_readline_doc},
     {"readlines",         (PyCFunction)Socket_readlines,         METH_VARARGS|METH_KEYWORDS, Socket_readlines_doc},
     {"recv_from",         (PyCFunction)Socket_recv_from,         METH_VARARGS|METH_KEYWORDS, Socket_recv_from_doc},
     {"send",              (PyCFunction)Socket_send,              METH_VARARGS|METH_KEYWORDS, Socket_send_doc},
     {"sendall",           (PyCFunction)Socket_sendall,           METH_VARARGS|METH_KEYWORDS, Socket_sendall_doc},
+    {"sendv",             (PyCFunction)Socket_sendv,             METH_VARARGS|METH_KEYWORDS, Socket_sendv_doc},
+    {"sendfile",          (PyCFunction)Socket_sendfile,          METH_VARARGS|METH_KEYWORDS, Socket_sendfile_doc},
     {"send_to",           (PyCFunction)Socket_send_to,           METH_VARARGS|METH_KEYWORDS, Socket_send_to_doc},
     {"get_sock_name",     (PyCFunction)Socket_get_sock_name,     METH_NOARGS,                Socket_get_sock_name_doc},
     {"get_peer_name",     (PyCFunction)Socket_get_peer_name,     METH_NOARGS,                Socket_get_peer_name_doc},
@@ -3495,6 +4042,531 @@ SocketType = {
     Socket_new,					/* tp_new */
 };
 
+/* ========================================================================== */
+/* ============================== PollSet Class ============================= */
+/* ========================================================================== */
+
+#define POLLSET_CHECK_NOT_POLLING(py_pollset)                           \
+{                                                                       \
+    if (py_pollset->polling) {                                          \
+        PyErr_SetString(PyExc_RuntimeError,                             \
+                        "PollSet cannot be used while poll() is in progress"); \
+        return NULL;                                                    \
+    }                                                                   \
+}
+
+static int
+pollset_flags_from_long(long flags, PRInt16 *in_flags)
+{
+    *in_flags = flags;
+    if (*in_flags != flags) {
+        PyErr_Format(PyExc_ValueError, "invalid poll flags 0x%lx", flags);
+        return -1;
+    }
+    return 0;
+}
+
+/*
+ * Return the position of py_socket in the poll set, -1 with a
+ * ValueError set if it is not registered.
+ */
+static Py_ssize_t
+pollset_find(PollSet *self, PyObject *py_socket)
+{
+    PyObject *py_index;
+
+    if ((py_index = PyDict_GetItem(self->index, py_socket)) == NULL) {
+        if (!PyErr_Occurred()) {
+            PyErr_SetString(PyExc_ValueError, "socket is not registered");
+        }
+        return -1;
+    }
+    return PyLong_AsSsize_t(py_index);
+}
+
+/* ============================ Attribute Access ============================ */
+
+/* ============================== Class Methods ============================= */
+
+PyDoc_STRVAR(PollSet_register_doc,
+"register(sock, flags=PR_POLL_READ)\n\
+\n\
+:Parameters:\n\
+    sock : Socket object\n\
+        the socket to poll\n\
+    flags : integer\n\
+        bitwise OR of PR_POLL_* flags\n\
+\n\
+Add sock to the poll set. Raises ValueError if sock is already\n\
+registered.\n\
+");
+
+static PyObject *
+PollSet_register(PollSet *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"sock", "flags", NULL};
+    Socket *py_socket = NULL;
+    long flags = PR_POLL_READ;
+    PRInt16 in_flags;
+    PyObject *py_index = NULL;
+    Py_ssize_t i;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|l:register", kwlist,
+                                     &SocketType, &py_socket, &flags))
+        return NULL;
+
+    POLLSET_CHECK_NOT_POLLING(self);
+
+    if (pollset_flags_from_long(flags, &in_flags) < 0) {
+        return NULL;
+    }
+
+    if (PyDict_GetItem(self->index, (PyObject *)py_socket) != NULL) {
+        PyErr_SetString(PyExc_ValueError, "socket is already registered");
+        return NULL;
+    }
+
+    if (self->n_descs == self->alloc_descs) {
+        Py_ssize_t alloc_descs = self->alloc_descs * 2;
+        PRPollDesc *descs = self->descs;
+        PyObject **sockets = self->sockets;
+
+        if (PyMem_Resize(descs, PRPollDesc, alloc_descs) == NULL) {
+            return PyErr_NoMemory();
+        }
+        self->descs = descs;
+        if (PyMem_Resize(sockets, PyObject *, alloc_descs) == NULL) {
+            return PyErr_NoMemory();
+        }
+        self->sockets = sockets;
+        self->alloc_descs = alloc_descs;
+    }
+
+    i = self->n_descs;
+    if ((py_index = PyLong_FromSsize_t(i)) == NULL) {
+        return NULL;
+    }
+    if (PyDict_SetItem(self->index, (PyObject *)py_socket, py_index) < 0) {
+        Py_DECREF(py_index);
+        return NULL;
+    }
+    Py_DECREF(py_index);
+
+    Py_INCREF(py_socket);
+    self->sockets[i] = (PyObject *)py_socket;
+    self->descs[i].fd = py_socket->pr_socket;
+    self->descs[i].in_flags = in_flags;
+    self->descs[i].out_flags = 0;
+    self->n_descs++;
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(PollSet_modify_doc,
+"modify(sock, flags)\n\
+\n\
+:Parameters:\n\
+    sock : Socket object\n\
+        a registered socket\n\
+    flags : integer\n\
+        bitwise OR of PR_POLL_* flags\n\
+\n\
+Change the flags sock is polled for. Raises ValueError if sock is not\n\
+registered.\n\
+");
+
+static PyObject *
+PollSet_modify(PollSet *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"sock", "flags", NULL};
+    PyObject *py_socket = NULL;
+    long flags;
+    PRInt16 in_flags;
+    Py_ssize_t i;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "Ol:modify", kwlist,
+                                     &py_socket, &flags))
+        return NULL;
+
+    POLLSET_CHECK_NOT_POLLING(self);
+
+    if (pollset_flags_from_long(flags, &in_flags) < 0) {
+        return NULL;
+    }
+
+    if ((i = pollset_find(self, py_socket)) < 0) {
+        return NULL;
+    }
+
+    self->descs[i].in_flags = in_flags;
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(PollSet_unregister_doc,
+"unregister(sock)\n\
+\n\
+:Parameters:\n\
+    sock : Socket object\n\
+        a registered socket\n\
+\n\
+Remove sock from the poll set. Raises ValueError if sock is not\n\
+registered.\n\
+");
+
+static PyObject *
+PollSet_unregister(PollSet *self, PyObject *args)
+{
+    PyObject *py_socket = NULL;
+    PyObject *py_index = NULL;
+    Py_ssize_t i, last;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "O:unregister", &py_socket))
+        return NULL;
+
+    POLLSET_CHECK_NOT_POLLING(self);
+
+    if ((i = pollset_find(self, py_socket)) < 0) {
+        return NULL;
+    }
+
+    /* Fill the hole with the last entry rather than shifting the array */
+    last = self->n_descs - 1;
+    if (i != last) {
+        if ((py_index = PyLong_FromSsize_t(i)) == NULL) {
+            return NULL;
+        }
+        if (PyDict_SetItem(self->index, self->sockets[last], py_index) < 0) {
+            Py_DECREF(py_index);
+            return NULL;
+        }
+        Py_DECREF(py_index);
+    }
+
+    if (PyDict_DelItem(self->index, py_socket) < 0) {
+        return NULL;
+    }
+
+    py_socket = self->sockets[i];
+    self->descs[i] = self->descs[last];
+    self->sockets[i] = self->sockets[last];
+    self->sockets[last] = NULL;
+    self->n_descs--;
+    Py_DECREF(py_socket);
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(PollSet_poll_doc,
+"poll(timeout=PR_INTERVAL_NO_TIMEOUT) -> [(Socket, flags), ...]\n\
+\n\
+:Parameters:\n\
+    timeout : interval time\n\
+        how long to block\n\
+\n\
+Wait until at least one registered socket is ready for the actions it\n\
+was registered for, the timeout expires or `PollSet.wakeup()` is\n\
+called. Returns a list of (Socket, out_flags) pairs for the ready\n\
+sockets only, the list is empty after a timeout or wakeup.\n\
+\n\
+A socket which has been closed while registered is reported with\n\
+PR_POLL_NVAL and should be unregistered.\n\
+");
+
+static PyObject *
+PollSet_poll(PollSet *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"timeout", NULL};
+    unsigned int timeout = PR_INTERVAL_NO_TIMEOUT;
+    PyObject *ready_list = NULL;
+    PyObject *ready = NULL;
+    Py_ssize_t i;
+    int n_closed = 0;
+    PRInt32 n_ready;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|I:poll", kwlist, &timeout))
+        return NULL;
+
+    if (self->polling) {
+        PyErr_SetString(PyExc_RuntimeError, "concurrent poll() invocation");
+        return NULL;
+    }
+
+    /* A socket may have been closed (or reopened) since it was registered */
+    for (i = 1; i < self->n_descs; i++) {
+        self->descs[i].fd = ((Socket *)self->sockets[i])->pr_socket;
+        if (self->descs[i].fd == NULL) {
+            n_closed++;
+        }
+    }
+    if (n_closed) {
+        timeout = PR_INTERVAL_NO_WAIT;
+    }
+
+    self->polling = 1;
+    Py_BEGIN_ALLOW_THREADS
+    n_ready = PR_Poll(self->descs, self->n_descs, timeout);
+    Py_END_ALLOW_THREADS
+    self->polling = 0;
+
+    if (n_ready < 0) {
+        return set_nspr_error(NULL);
+    }
+
+    /* out_flags are only meaningful if PR_Poll found a ready descriptor */
+    if (n_ready == 0) {
+        for (i = 0; i < self->n_descs; i++) {
+            self->descs[i].out_flags = 0;
+        }
+    }
+
+    if (self->descs[0].out_flags & PR_POLL_READ) {
+        if (PR_WaitForPollableEvent(self->wakeup_event) != PR_SUCCESS) {
+            return set_nspr_error(NULL);
+        }
+    }
+
+    if ((ready_list = PyList_New(0)) == NULL) {
+        return NULL;
+    }
+
+    for (i = 1; i < self->n_descs; i++) {
+        PRInt16 out_flags = self->descs[i].out_flags;
+
+        if (self->descs[i].fd == NULL) {
+            out_flags = PR_POLL_NVAL;
+        }
+        if (out_flags == 0) {
+            continue;
+        }
+        if ((ready = Py_BuildValue("(Oi)", self->sockets[i], out_flags)) == NULL) {
+            Py_DECREF(ready_list);
+            return NULL;
+        }
+        if (PyList_Append(ready_list, ready) < 0) {
+            Py_DECREF(ready);
+            Py_DECREF(ready_list);
+            return NULL;
+        }
+        Py_DECREF(ready);
+    }
+
+    return ready_list;
+}
+
+PyDoc_STRVAR(PollSet_wakeup_doc,
+"wakeup()\n\
+\n\
+Cause a `PollSet.poll()` in progress in another thread to return\n\
+immediately. If no poll is in progress the next one returns\n\
+immediately. This is the only PollSet method which may be called\n\
+while another thread is polling, for example to have the polling\n\
+thread register a new socket.\n\
+");
+
+static PyObject *
+PollSet_wakeup(PollSet *self, PyObject *args)
+{
+    TraceMethodEnter(self);
+
+    if (PR_SetPollableEvent(self->wakeup_event) != PR_SUCCESS) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_NONE;
+}
+
+static Py_ssize_t
+PollSet_length(PollSet *self)
+{
+    return self->n_descs - 1;
+}
+
+static int
+PollSet_contains(PollSet *self, PyObject *py_socket)
+{
+    return PyDict_Contains(self->index, py_socket);
+}
+
+static PyMethodDef PollSet_methods[] = {
+    {"register",   (PyCFunction)PollSet_register,   METH_VARARGS|METH_KEYWORDS, PollSet_register_doc},
+    {"modify",     (PyCFunction)PollSet_modify,     METH_VARARGS|METH_KEYWORDS, PollSet_modify_doc},
+    {"unregister", (PyCFunction)PollSet_unregister, METH_VARARGS,               PollSet_unregister_doc},
+    {"poll",       (PyCFunction)PollSet_poll,       METH_VARARGS|METH_KEYWORDS, PollSet_poll_doc},
+    {"wakeup",     (PyCFunction)PollSet_wakeup,     METH_NOARGS,                PollSet_wakeup_doc},
+    {NULL, NULL}  /* Sentinel */
+};
+
+static PySequenceMethods PollSet_as_sequence = {
+    (lenfunc)PollSet_length,			/* sq_length */
+    0,						/* sq_concat */
+    0,						/* sq_repeat */
+    0,						/* sq_item */
+    0,						/* sq_slice */
+    0,						/* sq_ass_item */
+    0,						/* sq_ass_slice */
+    (objobjproc)PollSet_contains,		/* sq_contains */
+    0,						/* sq_inplace_concat */
+    0,						/* sq_inplace_repeat */
+};
+
+/* =========================== Class Construction =========================== */
+
+#define POLLSET_INITIAL_SIZE 16
+
+static PyObject *
+PollSet_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    PollSet *self;
+
+    TraceObjNewEnter(type);
+
+    if ((self = (PollSet *)type->tp_alloc(type, 0)) == NULL) {
+        return NULL;
+    }
+
+    self->descs = PyMem_New(PRPollDesc, POLLSET_INITIAL_SIZE);
+    self->sockets = PyMem_New(PyObject *, POLLSET_INITIAL_SIZE);
+    self->alloc_descs = POLLSET_INITIAL_SIZE;
+    self->n_descs = 1;
+    self->polling = 0;
+
+    if (self->descs == NULL || self->sockets == NULL) {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+
+    if ((self->index = PyDict_New()) == NULL) {
+        Py_DECREF(self);
+        return NULL;
+    }
+
+    if ((self->wakeup_event = PR_NewPollableEvent()) == NULL) {
+        Py_DECREF(self);
+        return set_nspr_error(NULL);
+    }
+
+    self->descs[0].fd = self->wakeup_event;
+    self->descs[0].in_flags = PR_POLL_READ;
+    self->descs[0].out_flags = 0;
+    self->sockets[0] = NULL;
+
+    TraceObjNewLeave(self);
+    return (PyObject *)self;
+}
+
+static int
+PollSet_traverse(PollSet *self, visitproc visit, void *arg)
+{
+    Py_ssize_t i;
+
+    TraceMethodEnter(self);
+
+    for (i = 1; i < self->n_descs; i++) {
+        Py_VISIT(self->sockets[i]);
+    }
+    Py_VISIT(self->index);
+    return 0;
+}
+
+static int
+PollSet_clear(PollSet* self)
+{
+    Py_ssize_t i;
+
+    TraceMethodEnter(self);
+
+    for (i = self->n_descs - 1; i > 0; i--) {
+        self->n_descs = i;
+        Py_CLEAR(self->sockets[i]);
+    }
+    Py_CLEAR(self->index);
+    return 0;
+}
+
+static void
+PollSet_dealloc(PollSet* self)
+{
+    TraceMethodEnter(self);
+
+    PyObject_GC_UnTrack(self);
+    PollSet_clear(self);
+    if (self->wakeup_event) {
+        PR_DestroyPollableEvent(self->wakeup_event);
+    }
+    PyMem_Del(self->descs);
+    PyMem_Del(self->sockets);
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+PyDoc_STRVAR(PollSet_doc,
+"PollSet()\n\
+\n\
+A persistent set of sockets to poll. Unlike `Socket.poll()`, which\n\
+converts a sequence of (Socket, flags) pairs on every call, a PollSet\n\
+keeps its PRPollDesc array between calls. Registering, modifying and\n\
+unregistering a socket are O(1) and `PollSet.poll()` returns only the\n\
+sockets which are ready.\n\
+\n\
+A PollSet may only be used by one thread at a time, except for\n\
+`PollSet.wakeup()` which interrupts a poll in progress.\n\
+\n\
+    poll_set = io.PollSet()\n\
+    poll_set.register(sock, io.PR_POLL_READ)\n\
+    for sock, flags in poll_set.poll(timeout):\n\
+        ...\n\
+");
+
+static PyTypeObject
+PollSetType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "nss.io.PollSet",				/* tp_name */
+    sizeof(PollSet),				/* tp_basicsize */
+    0,						/* tp_itemsize */
+    (destructor)PollSet_dealloc,		/* tp_dealloc */
+    0,						/* tp_print */
+    0,						/* tp_getattr */
+    0,						/* tp_setattr */
+    0,						/* tp_compare */
+    0,						/* tp_repr */
+    0,						/* tp_as_number */
+    &PollSet_as_sequence,			/* tp_as_sequence */
+    0,						/* tp_as_mapping */
+    0,						/* tp_hash */
+    0,						/* tp_call */
+    0,						/* tp_str */
+    0,						/* tp_getattro */
+    0,						/* tp_setattro */
+    0,						/* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,	/* tp_flags */
+    PollSet_doc,				/* tp_doc */
+    (traverseproc)PollSet_traverse,		/* tp_traverse */
+    (inquiry)PollSet_clear,			/* tp_clear */
+    0,						/* tp_richcompare */
+    0,						/* tp_weaklistoffset */
+    0,						/* tp_iter */
+    0,						/* tp_iternext */
+    PollSet_methods,				/* tp_methods */
+    0,						/* tp_members */
+    0,						/* tp_getset */
+    0,						/* tp_base */
+    0,						/* tp_dict */
+    0,						/* tp_descr_get */
+    0,						/* tp_descr_set */
+    0,						/* tp_dictoffset */
+    0,						/* tp_init */
+    0,						/* tp_alloc */
+    PollSet_new,				/* tp_new */
+};
+
 /* ========================================================================== */
 /* ================================= Module ================================= */
 /* ========================================================================== */
@@ -3854,6 +4926,7 @@ MOD_INIT(io)
     TYPE_READY(AddrInfoType);
     TYPE_READY(HostEntryType);
     TYPE_READY(SocketType);
+    TYPE_READY(PollSetType);
 
     /* Export C API */
     if (PyModule_AddObject(m, "_C_API",
@@ -59,8 +59,13 @@ typedef struct {
 /* ========================================================================== */
 
 #define ALLOC_INCREMENT 1024
+/*
+ * Buffered data occupies buf[offset] .. buf[offset+len-1]. Consuming
+ * data advances offset rather than shifting the remainder down.
+ */
 typedef struct {
     char *buf;
+    long offset;
     long len;
     long alloc_len;
 } ReadAhead;
@@ -69,10 +74,21 @@ typedef struct {
 #define INIT_READAHEAD(readahead)               \
 {                                               \
     (readahead)->buf = NULL;                    \
+    (readahead)->offset = 0;                    \
     (readahead)->len = 0;                       \
     (readahead)->alloc_len = 0;                 \
 }
 
+#define READAHEAD_DATA(readahead) ((readahead)->buf + (readahead)->offset)
+
+#define CONSUME_READAHEAD(readahead, amount)    \
+{                                               \
+    (readahead)->offset += (amount);            \
+    (readahead)->len -= (amount);               \
+    if ((readahead)->len == 0)                  \
+        (readahead)->offset = 0;                \
+}
+
 #define FREE_READAHEAD(readahead)               \
 {                                               \
     if ((readahead)->buf)                       \
@@ -95,6 +111,27 @@ typedef struct {
 
 #define PySocket_Check(op) PyObject_TypeCheck(op, &SocketType)
 
+/* ========================================================================== */
+/* ================================ PollSet ================================= */
+/* ========================================================================== */
+
+/*
+ * descs[0] is reserved for the pollable wakeup event, registered
+ * sockets occupy descs[1] .. descs[n_descs-1]. sockets[i] holds a
+ * reference to the Socket polled by descs[i], index maps each Socket
+ * to its position so modify and unregister are O(1).
+ */
+typedef struct {
+    PyObject_HEAD
+    PRPollDesc *descs;
+    PyObject **sockets;
+    Py_ssize_t n_descs;
+    Py_ssize_t alloc_descs;
+    PyObject *index;
+    PRFileDesc *wakeup_event;
+    int polling;
+} PollSet;
+
 typedef struct {
     PyTypeObject *network_address_type;
     PyTypeObject *host_entry_type;
@@ -358,9 +358,19 @@ NewType_new_from_NSSType(NSSType *id)
 #define HAVE_RSA_PSS
 #endif
 
+#if (NSS_VMAJOR > 3) || (NSS_VMAJOR == 3 && NSS_VMINOR >= 52)
+#define HAVE_AEAD
+#endif
+
 #define MAX_AVAS 10
 #define MAX_RDNS 10
 
+/*
+ * Many PK11 functions take int lengths, larger buffers are fed to
+ * them in pieces no bigger than this.
+ */
+#define MAX_PK11_CHUNK_LEN (1 << 30)
+
 #ifdef DEBUG
 #include "py_traceback.h"
 
@@ -1356,6 +1366,9 @@ static PyTypeObject AVAType;
 static PyTypeObject RDNType;
 static PyTypeObject DNType;
 static PyTypeObject CertVerifyLogType;
+static PyTypeObject CertificateBundleType;
+static PyTypeObject CRLEntryType;
+static PyTypeObject CRLEntriesType;
 
 /* === Forward Declarations */
 
@@ -1585,12 +1598,21 @@ cert_x509_alt_name(PyObject *self, PyObject *args, PyObject *kwds);
 PyObject *
 DN_new_from_CERTName(CERTName *name);
 
+static Py_hash_t
+DN_hash(DN *self);
+
+static PyObject *
+CRLEntries_new(PyTypeObject *type, PyObject *args, PyObject *kwds);
+
 PyObject *
 AlgorithmID_new_from_SECAlgorithmID(SECAlgorithmID *id);
 
 static PyObject *
 Certificate_new_from_signed_der_secitem(SECItem *der);
 
+static PyObject *
+Certificate_new_from_der_parse_only(SECItem *der);
+
 static PyObject *
 Certificate_get_subject(Certificate *self, void *closure);
 
@@ -1716,6 +1738,56 @@ timestamp_to_DateTime(time_t timestamp, bool utc)
     return py_datetime;
 }
 
+/*
+ * Fold item_hash into hash, never yields the reserved error value -1.
+ */
+#define HASH_COMBINE(hash, item_hash)                           \
+{                                                               \
+    (hash) = (Py_hash_t)(((size_t)(hash) * 1000003) ^          \
+                         (size_t)(item_hash));                  \
+    if ((hash) == -1) (hash) = -2;                              \
+}
+
+/*
+ * FNV-1a, used to hash octets in place without copying them into a
+ * Python object first.
+ */
+#if SIZEOF_SIZE_T > 4
+#define FNV_OFFSET_BASIS ((size_t)14695981039346656037ULL)
+#define FNV_PRIME        ((size_t)1099511628211ULL)
+#else
+#define FNV_OFFSET_BASIS ((size_t)2166136261UL)
+#define FNV_PRIME        ((size_t)16777619UL)
+#endif
+
+#define FNV_UPDATE(hash, octet)                                 \
+{                                                               \
+    (hash) ^= (unsigned char)(octet);                           \
+    (hash) *= FNV_PRIME;                                        \
+}
+
+static Py_hash_t
+fnv_hash_finish(size_t hash)
+{
+    return (Py_hash_t)hash == -1 ? -2 : (Py_hash_t)hash;
+}
+
+/*
+ * Hash the contents of item. Never fails, the -1 check of callers is
+ * kept for symmetry with the other hash functions.
+ */
+static Py_hash_t
+SECItem_hash(const SECItem *item)
+{
+    size_t hash = FNV_OFFSET_BASIS;
+    unsigned int i;
+
+    for (i = 0; i < item->len; i++) {
+        FNV_UPDATE(hash, item->data[i]);
+    }
+    return fnv_hash_finish(hash);
+}
+
 /*
  * Parse text as base64 data. base64 may optionally be wrapped in PEM
  * header/footer. der SECItem must be freed with
@@ -1747,7 +1819,6 @@ base64_to_SECItem(SECItem *der, char *text, size_t text_len)
         tmp = PL_strnstr(p, "-----END", text_end-p);
         if (tmp != NULL) {
             der_end = tmp;
-            *der_end = '\0';
         } else {
             PyErr_SetString(PyExc_ValueError, "no PEM END found");
             return SECFailure;
@@ -3434,6 +3505,30 @@ SymKeyOrNoneConvert(PyObject *obj, PyObject **param)
     return 0;
 }
 
+static int
+MechanismOrNoneConvert(PyObject *obj, unsigned long *param)
+{
+    unsigned long mechanism;
+
+    if (PyInteger_Check(obj)) {
+        mechanism = PyLong_AsUnsignedLong(obj);
+        if (mechanism == (unsigned long)-1 && PyErr_Occurred()) {
+            return 0;
+        }
+        *param = mechanism;
+        return 1;
+    }
+
+    if (PyNone_Check(obj)) {
+        *param = CKM_INVALID_MECHANISM;
+        return 1;
+    }
+
+    PyErr_Format(PyExc_TypeError, "must be int or None, not %.50s",
+                 Py_TYPE(obj)->tp_name);
+    return 0;
+}
+
 /*
  * Note, this is only necessary in Py2, it is equivalent to the 's'
  * PyArg_Parse format conversion in Py3 with the exception a PyBytes
@@ -5130,6 +5225,14 @@ SecItem_get_data(SecItem *self, void *closure)
     return PyBytes_FromStringAndSize((const char *)self->item.data, self->item.len);
 }
 
+static PyObject *
+SecItem_get_view(SecItem *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return PyMemoryView_FromObject((PyObject *)self);
+}
+
 static
 PyGetSetDef SecItem_getseters[] = {
     {"type",       (getter)SecItem_get_type,    (setter)NULL,
@@ -5138,6 +5241,8 @@ PyGetSetDef SecItem_getseters[] = {
      "number of octets in SecItem buffer", NULL},
     {"data",       (getter)SecItem_get_data,    (setter)NULL,
      "contents of SecItem buffer", NULL},
+    {"view",       (getter)SecItem_get_view,    (setter)NULL,
+     "memoryview of SecItem buffer, slicing it does not copy", NULL},
     {NULL}  /* Sentinel */
 };
 
@@ -5434,6 +5539,7 @@ SecItem_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     self->item.data = NULL;
     self->kind = SECITEM_unknown;
     self->buffer_exports = 0;
+    self->hash = -1;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -5536,6 +5642,7 @@ SecItem_init(SecItem *self, PyObject *args, PyObject *kwds)
         self->item.type = siBuffer;
         self->item.len = 0;
         self->item.data = NULL;
+        self->hash = -1;
     }
 
     return 0;
@@ -5575,33 +5682,53 @@ SecItem_richcompare(SecItem *self, SecItem *other, int op)
     int cmp_result = 0;
 
     if (!PySecItem_Check(other)) {
-        PyErr_SetString(PyExc_TypeError, "Bad type, must be SecItem");
-        return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
     }
 
-
-    if (self->item.data == NULL && other->item.data == NULL) {
-        cmp_result = 0;
+    /* Differing cached hashes prove inequality without touching the data */
+    if ((op == Py_EQ || op == Py_NE) &&
+        self->hash != -1 && other->hash != -1 && self->hash != other->hash) {
+        cmp_result = 1;
+        RETURN_COMPARE_RESULT(op, cmp_result)
     }
 
-    if (self->item.len == 0 && other->item.len == 0) {
-        cmp_result = 0;
+    if (self->item.data != NULL && other->item.data != NULL) {
+        cmp_result = memcmp(self->item.data, other->item.data,
+                            MIN(self->item.len, other->item.len));
     }
 
-    if (self->item.len > other->item.len) {
-        cmp_result = 1;
-    }
+    if (cmp_result == 0) {
+        if (self->item.len > other->item.len) {
+            cmp_result = 1;
+        }
 
-    if (self->item.len < other->item.len) {
-        cmp_result = -1;
+        if (self->item.len < other->item.len) {
+            cmp_result = -1;
+        }
     }
 
-    if (self->item.data != NULL && other->item.data != NULL) {
-        cmp_result = memcmp(self->item.data, other->item.data, self->item.len);
+    RETURN_COMPARE_RESULT(op, cmp_result)
+}
+
+static Py_hash_t
+SecItem_hash(SecItem *self)
+{
+    Py_hash_t hash;
+
+    if (self->hash != -1) {
+        return self->hash;
     }
 
+    if ((hash = SECItem_hash(&self->item)) == -1) {
+        return -1;
+    }
 
-    RETURN_COMPARE_RESULT(op, cmp_result)
+    /* An exported buffer may be written to, don't trust a cached value */
+    if (self->buffer_exports == 0) {
+        self->hash = hash;
+    }
+    return hash;
 }
 
 /* =========================== Buffer Protocol ========================== */
@@ -5612,6 +5739,9 @@ static int SecItem_GetBuffer(PyObject *obj, Py_buffer *view, int flags)
     int ret;
     SecItem *self = (SecItem *)obj;
 
+    /* The buffer is writable, the contents may change under the hash */
+    self->hash = -1;
+
     if (view == NULL) {
         self->buffer_exports++;
         return 0;
@@ -5801,7 +5931,7 @@ static PyTypeObject SecItemType = {
     0,						/* tp_as_number */
     &SecItem_as_sequence,			/* tp_as_sequence */
     &SecItem_as_mapping,			/* tp_as_mapping */
-    0,						/* tp_hash */
+    (hashfunc)SecItem_hash,			/* tp_hash */
     0,						/* tp_call */
     (reprfunc)SecItem_str,			/* tp_str */
     0,						/* tp_getattro */
@@ -5852,6 +5982,7 @@ SecItem_init_from_data(SecItem *self, const void *data, Py_ssize_t len,
     }
     memmove(self->item.data, data, len);
     self->kind = kind;
+    self->hash = -1;
 
     return 0;
 }
@@ -7963,9 +8094,187 @@ PublicKey_str(PublicKey *self)
 
 }
 
+/*
+ * Verify one signature. Returns 1 if the signature is good, 0 if it is
+ * bad and -1 on any other error with the NSS error code left set.
+ *
+ * Does not touch any Python object and may be called without the GIL.
+ */
+static int
+pk11_verify_buf(SECKEYPublicKey *pk, CK_MECHANISM_TYPE mechanism, SECItem *param,
+                Py_buffer *signature, Py_buffer *data)
+{
+    SECItem sig_item = {siBuffer, signature->buf, signature->len};
+    SECItem data_item = {siBuffer, data->buf, data->len};
+    PRErrorCode error;
+
+    if (PK11_VerifyWithMechanism(pk, mechanism, param,
+                                 &sig_item, &data_item, NULL) == SECSuccess) {
+        return 1;
+    }
+
+    error = PORT_GetError();
+    if (error == SEC_ERROR_BAD_SIGNATURE || error == SEC_ERROR_INPUT_LEN) {
+        return 0;
+    }
+
+    return -1;
+}
+
+PyDoc_STRVAR(PublicKey_verify_doc,
+"verify(mechanism, signature, data, sec_param=None) -> bool\n\
+\n\
+:Parameters:\n\
+    mechanism : int\n\
+        signature mechanism enumeration constant (CKM_*)\n\
+        e.g. CKM_SHA256_RSA_PKCS, CKM_ECDSA_SHA256, CKM_RSA_PKCS\n\
+    signature : buffer\n\
+        the signature to check, see PrivateKey.sign()\n\
+    data : buffer\n\
+        the signed data, the message for combined hash and sign\n\
+        mechanisms, otherwise the (encoded) digest\n\
+    sec_param : SecItem object or None\n\
+        mechanism parameters (e.g. CK_RSA_PKCS_PSS_PARAMS) or None.\n\
+\n\
+Returns True if signature is a valid signature of data made with the\n\
+private key matching this public key, False if it is not. Other\n\
+failures (e.g. an unsupported mechanism) raise an exception.\n\
+");
+static PyObject *
+PublicKey_verify(PublicKey *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"mechanism", "signature", "data", "sec_param", NULL};
+    unsigned long mechanism;
+    Py_buffer signature, data;
+    SecItem *py_sec_param = NULL;
+    int result;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "ky*y*|O&:verify", kwlist,
+                                     &mechanism, &signature, &data,
+                                     SecItemOrNoneConvert, &py_sec_param))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    result = pk11_verify_buf(self->pk, mechanism,
+                             py_sec_param ? &py_sec_param->item : NULL,
+                             &signature, &data);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&signature);
+    PyBuffer_Release(&data);
+
+    if (result < 0) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_BOOL(result);
+}
+
+PyDoc_STRVAR(PublicKey_verify_many_doc,
+"verify_many(mechanism, items, sec_param=None) -> [bool, ...]\n\
+\n\
+:Parameters:\n\
+    mechanism : int\n\
+        signature mechanism enumeration constant (CKM_*)\n\
+    items : iterable of (data, signature) tuples\n\
+        the signatures to check, each element is a buffer\n\
+    sec_param : SecItem object or None\n\
+        mechanism parameters or None.\n\
+\n\
+Verify a batch of signatures made with the private key matching\n\
+this public key. Equivalent to calling verify() for each item but the\n\
+loop runs in C with the GIL released. Returns a list with True for\n\
+each valid signature and False for each invalid one, in the same\n\
+order as items.\n\
+");
+static PyObject *
+PublicKey_verify_many(PublicKey *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"mechanism", "items", "sec_param", NULL};
+    unsigned long mechanism;
+    PyObject *py_items = NULL;
+    SecItem *py_sec_param = NULL;
+    PyObject *py_seq = NULL;
+    PyObject *py_item = NULL;
+    PyObject *py_result = NULL;
+    Py_buffer *views = NULL;        /* data, signature per item */
+    char *results = NULL;
+    Py_ssize_t n_items, n_parsed = 0, i;
+    int result = 1;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "kO|O&:verify_many", kwlist,
+                                     &mechanism, &py_items,
+                                     SecItemOrNoneConvert, &py_sec_param))
+        return NULL;
+
+    if ((py_seq = PySequence_Fast(py_items, "items must be iterable")) == NULL) {
+        return NULL;
+    }
+    n_items = PySequence_Fast_GET_SIZE(py_seq);
+
+    views = PyMem_New(Py_buffer, n_items * 2);
+    results = PyMem_New(char, n_items);
+    if (!views || !results) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (n_parsed = 0; n_parsed < n_items; n_parsed++) {
+        if ((py_item = PySequence_Tuple(PySequence_Fast_GET_ITEM(py_seq, n_parsed))) == NULL) {
+            goto exit;
+        }
+        if (!PyArg_ParseTuple(py_item, "y*y*:verify_many",
+                              &views[n_parsed * 2], &views[n_parsed * 2 + 1])) {
+            Py_CLEAR(py_item);
+            goto exit;
+        }
+        Py_CLEAR(py_item);
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < n_items && result >= 0; i++) {
+        result = pk11_verify_buf(self->pk, mechanism,
+                                 py_sec_param ? &py_sec_param->item : NULL,
+                                 &views[i * 2 + 1], &views[i * 2]);
+        results[i] = result;
+    }
+    Py_END_ALLOW_THREADS
+
+    if (result < 0) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    if ((py_result = PyList_New(n_items)) == NULL) {
+        goto exit;
+    }
+
+    for (i = 0; i < n_items; i++) {
+        py_item = results[i] ? Py_True : Py_False;
+        Py_INCREF(py_item);
+        PyList_SET_ITEM(py_result, i, py_item);
+    }
+
+ exit:
+    for (i = 0; i < n_parsed * 2; i++) {
+        PyBuffer_Release(&views[i]);
+    }
+    PyMem_Free(views);
+    PyMem_Free(results);
+    Py_DECREF(py_seq);
+
+    return py_result;
+}
+
 static PyMethodDef PublicKey_methods[] = {
     {"format_lines", (PyCFunction)PublicKey_format_lines,   METH_VARARGS|METH_KEYWORDS, generic_format_lines_doc},
     {"format",       (PyCFunction)PublicKey_format,         METH_VARARGS|METH_KEYWORDS, generic_format_doc},
+    {"verify",       (PyCFunction)PublicKey_verify,         METH_VARARGS|METH_KEYWORDS, PublicKey_verify_doc},
+    {"verify_many",  (PyCFunction)PublicKey_verify_many,    METH_VARARGS|METH_KEYWORDS, PublicKey_verify_many_doc},
     {NULL, NULL}  /* Sentinel */
 };
 
@@ -9028,6 +9337,187 @@ CertificateExtension_new_from_CERTCertExtension(CERTCertExtension *extension)
     return (PyObject *) self;
 }
 
+/* ========================================================================== */
+/* ======================== Certificate Verify Cache ======================== */
+/* ========================================================================== */
+
+/*
+ * Cache of successful Certificate.verify_now() and Certificate.verify()
+ * results, disabled until set_verify_cache_settings() enables it.
+ *
+ * The dict is used as a LRU list, dicts preserve insertion order, a hit
+ * re-inserts the entry at the end and eviction removes the first
+ * entry. All access is performed holding the GIL.
+ *
+ * key:   (sha256 of the DER, required_usages, certdb handle, check_sig,
+ *         time bucket)
+ * value: (returned_usages, expires, not_before, not_after)
+ *
+ * The time bucket is the verification time divided by the TTL, an entry
+ * expires after the TTL but never later than the certificate's
+ * not_after. Anything which may change a verification result (CRLs,
+ * OCSP, trust) calls verify_cache_invalidate(). The generation detects
+ * invalidations which occur while a verification is running without the
+ * GIL, its result is then not cached.
+ */
+static PyObject *verify_cache = NULL;
+static Py_ssize_t verify_cache_max_entries = 0;
+static PRTime verify_cache_ttl = 0;
+static unsigned long verify_cache_generation = 0;
+static unsigned long verify_cache_hits = 0;
+static unsigned long verify_cache_misses = 0;
+static unsigned long verify_cache_evictions = 0;
+static unsigned long verify_cache_invalidations = 0;
+
+static void
+verify_cache_invalidate(void)
+{
+    verify_cache_generation++;
+    if (verify_cache == NULL) {
+        return;
+    }
+    PyDict_Clear(verify_cache);
+    verify_cache_invalidations++;
+}
+
+/*
+ * Look up the verification of cert at pr_time. Returns 1 and sets
+ * *returned_usages on a hit, 0 on a miss and -1 with an exception set
+ * on error. On a miss *key is set to a new reference to the key to pass
+ * to verify_cache_put(), or NULL if the cache is disabled.
+ */
+static int
+verify_cache_get(CERTCertificate *cert, CERTCertDBHandle *certdb_handle,
+                 PRBool check_sig, long required_usages, PRTime pr_time,
+                 PyObject **key, SECCertificateUsage *returned_usages)
+{
+    unsigned char digest[SHA256_LENGTH];
+    PyObject *entry = NULL;
+    PRTime expires, not_before, not_after;
+
+    *key = NULL;
+    if (verify_cache == NULL) {
+        return 0;
+    }
+
+    if (PK11_HashBuf(SEC_OID_SHA256, digest,
+                     cert->derCert.data, cert->derCert.len) != SECSuccess) {
+        set_nspr_error(NULL);
+        return -1;
+    }
+
+    if ((*key = Py_BuildValue("(y#lNiL)", digest, (Py_ssize_t)SHA256_LENGTH,
+                              required_usages,
+                              PyLong_FromVoidPtr(certdb_handle),
+                              check_sig ? 1 : 0,
+                              (long long)(pr_time / verify_cache_ttl))) == NULL) {
+        return -1;
+    }
+
+    if ((entry = PyDict_GetItemWithError(verify_cache, *key)) == NULL) {
+        if (PyErr_Occurred()) {
+            Py_CLEAR(*key);
+            return -1;
+        }
+        verify_cache_misses++;
+        return 0;
+    }
+
+    Py_INCREF(entry);
+    if (PyDict_DelItem(verify_cache, *key) < 0) {
+        goto fail;
+    }
+
+    expires = PyLong_AsLongLong(PyTuple_GET_ITEM(entry, 1));
+    not_before = PyLong_AsLongLong(PyTuple_GET_ITEM(entry, 2));
+    not_after = PyLong_AsLongLong(PyTuple_GET_ITEM(entry, 3));
+
+    if (PR_Now() >= expires || pr_time < not_before || pr_time >= not_after) {
+        Py_DECREF(entry);
+        verify_cache_misses++;
+        return 0;
+    }
+
+    /* Re-insert as the most recently used entry */
+    if (PyDict_SetItem(verify_cache, *key, entry) < 0) {
+        goto fail;
+    }
+
+    *returned_usages = PyLong_AsLongLong(PyTuple_GET_ITEM(entry, 0));
+    Py_DECREF(entry);
+    Py_CLEAR(*key);
+    verify_cache_hits++;
+    return 1;
+
+ fail:
+    Py_DECREF(entry);
+    Py_CLEAR(*key);
+    return -1;
+}
+
+/*
+ * Cache the successful verification of cert under key, as returned by
+ * verify_cache_get(). Steals the reference to key, which may be NULL.
+ * Nothing is cached if the cache was invalidated since generation was
+ * read.
+ */
+static int
+verify_cache_put(PyObject *key, CERTCertificate *cert,
+                 SECCertificateUsage returned_usages,
+                 unsigned long generation)
+{
+    PRTime expires, not_before, not_after;
+    PyObject *entry = NULL;
+    PyObject *oldest = NULL;
+    Py_ssize_t pos;
+    int result = 0;
+
+    if (key == NULL || verify_cache == NULL ||
+        generation != verify_cache_generation) {
+        goto exit;
+    }
+
+    if (CERT_GetCertTimes(cert, &not_before, &not_after) != SECSuccess) {
+        goto exit;
+    }
+
+    expires = PR_Now() + verify_cache_ttl;
+    if (expires > not_after) {
+        expires = not_after;
+    }
+
+    if ((entry = Py_BuildValue("(LLLL)", (long long)returned_usages,
+                               (long long)expires, (long long)not_before,
+                               (long long)not_after)) == NULL) {
+        result = -1;
+        goto exit;
+    }
+
+    if (PyDict_SetItem(verify_cache, key, entry) < 0) {
+        result = -1;
+        goto exit;
+    }
+
+    while (PyDict_GET_SIZE(verify_cache) > verify_cache_max_entries) {
+        pos = 0;
+        if (!PyDict_Next(verify_cache, &pos, &oldest, NULL)) {
+            break;
+        }
+        Py_INCREF(oldest);
+        result = PyDict_DelItem(verify_cache, oldest);
+        Py_DECREF(oldest);
+        if (result < 0) {
+            goto exit;
+        }
+        verify_cache_evictions++;
+    }
+
+ exit:
+    Py_XDECREF(key);
+    Py_XDECREF(entry);
+    return result;
+}
+
 /* ========================================================================== */
 /* ============================ Certificate Class =========================== */
 /* ========================================================================== */
@@ -9083,7 +9573,19 @@ Certificate_get_subject(Certificate *self, void *closure)
 {
     TraceMethodEnter(self);
 
-    return DN_new_from_CERTName(&self->cert->subject);
+    if (self->py_subject == NULL) {
+        if ((self->py_subject = DN_new_from_CERTName(&self->cert->subject)) == NULL) {
+            return NULL;
+        }
+        /* The DN is shared by every caller, hashing it freezes it */
+        if (DN_hash((DN *)self->py_subject) == -1) {
+            Py_CLEAR(self->py_subject);
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->py_subject);
+    return self->py_subject;
 }
 
 static PyObject *
@@ -9109,8 +9611,20 @@ Certificate_get_issuer(Certificate *self, void *closure)
 {
     TraceMethodEnter(self);
 
-    return DN_new_from_CERTName(&self->cert->issuer);
-}
+    if (self->py_issuer == NULL) {
+        if ((self->py_issuer = DN_new_from_CERTName(&self->cert->issuer)) == NULL) {
+            return NULL;
+        }
+        /* The DN is shared by every caller, hashing it freezes it */
+        if (DN_hash((DN *)self->py_issuer) == -1) {
+            Py_CLEAR(self->py_issuer);
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->py_issuer);
+    return self->py_issuer;
+}
 
 static PyObject *
 Certificate_get_version(Certificate *self, void *closure)
@@ -9142,7 +9656,14 @@ Certificate_get_signed_data(Certificate *self, void *closure)
 {
     TraceMethodEnter(self);
 
-    return SignedData_new_from_SECItem(&self->cert->derCert);
+    if (self->py_signed_data == NULL) {
+        if ((self->py_signed_data = SignedData_new_from_SECItem(&self->cert->derCert)) == NULL) {
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->py_signed_data);
+    return self->py_signed_data;
 }
 
 static PyObject *
@@ -9156,6 +9677,14 @@ Certificate_get_der_data(Certificate *self, void *closure)
     return PyBytes_FromStringAndSize((char *)der.data, der.len);
 }
 
+static PyObject *
+Certificate_get_der_view(Certificate *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return PyMemoryView_FromObject((PyObject *)self);
+}
+
 static PyObject *
 Certificate_get_ssl_trust_str(Certificate *self, void *closure)
 {
@@ -9227,14 +9756,31 @@ Certificate_get_subject_public_key_info(Certificate *self, void *closure)
 {
     TraceMethodEnter(self);
 
-    return SubjectPublicKeyInfo_new_from_CERTSubjectPublicKeyInfo(
-               &self->cert->subjectPublicKeyInfo);
+    if (self->py_subject_public_key_info == NULL) {
+        if ((self->py_subject_public_key_info =
+             SubjectPublicKeyInfo_new_from_CERTSubjectPublicKeyInfo(
+                 &self->cert->subjectPublicKeyInfo)) == NULL) {
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->py_subject_public_key_info);
+    return self->py_subject_public_key_info;
 }
 
 static PyObject *
 Certificate_get_extensions(Certificate *self, void *closure)
 {
-    return CERTCertExtension_tuple(self->cert->extensions, AsObject);
+    TraceMethodEnter(self);
+
+    if (self->py_extensions == NULL) {
+        if ((self->py_extensions = CERTCertExtension_tuple(self->cert->extensions, AsObject)) == NULL) {
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->py_extensions);
+    return self->py_extensions;
 }
 
 static PyObject *
@@ -9283,6 +9829,9 @@ PyGetSetDef Certificate_getseters[] = {
     {"der_data",                (getter)Certificate_get_der_data,                NULL,
      "raw certificate DER data as data buffer",  NULL},
 
+    {"der_view",                (getter)Certificate_get_der_view,                NULL,
+     "read-only memoryview of the certificate DER data, shares memory with the certificate",  NULL},
+
     {"ssl_trust_str",           (getter)Certificate_get_ssl_trust_str,           NULL,
      "certificate SSL trust flags as array of strings, or None if trust is not defined",  NULL},
 
@@ -9358,6 +9907,43 @@ Certificate_trust_flags(PyObject *cls, PyObject *args, PyObject *kwds)
     return cert_trust_flags(flags, repr_kind);
 }
 
+PyDoc_STRVAR(Certificate_parse_doc,
+"parse(data) -> Certificate\n\
+\n\
+:Parameters:\n\
+    data : SecItem or any buffer compatible object\n\
+        Data to initialize the certificate from, must be in DER format\n\
+\n\
+Decode data into a `Certificate` without importing it. Unlike\n\
+`Certificate()` the certificate is not registered with a certdb or\n\
+the temporary certificate store, no database locks are taken and the\n\
+GIL is released while decoding, which makes it the fastest way to\n\
+inspect the fields of many certificates.\n\
+\n\
+A parsed certificate is not found by certdb lookups, import it with\n\
+`Certificate()` if it must take part in verifying other certificates.\n\
+\n\
+This is a class method, see also `nss.decode_certificate()`.\n\
+");
+
+static PyObject *
+Certificate_parse(PyObject *cls, PyObject *args)
+{
+    SECItem_param *data_param = NULL;
+    PyObject *py_cert = NULL;
+
+    TraceMethodEnter(cls);
+
+    if (!PyArg_ParseTuple(args, "O&:parse",
+                          SECItemConvert, &data_param))
+        return NULL;
+
+    py_cert = Certificate_new_from_der_parse_only(&data_param->item);
+    SECItem_param_release(data_param);
+
+    return py_cert;
+}
+
 PyDoc_STRVAR(Certificate_set_trust_attributes_doc,
 "set_trust_attributes(trust, certdb, slot, [user_data1, ...])\n\
 \n\
@@ -9388,8 +9974,10 @@ Certificate_set_trust_attributes(Certificate *self, PyObject *args)
     CERTCertDBHandle *certdb_handle = NULL;
     PyObject *py_slot = Py_None;
     PK11SlotInfo *slot = NULL;
+    PK11SlotInfo *internal_slot = NULL;
     CERTCertTrust *trust = NULL;
     SECStatus result = SECFailure;
+    PRBool authenticate_failed = PR_FALSE;
 
     TraceMethodEnter(self);
 
@@ -9415,8 +10003,9 @@ Certificate_set_trust_attributes(Certificate *self, PyObject *args)
         certdb_handle = CERT_GetDefaultCertDB();
     }
 
-    if (PyNone_Check(py_slot)) {
-	slot = PK11_GetInternalKeySlot();
+    /* PK11SlotOrNoneConvert converts None to NULL */
+    if (py_slot == NULL) {
+	slot = internal_slot = PK11_GetInternalKeySlot();
     } else {
         slot = ((PK11Slot *)py_slot)->slot;
     }
@@ -9443,20 +10032,27 @@ Certificate_set_trust_attributes(Certificate *self, PyObject *args)
     if ((result = CERT_ChangeCertTrust(certdb_handle, self->cert, trust)) != SECSuccess) {
 	if (PORT_GetError() == SEC_ERROR_TOKEN_NOT_LOGGED_IN) {
 	    if ((result = PK11_Authenticate(slot, PR_TRUE, pin_args)) != SECSuccess) {
-                set_nspr_error("Unable to authenticate");
+                authenticate_failed = PR_TRUE;
             } else {
-                if ((result = CERT_ChangeCertTrust(certdb_handle, self->cert, trust)) != SECSuccess) {
-                    set_nspr_error(NULL);
-                }
+                result = CERT_ChangeCertTrust(certdb_handle, self->cert, trust);
             }
         }
     }
     Py_END_ALLOW_THREADS
 
+    /* The exception can only be set holding the GIL */
+    if (result != SECSuccess) {
+        set_nspr_error(authenticate_failed ? "Unable to authenticate" : NULL);
+    }
+
  exit:
     Py_DECREF(pin_args);
     PORT_Free(trust);
+    if (internal_slot) {
+        PK11_FreeSlot(internal_slot);
+    }
     if (result == SECSuccess) {
+        verify_cache_invalidate();
         Py_RETURN_NONE;
     } else {
         return NULL;
@@ -9755,6 +10351,9 @@ required usages, otherwise it is for all possible usages.\n\
 Hint: You can obtain a printable representation of the usage flags\n\
 via `cert_usage_flags`.\n\
 \n\
+Successful results may be answered from the verification cache, see\n\
+`nss.set_verify_cache_settings()`.\n\
+\n\
 Note: See the `Certificate.verify` documentation for details on how\n\
 the Certificate verification functions handle errors.\n\
 ");
@@ -9771,6 +10370,9 @@ Certificate_verify_now(Certificate *self, PyObject *args)
     PRBool check_sig = 0;
     long required_usages = 0;
     SECCertificateUsage returned_usages = 0;
+    PyObject *cache_key = NULL;
+    unsigned long cache_generation = 0;
+    int cached;
 
     TraceMethodEnter(self);
 
@@ -9791,6 +10393,17 @@ Certificate_verify_now(Certificate *self, PyObject *args)
     Py_DECREF(parse_args);
 
     check_sig = PyBoolAsPRBool(py_check_sig);
+
+    if ((cached = verify_cache_get(self->cert, py_certdb->handle, check_sig,
+                                   required_usages, PR_Now(),
+                                   &cache_key, &returned_usages)) < 0) {
+        return NULL;
+    }
+    if (cached) {
+        return PyLong_FromLong(returned_usages);
+    }
+    cache_generation = verify_cache_generation;
+
     pin_args = PyTuple_GetSlice(args, n_base_args, argc);
 
     Py_BEGIN_ALLOW_THREADS
@@ -9798,11 +10411,17 @@ Certificate_verify_now(Certificate *self, PyObject *args)
                                   required_usages, pin_args, &returned_usages) != SECSuccess) {
 	Py_BLOCK_THREADS
         Py_DECREF(pin_args);
+        Py_XDECREF(cache_key);
         return set_cert_verify_error(returned_usages, NULL, NULL);
     }
     Py_END_ALLOW_THREADS
     Py_DECREF(pin_args);
 
+    if (verify_cache_put(cache_key, self->cert, returned_usages,
+                         cache_generation) < 0) {
+        return NULL;
+    }
+
     return PyLong_FromLong(returned_usages);
 }
 
@@ -9866,6 +10485,9 @@ is defined which in addition to the normal NSPRError fields will also\n\
 contain the returned usages and optionally the CertVerifyLog\n\
 object. If no exception is raised these are returned as normal return\n\
 values.\n\
+\n\
+Successful results may be answered from the verification cache, see\n\
+`nss.set_verify_cache_settings()`.\n\
 ");
 
 static PyObject *
@@ -9881,6 +10503,9 @@ Certificate_verify(Certificate *self, PyObject *args)
     PRTime pr_time = 0;
     long required_usages = 0;
     SECCertificateUsage returned_usages = 0;
+    PyObject *cache_key = NULL;
+    unsigned long cache_generation = 0;
+    int cached;
 
     TraceMethodEnter(self);
 
@@ -9902,6 +10527,17 @@ Certificate_verify(Certificate *self, PyObject *args)
     Py_DECREF(parse_args);
 
     check_sig = PyBoolAsPRBool(py_check_sig);
+
+    if ((cached = verify_cache_get(self->cert, py_certdb->handle, check_sig,
+                                   required_usages, pr_time,
+                                   &cache_key, &returned_usages)) < 0) {
+        return NULL;
+    }
+    if (cached) {
+        return PyLong_FromLong(returned_usages);
+    }
+    cache_generation = verify_cache_generation;
+
     pin_args = PyTuple_GetSlice(args, n_base_args, argc);
 
     Py_BEGIN_ALLOW_THREADS
@@ -9910,11 +10546,17 @@ Certificate_verify(Certificate *self, PyObject *args)
                                NULL, &returned_usages) != SECSuccess) {
 	Py_BLOCK_THREADS
         Py_DECREF(pin_args);
+        Py_XDECREF(cache_key);
         return set_cert_verify_error(returned_usages, NULL, NULL);
     }
     Py_END_ALLOW_THREADS
     Py_DECREF(pin_args);
 
+    if (verify_cache_put(cache_key, self->cert, returned_usages,
+                         cache_generation) < 0) {
+        return NULL;
+    }
+
     return PyLong_FromLong(returned_usages);
 }
 
@@ -10503,8 +11145,48 @@ Certificate_str(Certificate *self)
 
 }
 
+static PyObject *
+Certificate_richcompare(Certificate *self, Certificate *other, int op)
+{
+    int cmp_result;
+
+    if (!PyCertificate_Check(other) || (op != Py_EQ && op != Py_NE)) {
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
+    }
+
+    if (self->cert == other->cert) {
+        cmp_result = 0;
+    } else if (self->cert == NULL || other->cert == NULL) {
+        cmp_result = 1;
+    } else if (self->hash != -1 && other->hash != -1 && self->hash != other->hash) {
+        cmp_result = 1;
+    } else {
+        cmp_result = SECITEM_ItemsAreEqual(&self->cert->derCert,
+                                           &other->cert->derCert) ? 0 : 1;
+    }
+
+    RETURN_COMPARE_RESULT(op, cmp_result)
+}
+
+static Py_hash_t
+Certificate_hash(Certificate *self)
+{
+    if (self->hash != -1) {
+        return self->hash;
+    }
+
+    if (self->cert == NULL) {
+        return PyObject_HashNotImplemented((PyObject *)self);
+    }
+
+    self->hash = SECItem_hash(&self->cert->derCert);
+    return self->hash;
+}
+
 static PyMethodDef Certificate_methods[] = {
     {"trust_flags",            (PyCFunction)Certificate_trust_flags,            METH_VARARGS | METH_CLASS,  Certificate_trust_flags_doc},
+    {"parse",                  (PyCFunction)Certificate_parse,                  METH_VARARGS | METH_CLASS,  Certificate_parse_doc},
     {"set_trust_attributes",   (PyCFunction)Certificate_set_trust_attributes,   METH_VARARGS,               Certificate_set_trust_attributes_doc},
     {"find_kea_type",          (PyCFunction)Certificate_find_kea_type,          METH_NOARGS,                Certificate_find_kea_type_doc},
     {"make_ca_nickname",       (PyCFunction)Certificate_make_ca_nickname,       METH_NOARGS,                Certificate_make_ca_nickname_doc},
@@ -10536,6 +11218,12 @@ Certificate_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         return NULL;
     }
     self->cert = NULL;
+    self->hash = -1;
+    self->py_subject = NULL;
+    self->py_issuer = NULL;
+    self->py_signed_data = NULL;
+    self->py_subject_public_key_info = NULL;
+    self->py_extensions = NULL;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -10550,6 +11238,12 @@ Certificate_dealloc(Certificate* self)
     print_cert(self->cert, "%s before CERT_DestroyCertificate" ,__FUNCTION__);
 #endif
 
+    Py_CLEAR(self->py_subject);
+    Py_CLEAR(self->py_issuer);
+    Py_CLEAR(self->py_signed_data);
+    Py_CLEAR(self->py_subject_public_key_info);
+    Py_CLEAR(self->py_extensions);
+
     if (self->cert) {
         CERT_DestroyCertificate(self->cert);
     }
@@ -10576,6 +11270,17 @@ An X509 Certificate object.\n\
 The Certificate is initialized from the supplied DER data. The\n\
 Certificate is added to the NSS temporary database. If perm is True\n\
 then the Certificate is also permanently written into certdb.\n\
+\n\
+The subject, issuer, extensions, subject_public_key_info and\n\
+signed_data properties are decoded on first access, later accesses\n\
+return the same object.\n\
+\n\
+Certificates compare equal and hash alike when their DER encoding is\n\
+identical, so they may be used as dict keys and set members.\n\
+\n\
+A Certificate exports its DER encoding as a read-only buffer, see\n\
+`Certificate.der_view`, which may be passed to any function accepting\n\
+a buffer (e.g. `nss.sha256_digest()`) without copying.\n\
 ");
 
 static int
@@ -10647,6 +11352,62 @@ Certificate_init(Certificate *self, PyObject *args, PyObject *kwds)
     return result;
 }
 
+/* =========================== Buffer Protocol ========================== */
+
+/*
+ * Export the DER data read-only. The exported view holds a reference
+ * to the Certificate which keeps the CERTCertificate alive.
+ */
+static int
+Certificate_GetBuffer(PyObject *obj, Py_buffer *view, int flags)
+{
+    Certificate *self = (Certificate *)obj;
+
+    if (self->cert == NULL) {
+        PyErr_SetString(PyExc_BufferError, "Certificate is not initialized");
+        if (view) {
+            view->obj = NULL;
+        }
+        return -1;
+    }
+
+    return PyBuffer_FillInfo(view, obj,
+                             self->cert->derCert.data,
+                             self->cert->derCert.len,
+                             1, flags);
+}
+
+#if PY_MAJOR_VERSION >= 3
+
+static PyBufferProcs Certificate_as_buffer = {
+    Certificate_GetBuffer,      /* bf_getbuffer */
+    NULL,                       /* bf_releasebuffer */
+};
+
+#else /* PY_MAJOR_VERSION < 3 */
+
+static Py_ssize_t
+Certificate_buffer_getbuf(PyObject *obj, Py_ssize_t index, void **ptr)
+{
+    Certificate *self = (Certificate *) obj;
+    if (index != 0) {
+        PyErr_SetString(PyExc_SystemError, "Accessing non-existent segment");
+        return -1;
+    }
+    *ptr = self->cert->derCert.data;
+    return self->cert->derCert.len;
+}
+
+static PyBufferProcs Certificate_as_buffer = {
+    Certificate_buffer_getbuf,			/* bf_getreadbuffer */
+    NULL,					/* bf_getwritebuffer */
+    SecItem_buffer_getsegcount,			/* bf_getsegcount */
+    NULL,					/* bf_getcharbuffer */
+    Certificate_GetBuffer,			/* bf_getbuffer */
+    NULL,					/* bf_releasebuffer */
+};
+
+#endif /* PY_MAJOR_VERSION >= 3 */
 
 static PyTypeObject CertificateType = {
     PyVarObject_HEAD_INIT(NULL, 0)
@@ -10662,17 +11423,21 @@ static PyTypeObject CertificateType = {
     0,						/* tp_as_number */
     0,						/* tp_as_sequence */
     0,						/* tp_as_mapping */
-    0,						/* tp_hash */
+    (hashfunc)Certificate_hash,			/* tp_hash */
     0,						/* tp_call */
     (reprfunc)Certificate_str,			/* tp_str */
     0,						/* tp_getattro */
     0,						/* tp_setattro */
-    0,						/* tp_as_buffer */
+    &Certificate_as_buffer,			/* tp_as_buffer */
+#if PY_MAJOR_VERSION >= 3
     Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */
+#else
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_NEWBUFFER,	/* tp_flags */
+#endif
     Certificate_doc,				/* tp_doc */
     0,						/* tp_traverse */
     0,						/* tp_clear */
-    0,						/* tp_richcompare */
+    (richcmpfunc)Certificate_richcompare,	/* tp_richcompare */
     0,						/* tp_weaklistoffset */
     0,						/* tp_iter */
     0,						/* tp_iternext */
@@ -10770,6 +11535,40 @@ Certificate_new_from_signed_der_secitem(SECItem *der)
 #endif
 }
 
+/*
+ * libnss3 exports CERT_DecodeDERCertificate() from cert.h only under
+ * this name (see nss.def).
+ */
+extern CERTCertificate *
+__CERT_DecodeDERCertificate(SECItem *derSignedCert, PRBool copyDER, char *nickname);
+
+/*
+ * Decode der into a new Certificate without registering it with any
+ * certdb or the temporary certificate store. The GIL is released
+ * while decoding.
+ */
+static PyObject *
+Certificate_new_from_der_parse_only(SECItem *der)
+{
+    CERTCertificate *cert = NULL;
+    PyObject *py_cert = NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    cert = __CERT_DecodeDERCertificate(der, PR_TRUE, NULL);
+    Py_END_ALLOW_THREADS
+
+    if (cert == NULL) {
+        return set_nspr_error(NULL);
+    }
+
+    if ((py_cert = Certificate_new_from_CERTCertificate(cert, false)) == NULL) {
+        CERT_DestroyCertificate(cert);
+        return NULL;
+    }
+
+    return py_cert;
+}
+
 /* ========================================================================== */
 /* ============================= PrivateKey Class =========================== */
 /* ========================================================================== */
@@ -10788,7 +11587,85 @@ static PyMemberDef PrivateKey_members[] = {
 /* ============================== Class Methods ============================= */
 
 
+PyDoc_STRVAR(PrivateKey_sign_doc,
+"sign(mechanism, data, sec_param=None) -> signature\n\
+\n\
+:Parameters:\n\
+    mechanism : int\n\
+        signature mechanism enumeration constant (CKM_*)\n\
+        e.g. CKM_SHA256_RSA_PKCS, CKM_ECDSA_SHA256, CKM_RSA_PKCS\n\
+    data : buffer\n\
+        the data to sign. For combined hash and sign mechanisms such\n\
+        as CKM_SHA256_RSA_PKCS this is the message itself, for raw\n\
+        mechanisms such as CKM_RSA_PKCS or CKM_ECDSA it is the\n\
+        (encoded) digest.\n\
+    sec_param : SecItem object or None\n\
+        mechanism parameters (e.g. CK_RSA_PKCS_PSS_PARAMS) or None.\n\
+\n\
+Sign data with this private key and return the signature as\n\
+buffer. EC signatures are returned in raw r||s form.\n\
+");
+static PyObject *
+PrivateKey_sign(PrivateKey *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"mechanism", "data", "sec_param", NULL};
+    unsigned long mechanism;
+    Py_buffer data;
+    SecItem *py_sec_param = NULL;
+    SECItem data_item;
+    SECItem sig_item;
+    PyObject *py_signature = NULL;
+    int sig_len;
+    SECStatus status;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "ky*|O&:sign", kwlist,
+                                     &mechanism, &data,
+                                     SecItemOrNoneConvert, &py_sec_param))
+        return NULL;
+
+    if ((sig_len = PK11_SignatureLen(self->private_key)) <= 0) {
+        PyBuffer_Release(&data);
+        return set_nspr_error("unable to determine signature length");
+    }
+
+    if ((py_signature = PyBytes_FromStringAndSize(NULL, sig_len)) == NULL) {
+        PyBuffer_Release(&data);
+        return NULL;
+    }
+
+    data_item.type = siBuffer;
+    data_item.data = data.buf;
+    data_item.len = data.len;
+    sig_item.type = siBuffer;
+    sig_item.data = (unsigned char *)PyBytes_AS_STRING(py_signature);
+    sig_item.len = sig_len;
+
+    Py_BEGIN_ALLOW_THREADS
+    status = PK11_SignWithMechanism(self->private_key, mechanism,
+                                    py_sec_param ? &py_sec_param->item : NULL,
+                                    &sig_item, &data_item);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&data);
+
+    if (status != SECSuccess) {
+        Py_DECREF(py_signature);
+        return set_nspr_error(NULL);
+    }
+
+    if (sig_item.len != (unsigned int)sig_len) {
+        if (_PyBytes_Resize(&py_signature, sig_item.len) < 0) {
+            return NULL;
+        }
+    }
+
+    return py_signature;
+}
+
 static PyMethodDef PrivateKey_methods[] = {
+    {"sign", (PyCFunction)PrivateKey_sign, METH_VARARGS|METH_KEYWORDS, PrivateKey_sign_doc},
     {NULL, NULL}  /* Sentinel */
 };
 
@@ -10893,47 +11770,313 @@ PrivateKey_new_from_SECKEYPrivateKey(SECKEYPrivateKey *private_key)
 /* ============================== SignedCRL Class =========================== */
 /* ========================================================================== */
 
-/* ============================ Attribute Access ============================ */
-
-static
-PyGetSetDef SignedCRL_getseters[] = {
-    {NULL}  /* Sentinel */
-};
+/*
+ * Serial numbers are compared as unsigned big endian integers, leading
+ * zero octets (added by DER to keep an integer positive) are ignored.
+ */
+static int
+crl_serial_cmp(const unsigned char *a, unsigned int a_len,
+               const unsigned char *b, unsigned int b_len)
+{
+    while (a_len > 1 && *a == 0) {
+        a++;
+        a_len--;
+    }
+    while (b_len > 1 && *b == 0) {
+        b++;
+        b_len--;
+    }
 
-static PyMemberDef SignedCRL_members[] = {
-    {NULL}  /* Sentinel */
-};
+    if (a_len != b_len) {
+        return a_len < b_len ? -1 : 1;
+    }
+    return memcmp(a, b, a_len);
+}
 
-/* ============================== Class Methods ============================= */
+static int
+crl_entry_serial_cmp(const void *a, const void *b)
+{
+    const CERTCrlEntry *entry_a = *(const CERTCrlEntry **)a;
+    const CERTCrlEntry *entry_b = *(const CERTCrlEntry **)b;
 
-PyDoc_STRVAR(SignedCRL_delete_permanently_doc,
-"delete_permanently()\n\
-\n\
-Permanently remove the CRL from the database.\n\
-");
+    return crl_serial_cmp(entry_a->serialNumber.data, entry_a->serialNumber.len,
+                          entry_b->serialNumber.data, entry_b->serialNumber.len);
+}
 
-static PyObject *
-SignedCRL_delete_permanently(SignedCRL *self, PyObject *args)
+/*
+ * Convert the non-negative integer obj to big endian octets allocated
+ * with PyMem_Malloc.
+ */
+static int
+pylong_to_serial(PyObject *obj, unsigned char **serial, unsigned int *serial_len)
 {
-    TraceMethodEnter(self);
+    PyObject *py_hex = NULL;
+    PyObject *py_bytes = NULL;
+    const char *hex;
+    Py_ssize_t hex_len, i;
+    unsigned char *data;
+    unsigned int len;
+    int c, nibble;
 
-    if (SEC_DeletePermCRL(self->signed_crl) != SECSuccess) {
-        return set_nspr_error(NULL);
+    if ((py_hex = PyNumber_ToBase(obj, 16)) == NULL) {
+        return -1;
+    }
+    py_bytes = PyBaseString_UTF8(py_hex, "serial");
+    Py_DECREF(py_hex);
+    if (py_bytes == NULL) {
+        return -1;
     }
 
-    Py_RETURN_NONE;
-}
+    hex = PyBytes_AS_STRING(py_bytes);
+    if (hex[0] == '-') {
+        Py_DECREF(py_bytes);
+        PyErr_SetString(PyExc_ValueError, "serial number must not be negative");
+        return -1;
+    }
 
-static PyMethodDef SignedCRL_methods[] = {
-    {"delete_permanently", (PyCFunction)SignedCRL_delete_permanently, METH_NOARGS,  SignedCRL_delete_permanently_doc},
-    {NULL, NULL}  /* Sentinel */
-};
+    /* skip the "0x" prefix */
+    hex += 2;
+    hex_len = PyBytes_GET_SIZE(py_bytes) - 2;
+    len = (hex_len + 1) / 2;
 
-/* =========================== Class Construction =========================== */
+    if ((data = PyMem_Malloc(len)) == NULL) {
+        Py_DECREF(py_bytes);
+        PyErr_NoMemory();
+        return -1;
+    }
+    memset(data, 0, len);
 
-static PyObject *
-SignedCRL_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
-{
+    /* fill from the least significant digit */
+    for (i = 0; i < hex_len; i++) {
+        c = hex[hex_len - 1 - i];
+        nibble = Py_ISDIGIT(c) ? c - '0' : Py_TOLOWER(c) - 'a' + 10;
+        data[len - 1 - i / 2] |= (i & 1) ? nibble << 4 : nibble;
+    }
+    Py_DECREF(py_bytes);
+
+    *serial = data;
+    *serial_len = len;
+    return 0;
+}
+
+/*
+ * Complete the decoding of the CRL entries if the CRL was decoded
+ * with CRL_DECODE_SKIP_ENTRIES and count them.
+ */
+static int
+SignedCRL_decode_entries(SignedCRL *self)
+{
+    CERTCrlEntry **entries;
+    Py_ssize_t n_entries = 0;
+
+    if (self->n_entries >= 0) {
+        return 0;
+    }
+
+    if (CERT_CompleteCRLDecodeEntries(self->signed_crl) != SECSuccess) {
+        set_nspr_error("could not decode CRL entries");
+        return -1;
+    }
+
+    for (entries = self->signed_crl->crl.entries; entries && *entries; entries++) {
+        n_entries++;
+    }
+    self->n_entries = n_entries;
+
+    return 0;
+}
+
+/*
+ * Build the index of the entries sorted by serial number used by
+ * is_revoked(), once per CRL.
+ */
+static int
+SignedCRL_build_serial_index(SignedCRL *self)
+{
+    if (self->serial_index) {
+        return 0;
+    }
+
+    if (SignedCRL_decode_entries(self) < 0) {
+        return -1;
+    }
+
+    if ((self->serial_index = PyMem_New(CERTCrlEntry *, MAX(self->n_entries, 1))) == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    if (self->n_entries) {
+        memcpy(self->serial_index, self->signed_crl->crl.entries,
+               self->n_entries * sizeof(CERTCrlEntry *));
+        qsort(self->serial_index, self->n_entries, sizeof(CERTCrlEntry *),
+              crl_entry_serial_cmp);
+    }
+
+    return 0;
+}
+
+/* ============================ Attribute Access ============================ */
+
+static PyObject *
+SignedCRL_get_der_view(SignedCRL *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return PyMemoryView_FromObject((PyObject *)self);
+}
+
+static PyObject *
+SignedCRL_get_entries(SignedCRL *self, void *closure)
+{
+    CRLEntries *py_entries = NULL;
+
+    TraceMethodEnter(self);
+
+    if (SignedCRL_decode_entries(self) < 0) {
+        return NULL;
+    }
+
+    if ((py_entries = (CRLEntries *) CRLEntries_new(&CRLEntriesType, NULL, NULL)) == NULL) {
+        return NULL;
+    }
+
+    Py_INCREF(self);
+    py_entries->py_crl = self;
+
+    return (PyObject *)py_entries;
+}
+
+static
+PyGetSetDef SignedCRL_getseters[] = {
+    {"der_view", (getter)SignedCRL_get_der_view, NULL,
+     "read-only memoryview of the CRL DER data, shares memory with the CRL",  NULL},
+    {"entries",  (getter)SignedCRL_get_entries,  NULL,
+     "sequence of the revoked certificates as `CRLEntry` objects, in CRL order",  NULL},
+    {NULL}  /* Sentinel */
+};
+
+static PyMemberDef SignedCRL_members[] = {
+    {NULL}  /* Sentinel */
+};
+
+/* ============================== Class Methods ============================= */
+
+PyDoc_STRVAR(SignedCRL_delete_permanently_doc,
+"delete_permanently()\n\
+\n\
+Permanently remove the CRL from the database.\n\
+");
+
+static PyObject *
+SignedCRL_delete_permanently(SignedCRL *self, PyObject *args)
+{
+    TraceMethodEnter(self);
+
+    if (SEC_DeletePermCRL(self->signed_crl) != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    verify_cache_invalidate();
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(SignedCRL_is_revoked_doc,
+"is_revoked(serial_or_cert) -> bool\n\
+\n\
+:Parameters:\n\
+    serial_or_cert : int or Certificate object\n\
+        serial number of a certificate issued by the CRL issuer or the\n\
+        certificate itself\n\
+\n\
+Returns True if the CRL lists the serial number as revoked. A\n\
+`Certificate` is only considered revoked if its issuer is the issuer\n\
+of the CRL.\n\
+\n\
+The first call sorts the CRL entries by serial number, lookups are\n\
+then a binary search. Nothing is looked up in the certdb, the CRL\n\
+signature is not verified.\n\
+");
+
+static PyObject *
+SignedCRL_is_revoked(SignedCRL *self, PyObject *args)
+{
+    PyObject *arg = NULL;
+    CERTCertificate *cert = NULL;
+    unsigned char *serial = NULL;
+    unsigned int serial_len = 0;
+    Py_ssize_t lo, hi, mid;
+    CERTCrlEntry *entry;
+    int cmp;
+    bool revoked = false;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "O:is_revoked", &arg))
+        return NULL;
+
+    if (PyCertificate_Check(arg)) {
+        cert = ((Certificate *)arg)->cert;
+        if (!SECITEM_ItemsAreEqual(&cert->derIssuer, &self->signed_crl->crl.derName)) {
+            Py_RETURN_FALSE;
+        }
+    } else if (PyInteger_Check(arg)) {
+        if (pylong_to_serial(arg, &serial, &serial_len) < 0) {
+            return NULL;
+        }
+    } else {
+        PyErr_Format(PyExc_TypeError, "must be int or Certificate, not %.200s",
+                     Py_TYPE(arg)->tp_name);
+        return NULL;
+    }
+
+    if (SignedCRL_build_serial_index(self) < 0) {
+        PyMem_Free(serial);
+        return NULL;
+    }
+
+    lo = 0;
+    hi = self->n_entries;
+    while (lo < hi) {
+        mid = lo + (hi - lo) / 2;
+        entry = self->serial_index[mid];
+        if (cert) {
+            cmp = crl_serial_cmp(entry->serialNumber.data, entry->serialNumber.len,
+                                 cert->serialNumber.data, cert->serialNumber.len);
+        } else {
+            cmp = crl_serial_cmp(entry->serialNumber.data, entry->serialNumber.len,
+                                 serial, serial_len);
+        }
+        if (cmp == 0) {
+            revoked = true;
+            break;
+        }
+        if (cmp < 0) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+    PyMem_Free(serial);
+
+    if (revoked) {
+        Py_RETURN_TRUE;
+    }
+    Py_RETURN_FALSE;
+}
+
+static PyMethodDef SignedCRL_methods[] = {
+    {"delete_permanently", (PyCFunction)SignedCRL_delete_permanently, METH_NOARGS,  SignedCRL_delete_permanently_doc},
+    {"is_revoked",         (PyCFunction)SignedCRL_is_revoked,         METH_VARARGS, SignedCRL_is_revoked_doc},
+    {NULL, NULL}  /* Sentinel */
+};
+
+/* =========================== Class Construction =========================== */
+
+static PyObject *
+SignedCRL_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
     SignedCRL *self;
 
     TraceObjNewEnter(type);
@@ -10942,6 +12085,9 @@ SignedCRL_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         return NULL;
     }
     self->signed_crl = NULL;
+    self->py_der = NULL;
+    self->n_entries = -1;
+    self->serial_index = NULL;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -10952,8 +12098,10 @@ SignedCRL_dealloc(SignedCRL* self)
 {
     TraceMethodEnter(self);
 
+    PyMem_Free(self->serial_index);
     if (self->signed_crl)
         SEC_DestroyCrl(self->signed_crl);
+    Py_XDECREF(self->py_der);
 
     Py_TYPE(self)->tp_free((PyObject*)self);
 }
@@ -10967,6 +12115,62 @@ SignedCRL_init(SignedCRL *self, PyObject *args, PyObject *kwds)
     TraceMethodEnter(self);
     return 0;
 }
+/* =========================== Buffer Protocol ========================== */
+
+/*
+ * Export the DER data read-only. The exported view holds a reference
+ * to the SignedCRL which keeps the CERTSignedCrl alive.
+ */
+static int
+SignedCRL_GetBuffer(PyObject *obj, Py_buffer *view, int flags)
+{
+    SignedCRL *self = (SignedCRL *)obj;
+
+    if (self->signed_crl == NULL || self->signed_crl->derCrl == NULL) {
+        PyErr_SetString(PyExc_BufferError, "SignedCRL has no DER data");
+        if (view) {
+            view->obj = NULL;
+        }
+        return -1;
+    }
+
+    return PyBuffer_FillInfo(view, obj,
+                             self->signed_crl->derCrl->data,
+                             self->signed_crl->derCrl->len,
+                             1, flags);
+}
+
+#if PY_MAJOR_VERSION >= 3
+
+static PyBufferProcs SignedCRL_as_buffer = {
+    SignedCRL_GetBuffer,        /* bf_getbuffer */
+    NULL,                       /* bf_releasebuffer */
+};
+
+#else /* PY_MAJOR_VERSION < 3 */
+
+static Py_ssize_t
+SignedCRL_buffer_getbuf(PyObject *obj, Py_ssize_t index, void **ptr)
+{
+    SignedCRL *self = (SignedCRL *) obj;
+    if (index != 0) {
+        PyErr_SetString(PyExc_SystemError, "Accessing non-existent segment");
+        return -1;
+    }
+    *ptr = self->signed_crl->derCrl->data;
+    return self->signed_crl->derCrl->len;
+}
+
+static PyBufferProcs SignedCRL_as_buffer = {
+    SignedCRL_buffer_getbuf,			/* bf_getreadbuffer */
+    NULL,					/* bf_getwritebuffer */
+    SecItem_buffer_getsegcount,			/* bf_getsegcount */
+    NULL,					/* bf_getcharbuffer */
+    SignedCRL_GetBuffer,			/* bf_getbuffer */
+    NULL,					/* bf_releasebuffer */
+};
+
+#endif /* PY_MAJOR_VERSION >= 3 */
 
 static PyTypeObject SignedCRLType = {
     PyVarObject_HEAD_INIT(NULL, 0)
@@ -10987,8 +12191,12 @@ static PyTypeObject SignedCRLType = {
     0,						/* tp_str */
     0,						/* tp_getattro */
     0,						/* tp_setattro */
-    0,						/* tp_as_buffer */
+    &SignedCRL_as_buffer,			/* tp_as_buffer */
+#if PY_MAJOR_VERSION >= 3
     Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */
+#else
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_NEWBUFFER,	/* tp_flags */
+#endif
     SignedCRL_doc,				/* tp_doc */
     0,						/* tp_traverse */
     0,						/* tp_clear */
@@ -11025,6 +12233,284 @@ SignedCRL_new_from_CERTSignedCRL(CERTSignedCrl *signed_crl)
     return (PyObject *) self;
 }
 
+/* ========================================================================== */
+/* ============================== CRLEntry Class ============================ */
+/* ========================================================================== */
+
+/* ============================ Attribute Access ============================ */
+
+static PyObject *
+CRLEntry_get_serial_number(CRLEntry *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return integer_secitem_to_pylong(&self->entry->serialNumber);
+}
+
+static PyObject *
+CRLEntry_get_revocation_date(CRLEntry *self, void *closure)
+{
+    PRTime pr_time = 0;
+    double d_time;
+
+    TraceMethodEnter(self);
+
+    pr_time = time_choice_secitem_to_prtime(&self->entry->revocationDate);
+    LL_L2D(d_time, pr_time);
+
+    return PyFloat_FromDouble(d_time);
+}
+
+static PyObject *
+CRLEntry_get_revocation_date_str(CRLEntry *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return time_choice_secitem_to_pystr(&self->entry->revocationDate);
+}
+
+static PyObject *
+CRLEntry_get_reason(CRLEntry *self, void *closure)
+{
+    CERTCRLEntryReasonCode reason;
+
+    TraceMethodEnter(self);
+
+    if (CERT_FindCRLEntryReasonExten(self->entry, &reason) != SECSuccess) {
+        Py_RETURN_NONE;
+    }
+
+    return PyLong_FromLong(reason);
+}
+
+static PyObject *
+CRLEntry_get_extensions(CRLEntry *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return CERTCertExtension_tuple(self->entry->extensions, AsObject);
+}
+
+static
+PyGetSetDef CRLEntry_getseters[] = {
+    {"serial_number",        (getter)CRLEntry_get_serial_number,        NULL,
+     "serial number of the revoked certificate as an integer", NULL},
+    {"revocation_date",      (getter)CRLEntry_get_revocation_date,      NULL,
+     "date the certificate was revoked as a float in microseconds since the epoch", NULL},
+    {"revocation_date_str",  (getter)CRLEntry_get_revocation_date_str,  NULL,
+     "date the certificate was revoked as a string", NULL},
+    {"reason",               (getter)CRLEntry_get_reason,               NULL,
+     "CERTCRLEntryReasonCode of the reason code extension or None if the entry has none", NULL},
+    {"extensions",           (getter)CRLEntry_get_extensions,           NULL,
+     "entry extensions as a tuple of `CertificateExtension` objects", NULL},
+    {NULL}  /* Sentinel */
+};
+
+/* =========================== Class Construction =========================== */
+
+static PyObject *
+CRLEntry_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    CRLEntry *self;
+
+    TraceObjNewEnter(type);
+
+    if ((self = (CRLEntry *)type->tp_alloc(type, 0)) == NULL) {
+        return NULL;
+    }
+    self->py_crl = NULL;
+    self->entry = NULL;
+
+    TraceObjNewLeave(self);
+    return (PyObject *)self;
+}
+
+static void
+CRLEntry_dealloc(CRLEntry* self)
+{
+    TraceMethodEnter(self);
+
+    Py_XDECREF(self->py_crl);
+
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+PyDoc_STRVAR(CRLEntry_doc,
+"A revoked certificate listed in a `SignedCRL`, see `SignedCRL.entries`.");
+
+static PyTypeObject CRLEntryType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "nss.nss.CRLEntry",				/* tp_name */
+    sizeof(CRLEntry),				/* tp_basicsize */
+    0,						/* tp_itemsize */
+    (destructor)CRLEntry_dealloc,		/* tp_dealloc */
+    0,						/* tp_print */
+    0,						/* tp_getattr */
+    0,						/* tp_setattr */
+    0,						/* tp_compare */
+    0,						/* tp_repr */
+    0,						/* tp_as_number */
+    0,						/* tp_as_sequence */
+    0,						/* tp_as_mapping */
+    0,						/* tp_hash */
+    0,						/* tp_call */
+    0,						/* tp_str */
+    0,						/* tp_getattro */
+    0,						/* tp_setattro */
+    0,						/* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,				/* tp_flags */
+    CRLEntry_doc,				/* tp_doc */
+    0,						/* tp_traverse */
+    0,						/* tp_clear */
+    0,						/* tp_richcompare */
+    0,						/* tp_weaklistoffset */
+    0,						/* tp_iter */
+    0,						/* tp_iternext */
+    0,						/* tp_methods */
+    0,						/* tp_members */
+    CRLEntry_getseters,				/* tp_getset */
+    0,						/* tp_base */
+    0,						/* tp_dict */
+    0,						/* tp_descr_get */
+    0,						/* tp_descr_set */
+    0,						/* tp_dictoffset */
+    0,						/* tp_init */
+    0,						/* tp_alloc */
+    0,/* NULL cannot be directly created */	/* tp_new */
+};
+
+static PyObject *
+CRLEntry_new_from_CERTCrlEntry(SignedCRL *py_crl, CERTCrlEntry *entry)
+{
+    CRLEntry *self = NULL;
+
+    TraceObjNewEnter(NULL);
+    if ((self = (CRLEntry *) CRLEntry_new(&CRLEntryType, NULL, NULL)) == NULL) {
+        return NULL;
+    }
+
+    Py_INCREF(py_crl);
+    self->py_crl = py_crl;
+    self->entry = entry;
+
+    TraceObjNewLeave(self);
+    return (PyObject *) self;
+}
+
+/* ========================================================================== */
+/* ============================= CRLEntries Class =========================== */
+/* ========================================================================== */
+
+/* =========================== Sequence Protocol ============================ */
+
+static Py_ssize_t
+CRLEntries_length(CRLEntries *self)
+{
+    return self->py_crl->n_entries;
+}
+
+static PyObject *
+CRLEntries_item(CRLEntries *self, register Py_ssize_t i)
+{
+    if (i < 0 || i >= self->py_crl->n_entries) {
+        PyErr_SetString(PyExc_IndexError, "CRLEntries index out of range");
+        return NULL;
+    }
+
+    return CRLEntry_new_from_CERTCrlEntry(self->py_crl,
+                                          self->py_crl->signed_crl->crl.entries[i]);
+}
+
+/* =========================== Class Construction =========================== */
+
+static PyObject *
+CRLEntries_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    CRLEntries *self;
+
+    TraceObjNewEnter(type);
+
+    if ((self = (CRLEntries *)type->tp_alloc(type, 0)) == NULL) {
+        return NULL;
+    }
+    self->py_crl = NULL;
+
+    TraceObjNewLeave(self);
+    return (PyObject *)self;
+}
+
+static void
+CRLEntries_dealloc(CRLEntries* self)
+{
+    TraceMethodEnter(self);
+
+    Py_XDECREF(self->py_crl);
+
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+PyDoc_STRVAR(CRLEntries_doc,
+"The entries of a `SignedCRL`, see `SignedCRL.entries`.\n\
+\n\
+A `CRLEntry` object is only created when an entry is accessed, a CRL\n\
+with millions of entries can be indexed and iterated without\n\
+materializing them all.\n\
+");
+
+static PySequenceMethods CRLEntries_as_sequence = {
+    (lenfunc)CRLEntries_length,			/* sq_length */
+    0,						/* sq_concat */
+    0,						/* sq_repeat */
+    (ssizeargfunc)CRLEntries_item,		/* sq_item */
+    0,						/* sq_slice */
+    0,						/* sq_ass_item */
+    0,						/* sq_ass_slice */
+    0,						/* sq_contains */
+    0,						/* sq_inplace_concat */
+    0,						/* sq_inplace_repeat */
+};
+
+static PyTypeObject CRLEntriesType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "nss.nss.CRLEntries",			/* tp_name */
+    sizeof(CRLEntries),				/* tp_basicsize */
+    0,						/* tp_itemsize */
+    (destructor)CRLEntries_dealloc,		/* tp_dealloc */
+    0,						/* tp_print */
+    0,						/* tp_getattr */
+    0,						/* tp_setattr */
+    0,						/* tp_compare */
+    0,						/* tp_repr */
+    0,						/* tp_as_number */
+    &CRLEntries_as_sequence,			/* tp_as_sequence */
+    0,						/* tp_as_mapping */
+    0,						/* tp_hash */
+    0,						/* tp_call */
+    0,						/* tp_str */
+    0,						/* tp_getattro */
+    0,						/* tp_setattro */
+    0,						/* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,				/* tp_flags */
+    CRLEntries_doc,				/* tp_doc */
+    0,						/* tp_traverse */
+    0,						/* tp_clear */
+    0,						/* tp_richcompare */
+    0,						/* tp_weaklistoffset */
+    0,						/* tp_iter */
+    0,						/* tp_iternext */
+    0,						/* tp_methods */
+    0,						/* tp_members */
+    0,						/* tp_getset */
+    0,						/* tp_base */
+    0,						/* tp_dict */
+    0,						/* tp_descr_get */
+    0,						/* tp_descr_set */
+    0,						/* tp_dictoffset */
+    0,						/* tp_init */
+    0,						/* tp_alloc */
+    0,/* NULL cannot be directly created */	/* tp_new */
+};
+
 /* ========================================================================== */
 /* =============================== AVA Class ================================ */
 /* ========================================================================== */
@@ -11144,13 +12630,122 @@ CERTAVA_compare(CERTAVA *a, CERTAVA *b)
         return -2;
     }
 
-    int_cmp_result = PyUnicode_Compare(a_val_str_lower, b_val_str_lower);
+    int_cmp_result = PyUnicode_Compare(a_val_str_lower, b_val_str_lower);
+
+    Py_DECREF(a_val_str);
+    Py_DECREF(b_val_str);
+    Py_DECREF(a_val_str_lower);
+    Py_DECREF(b_val_str_lower);
+    return (int_cmp_result == 0) ? 0 : ((int_cmp_result < 0) ? -1 : 1);
+}
+
+/*
+ * Hash an AVA consistently with both CERTAVA_compare() and NSS's
+ * CERT_CompareAVA(). Values which compare equal under either may
+ * differ in encoding, letter case and (for PrintableString) runs of
+ * white space, so the value is hashed in decoded, lower cased, white
+ * space removed form. ASCII values, by far the most common, are hashed
+ * directly from the decoded octets, others go through Python's
+ * unicode lower() and split() and their UTF-8 form is hashed the same
+ * way. Returns -1 with an exception set on error.
+ */
+static Py_hash_t
+CERTAVA_hash(CERTAVA *ava)
+{
+    SECItem *value_item = NULL;
+    PyObject *py_value = NULL;
+    PyObject *py_lower = NULL;
+    PyObject *py_words = NULL;
+    PyObject *py_key = NULL;
+    PyObject *py_utf8 = NULL;
+    const char *key;
+    Py_ssize_t key_len, i;
+    Py_hash_t hash, value_hash;
+    size_t key_hash = FNV_OFFSET_BASIS;
+    bool ascii = true;
+    unsigned char c;
+
+    if (ava == NULL) {
+        return 0;
+    }
+
+    if ((hash = SECItem_hash(&ava->type)) == -1) {
+        return -1;
+    }
+
+    if ((value_item = CERT_DecodeAVAValue(&ava->value)) == NULL) {
+        /* Undecodable values only ever compare equal byte for byte */
+        if ((value_hash = SECItem_hash(&ava->value)) == -1) {
+            return -1;
+        }
+        HASH_COMBINE(hash, value_hash);
+        return hash;
+    }
+
+    for (i = 0; i < value_item->len; i++) {
+        if (value_item->data[i] & 0x80) {
+            ascii = false;
+            break;
+        }
+    }
+
+    if (ascii) {
+        /* The ASCII white space of Python's str.split() */
+        for (i = 0; i < value_item->len; i++) {
+            c = value_item->data[i];
+            if ((c >= 0x09 && c <= 0x0d) || (c >= 0x1c && c <= 0x20)) {
+                continue;
+            }
+            FNV_UPDATE(key_hash, Py_TOLOWER(c));
+        }
+        SECITEM_FreeItem(value_item, PR_TRUE);
+        HASH_COMBINE(hash, fnv_hash_finish(key_hash));
+        return hash;
+    }
+
+    py_value = PyUnicode_DecodeUTF8((char *)value_item->data, value_item->len,
+                                    "replace");
+    SECITEM_FreeItem(value_item, PR_TRUE);
+    if (py_value == NULL) {
+        return -1;
+    }
+
+    if ((py_lower = PyUnicode_Lower(py_value)) == NULL) {
+        goto fail;
+    }
+
+    if ((py_words = PyUnicode_Split(py_lower, NULL, -1)) == NULL) {
+        goto fail;
+    }
+
+    if ((py_key = PyUnicode_Join(NULL, py_words)) == NULL) {
+        goto fail;
+    }
+
+    if ((py_utf8 = PyUnicode_AsUTF8String(py_key)) == NULL) {
+        goto fail;
+    }
+    key = PyBytes_AS_STRING(py_utf8);
+    key_len = PyBytes_GET_SIZE(py_utf8);
+    for (i = 0; i < key_len; i++) {
+        FNV_UPDATE(key_hash, key[i]);
+    }
+    HASH_COMBINE(hash, fnv_hash_finish(key_hash));
 
-    Py_DECREF(a_val_str);
-    Py_DECREF(b_val_str);
-    Py_DECREF(a_val_str_lower);
-    Py_DECREF(b_val_str_lower);
-    return (int_cmp_result == 0) ? 0 : ((int_cmp_result < 0) ? -1 : 1);
+    Py_DECREF(py_value);
+    Py_DECREF(py_lower);
+    Py_DECREF(py_words);
+    Py_DECREF(py_key);
+    Py_DECREF(py_utf8);
+    return hash;
+
+ fail:
+    Py_XDECREF(py_value);
+    Py_XDECREF(py_lower);
+    Py_XDECREF(py_words);
+    Py_XDECREF(py_key);
+    Py_XDECREF(py_utf8);
+    return -1;
 }
 
 static PyObject *
@@ -11159,8 +12754,8 @@ AVA_richcompare(AVA *self, AVA *other, int op)
     int cmp_result;
 
     if (!PyAVA_Check(other)) {
-        PyErr_SetString(PyExc_TypeError, "Bad type, must be AVA");
-        return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
     }
 
     cmp_result = CERTAVA_compare(self->ava, other->ava);
@@ -11170,6 +12765,12 @@ AVA_richcompare(AVA *self, AVA *other, int op)
     RETURN_COMPARE_RESULT(op, cmp_result)
 }
 
+static Py_hash_t
+AVA_hash(AVA *self)
+{
+    return CERTAVA_hash(self->ava);
+}
+
 static PyMethodDef AVA_methods[] = {
     {NULL, NULL}  /* Sentinel */
 };
@@ -11340,7 +12941,7 @@ static PyTypeObject AVAType = {
     0,						/* tp_as_number */
     0,						/* tp_as_sequence */
     0,						/* tp_as_mapping */
-    0,						/* tp_hash */
+    (hashfunc)AVA_hash,				/* tp_hash */
     0,						/* tp_call */
     0,						/* tp_str */
     0,						/* tp_getattro */
@@ -11460,14 +13061,41 @@ CERTRDN_compare(CERTRDN *a, CERTRDN *b)
     return 0;
 }
 
+/*
+ * Hash a RDN from its AVA hashes consistent with CERTRDN_compare()
+ * and CERT_CompareRDN(). The latter matches AVAs irrespective of
+ * their order so the AVA hashes are combined commutatively.
+ */
+static Py_hash_t
+CERTRDN_hash(CERTRDN *rdn)
+{
+    CERTAVA **avas, *ava;
+    Py_hash_t hash, ava_hash;
+    size_t ava_sum = 0;
+
+    hash = 0x345678;
+    if (rdn == NULL) {
+        return hash;
+    }
+
+    for (avas = rdn->avas; avas && (ava = *avas); avas++) {
+        if ((ava_hash = CERTAVA_hash(ava)) == -1) {
+            return -1;
+        }
+        ava_sum += (size_t)ava_hash;
+    }
+    HASH_COMBINE(hash, ava_sum);
+    return hash;
+}
+
 static PyObject *
 RDN_richcompare(RDN *self, RDN *other, int op)
 {
     int cmp_result;
 
     if (!PyRDN_Check(other)) {
-        PyErr_SetString(PyExc_TypeError, "Bad type, must be RDN");
-        return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
     }
 
     cmp_result = CERTRDN_compare(self->rdn, other->rdn);
@@ -11477,6 +13105,12 @@ RDN_richcompare(RDN *self, RDN *other, int op)
     RETURN_COMPARE_RESULT(op, cmp_result)
 }
 
+static Py_hash_t
+RDN_hash(RDN *self)
+{
+    return CERTRDN_hash(self->rdn);
+}
+
 static int
 RDN_contains(RDN *self, PyObject *arg)
 {
@@ -11901,7 +13535,7 @@ static PyTypeObject RDNType = {
     0,						/* tp_as_number */
     &RDN_as_sequence,				/* tp_as_sequence */
     &RDN_as_mapping,				/* tp_as_mapping */
-    0,						/* tp_hash */
+    (hashfunc)RDN_hash,				/* tp_hash */
     0,						/* tp_call */
     0,						/* tp_str */
     0,						/* tp_getattro */
@@ -12400,8 +14034,8 @@ DN_richcompare(DN *self, DN *other, int op)
     int cmp_result;
 
     if (!PyDN_Check(other)) {
-        PyErr_SetString(PyExc_TypeError, "Bad type, must be DN");
-        return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
     }
 
     cmp_result = CERT_CompareName(&self->name, &other->name);
@@ -12409,6 +14043,44 @@ DN_richcompare(DN *self, DN *other, int op)
 
 }
 
+/*
+ * Hash a DN from its RDN hashes, in order, consistent with
+ * CERT_CompareName(). The hash is cached, a hashed DN may be a dict
+ * key and can no longer be modified.
+ */
+static Py_hash_t
+DN_hash(DN *self)
+{
+    CERTRDN **rdns, *rdn;
+    Py_hash_t hash, rdn_hash;
+
+    if (self->hash != -1) {
+        return self->hash;
+    }
+
+    hash = 0x456789;
+    for (rdns = self->name.rdns; rdns && (rdn = *rdns); rdns++) {
+        if ((rdn_hash = CERTRDN_hash(rdn)) == -1) {
+            return -1;
+        }
+        HASH_COMBINE(hash, rdn_hash);
+    }
+    self->hash = hash;
+    return hash;
+}
+
+static int
+DN_check_mutable(DN *self)
+{
+    if (self->hash != -1) {
+        PyErr_SetString(PyExc_TypeError,
+                        "DN has been hashed or belongs to a Certificate "
+                        "and can no longer be modified");
+        return -1;
+    }
+    return 0;
+}
+
 PyDoc_STRVAR(DN_add_rdn_doc,
 "add_rdn(rdn) \n\
 \n\
@@ -12417,6 +14089,10 @@ PyDoc_STRVAR(DN_add_rdn_doc,
         The rnd to add to the name\n\
 \n\
 Adds a RDN to the name.\n\
+\n\
+Raises TypeError once the DN has been hashed (e.g. used as a dict key\n\
+or set member), the DN must not change after that. The subject and\n\
+issuer DNs of a `Certificate` are shared and cannot be modified.\n\
 ");
 
 static PyObject *
@@ -12430,6 +14106,10 @@ DN_add_rdn(DN *self, PyObject *args)
                           &RDNType, &py_rdn))
         return NULL;
 
+    if (DN_check_mutable(self) < 0) {
+        return NULL;
+    }
+
     if (CERT_AddRDN(&self->name, py_rdn->rdn) != SECSuccess) {
         return set_nspr_error(NULL);
     }
@@ -12462,6 +14142,7 @@ DN_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     }
 
     memset(&self->name, 0, sizeof(self->name));
+    self->hash = -1;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -12597,6 +14278,10 @@ DN_init(DN *self, PyObject *args, PyObject *kwds)
 
     TraceMethodEnter(self);
 
+    if (DN_check_mutable(self) < 0) {
+        return -1;
+    }
+
     CERT_DestroyName(&self->name);
 
     if (PyTuple_GET_SIZE(args) > 0) {
@@ -12726,7 +14411,7 @@ static PyTypeObject DNType = {
     0,						/* tp_as_number */
     &DN_as_sequence,				/* tp_as_sequence */
     &DN_as_mapping,				/* tp_as_mapping */
-    0,						/* tp_hash */
+    (hashfunc)DN_hash,				/* tp_hash */
     0,						/* tp_call */
     0,						/* tp_str */
     0,						/* tp_getattro */
@@ -13222,6 +14907,152 @@ cert_get_cert_nicknames(PyObject *self, PyObject *args)
     return py_nicknames;
 }
 
+/*
+ * Files are memory mapped and processed in windows of this size so the
+ * address space needed stays bounded regardless of the file size.
+ */
+#define FILE_MAP_WINDOW_LEN (64 * 1024 * 1024)
+
+typedef SECStatus (*mapped_chunk_func)(void *arg, const unsigned char *buf,
+                                       Py_ssize_t len);
+
+/*
+ * Memory map the file open on fd, which is file_size octets long, and
+ * pass it to func one window at a time. Returns SECFailure with the
+ * NSPR error set if the file cannot be mapped or func fails.
+ *
+ * Does not touch any Python object and may be called without the GIL.
+ */
+static SECStatus
+process_mapped_file(PRFileDesc *fd, PRInt64 file_size,
+                    mapped_chunk_func func, void *arg)
+{
+    PRFileMap *file_map = NULL;
+    PRInt64 offset;
+    PRUint32 window_len;
+    void *addr;
+    SECStatus status = SECSuccess;
+
+    if (file_size == 0) {
+        return SECSuccess;
+    }
+
+    if ((file_map = PR_CreateFileMap(fd, file_size, PR_PROT_READONLY)) == NULL) {
+        return SECFailure;
+    }
+
+    for (offset = 0; offset < file_size && status == SECSuccess; offset += window_len) {
+        window_len = MIN(file_size - offset, FILE_MAP_WINDOW_LEN);
+
+        if ((addr = PR_MemMap(file_map, offset, window_len)) == NULL) {
+            status = SECFailure;
+            break;
+        }
+
+        status = func(arg, addr, window_len);
+        PR_MemUnmap(addr, window_len);
+    }
+
+    PR_CloseFileMap(file_map);
+    return status;
+}
+
+/*
+ * Open path for reading and return the file descriptor and its size.
+ * Returns NULL with the NSPR error set on failure.
+ */
+static PRFileDesc *
+open_mapped_file(const char *path, PRInt64 *file_size)
+{
+    PRFileDesc *fd;
+    PRFileInfo64 info;
+
+    if ((fd = PR_Open(path, PR_RDONLY, 0)) == NULL) {
+        return NULL;
+    }
+
+    if (PR_GetOpenFileInfo64(fd, &info) != PR_SUCCESS) {
+        PR_Close(fd);
+        return NULL;
+    }
+
+    *file_size = info.size;
+    return fd;
+}
+
+/*
+ * Compute the hash_alg digest of in_buf into out_buf, out_buf_len
+ * must be at least HASH_ResultLenByOidTag(hash_alg) octets.
+ *
+ * PK11_HashBuf takes a 32 bit length, larger buffers are digested
+ * through a digest context in MAX_PK11_CHUNK_LEN pieces.
+ *
+ * Does not touch any Python object and may be called without the GIL.
+ */
+static SECStatus
+pk11_hash_buf_nogil(SECOidTag hash_alg,
+                    unsigned char *out_buf, unsigned int out_buf_len,
+                    const unsigned char *in_buf, Py_ssize_t in_buf_len)
+{
+    PK11Context *pk11_context;
+    Py_ssize_t offset;
+    unsigned int out_len;
+    SECStatus status;
+
+    if (in_buf_len <= MAX_PK11_CHUNK_LEN) {
+        return PK11_HashBuf(hash_alg, out_buf, in_buf, in_buf_len);
+    }
+
+    if ((pk11_context = PK11_CreateDigestContext(hash_alg)) == NULL) {
+        return SECFailure;
+    }
+
+    if ((status = PK11_DigestBegin(pk11_context)) == SECSuccess) {
+        for (offset = 0; offset < in_buf_len; offset += MAX_PK11_CHUNK_LEN) {
+            if ((status = PK11_DigestOp(pk11_context, in_buf + offset,
+                                        MIN(in_buf_len - offset, MAX_PK11_CHUNK_LEN))) != SECSuccess) {
+                break;
+            }
+        }
+    }
+
+    if (status == SECSuccess) {
+        status = PK11_DigestFinal(pk11_context, out_buf, &out_len,
+                                  out_buf_len);
+    }
+
+    PK11_DestroyContext(pk11_context, PR_TRUE);
+    return status;
+}
+
+/*
+ * Digest the contents of in_view with hash_alg returning a new bytes
+ * object of hash_len octets. The GIL is released for large buffers.
+ */
+static PyObject *
+pk11_hash_view(SECOidTag hash_alg, unsigned int hash_len, Py_buffer *in_view)
+{
+    PyObject *py_out_buf = NULL;
+    SECStatus status;
+
+    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, hash_len)) == NULL) {
+        return NULL;
+    }
+
+    BEGIN_ALLOW_THREADS_IF(in_view->len >= GIL_RELEASE_THRESHOLD)
+    status = pk11_hash_buf_nogil(hash_alg,
+                                 (unsigned char *)PyBytes_AS_STRING(py_out_buf),
+                                 hash_len, in_view->buf, in_view->len);
+    END_ALLOW_THREADS_IF()
+
+    if (status != SECSuccess) {
+        Py_DECREF(py_out_buf);
+        return set_nspr_error(NULL);
+    }
+
+    return py_out_buf;
+}
+
 PyDoc_STRVAR(pk11_hash_buf_doc,
 "hash_buf(hash_alg, data) --> digest\n\
 \n\
@@ -13229,12 +15060,14 @@ PyDoc_STRVAR(pk11_hash_buf_doc,
     hash_alg : int\n\
         hash algorithm enumeration (SEC_OID_*)\n\
         e.g.: SEC_OID_MD5, SEC_OID_SHA1, SEC_OID_SHA256, SEC_OID_SHA512, etc.\n\
-    data : buffer or string\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
         buffer the digest will be computed for\n\
 \n\
 Computes a digest according to the hash_alg type.\n\
 Return the digest data as buffer object.\n\
 \n\
+The GIL is released while large buffers are digested.\n\
+\n\
 Note, if a hexidecimal string representation is desired then pass\n\
 result to data_to_hex()\n\
 ");
@@ -13242,44 +15075,29 @@ static PyObject *
 pk11_hash_buf(PyObject *self, PyObject *args)
 {
     unsigned long hash_alg;
-    unsigned char *in_data = NULL;
-    Py_ssize_t in_data_len = 0;
+    Py_buffer in_view;
     unsigned int hash_len;
     PyObject *py_out_buf = NULL;
-    void *out_buf = NULL;
-    Py_ssize_t out_buf_len;
 
     TraceMethodEnter(self);
 
 #if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "ky#:hash_buf",
-                          &hash_alg, &in_data, &in_data_len))
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "ky*:hash_buf", &hash_alg, &in_view))
         return NULL;
 #else
-    if (!PyArg_ParseTuple(args, "kt#:hash_buf",
-                          &hash_alg, &in_data, &in_data_len))
+    if (!PyArg_ParseTuple(args, "ks*:hash_buf", &hash_alg, &in_view))
         return NULL;
 #endif
 
     if ((hash_len = HASH_ResultLenByOidTag(hash_alg)) == 0) {
+        PyBuffer_Release(&in_view);
         return set_nspr_error("unable to determine resulting hash length for hash_alg = %s",
                               oid_tag_str(hash_alg));
     }
 
-    out_buf_len = hash_len;
-
-    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, out_buf_len)) == NULL) {
-        return NULL;
-    }
-
-    if ((out_buf = PyBytes_AsString(py_out_buf)) == NULL) {
-        return NULL;
-    }
-
-    if (PK11_HashBuf(hash_alg, out_buf, in_data, in_data_len) != SECSuccess) {
-        return set_nspr_error(NULL);
-    }
+    py_out_buf = pk11_hash_view(hash_alg, hash_len, &in_view);
+    PyBuffer_Release(&in_view);
 
     return py_out_buf;
 }
@@ -13288,7 +15106,7 @@ PyDoc_STRVAR(pk11_md5_digest_doc,
 "md5_digest(data) --> digest\n\
 \n\
 :Parameters:\n\
-    data : buffer or string\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
         buffer the digest will be computed for\n\
 \n\
 Returns 16 octet MD5 digest data as buffer object.\n\
@@ -13299,33 +15117,22 @@ result to data_to_hex()\n\
 static PyObject *
 pk11_md5_digest(PyObject *self, PyObject *args)
 {
-    unsigned char *in_data = NULL;
-    Py_ssize_t in_data_len = 0;
+    Py_buffer in_view;
     PyObject *py_out_buf = NULL;
-    void *out_buf;
 
     TraceMethodEnter(self);
 
 #if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:md5_digest", &in_data, &in_data_len))
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:md5_digest", &in_view))
         return NULL;
 #else
-    if (!PyArg_ParseTuple(args, "t#:md5_digest", &in_data, &in_data_len))
+    if (!PyArg_ParseTuple(args, "s*:md5_digest", &in_view))
         return NULL;
 #endif
 
-    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, MD5_LENGTH)) == NULL) {
-        return NULL;
-    }
-
-    if ((out_buf = PyBytes_AsString(py_out_buf)) == NULL) {
-        return NULL;
-    }
-
-    if (PK11_HashBuf(SEC_OID_MD5, out_buf, in_data, in_data_len) != SECSuccess) {
-        return set_nspr_error(NULL);
-    }
+    py_out_buf = pk11_hash_view(SEC_OID_MD5, MD5_LENGTH, &in_view);
+    PyBuffer_Release(&in_view);
 
     return py_out_buf;
 }
@@ -13334,7 +15141,7 @@ PyDoc_STRVAR(pk11_sha1_digest_doc,
 "sha1_digest(data) --> digest\n\
 \n\
 :Parameters:\n\
-    data : buffer or string\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
         buffer the digest will be computed for\n\
 \n\
 Returns 20 octet SHA1 digest data as buffer object.\n\
@@ -13345,33 +15152,22 @@ result to data_to_hex()\n\
 static PyObject *
 pk11_sha1_digest(PyObject *self, PyObject *args)
 {
-    unsigned char *in_data = NULL;
-    Py_ssize_t in_data_len = 0;
+    Py_buffer in_view;
     PyObject *py_out_buf = NULL;
-    void *out_buf;
 
     TraceMethodEnter(self);
 
 #if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:sha1_digest", &in_data, &in_data_len))
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:sha1_digest", &in_view))
         return NULL;
 #else
-    if (!PyArg_ParseTuple(args, "t#:sha1_digest", &in_data, &in_data_len))
+    if (!PyArg_ParseTuple(args, "s*:sha1_digest", &in_view))
         return NULL;
 #endif
 
-    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, SHA1_LENGTH)) == NULL) {
-        return NULL;
-    }
-
-    if ((out_buf = PyBytes_AsString(py_out_buf)) == NULL) {
-        return NULL;
-    }
-
-    if (PK11_HashBuf(SEC_OID_SHA1, out_buf, in_data, in_data_len) != SECSuccess) {
-        return set_nspr_error(NULL);
-    }
+    py_out_buf = pk11_hash_view(SEC_OID_SHA1, SHA1_LENGTH, &in_view);
+    PyBuffer_Release(&in_view);
 
     return py_out_buf;
 }
@@ -13380,7 +15176,7 @@ PyDoc_STRVAR(pk11_sha256_digest_doc,
 "sha256_digest(data) --> digest\n\
 \n\
 :Parameters:\n\
-    data : buffer or string\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
         buffer the digest will be computed for\n\
 \n\
 Returns 32 octet SHA256 digest data as buffer object.\n\
@@ -13389,83 +15185,275 @@ Note, if a hexidecimal string representation is desired then pass\n\
 result to data_to_hex()\n\
 ");
 
-static PyObject *
-pk11_sha256_digest(PyObject *self, PyObject *args)
-{
-    unsigned char *in_data = NULL;
-    Py_ssize_t in_data_len = 0;
-    PyObject *py_out_buf = NULL;
-    void *out_buf;
+static PyObject *
+pk11_sha256_digest(PyObject *self, PyObject *args)
+{
+    Py_buffer in_view;
+    PyObject *py_out_buf = NULL;
+
+    TraceMethodEnter(self);
+
+#if PY_MAJOR_VERSION >= 3
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:sha256_digest", &in_view))
+        return NULL;
+#else
+    if (!PyArg_ParseTuple(args, "s*:sha256_digest", &in_view))
+        return NULL;
+#endif
+
+    py_out_buf = pk11_hash_view(SEC_OID_SHA256, SHA256_LENGTH, &in_view);
+    PyBuffer_Release(&in_view);
+
+    return py_out_buf;
+}
+
+PyDoc_STRVAR(pk11_sha512_digest_doc,
+"sha512_digest(data) --> digest\n\
+\n\
+:Parameters:\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
+        buffer the digest will be computed for\n\
+\n\
+Returns 64 octet SHA512 digest data as buffer object.\n\
+\n\
+Note, if a hexidecimal string representation is desired then pass\n\
+result to data_to_hex()\n\
+");
+static PyObject *
+pk11_sha512_digest(PyObject *self, PyObject *args)
+{
+    Py_buffer in_view;
+    PyObject *py_out_buf = NULL;
+
+    TraceMethodEnter(self);
+
+#if PY_MAJOR_VERSION >= 3
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:sha512_digest", &in_view))
+        return NULL;
+#else
+    if (!PyArg_ParseTuple(args, "s*:sha512_digest", &in_view))
+        return NULL;
+#endif
+
+    py_out_buf = pk11_hash_view(SEC_OID_SHA512, SHA512_LENGTH, &in_view);
+    PyBuffer_Release(&in_view);
+
+    return py_out_buf;
+}
+
+PyDoc_STRVAR(pk11_digest_many_doc,
+"digest_many(hash_alg, data_items, packed=False) --> [digest, ...] or digests\n\
+\n\
+:Parameters:\n\
+    hash_alg : int\n\
+        hash algorithm enumeration (SEC_OID_*)\n\
+        e.g.: SEC_OID_MD5, SEC_OID_SHA1, SEC_OID_SHA256, SEC_OID_SHA512, etc.\n\
+    data_items : iterable of read buffer compatible objects\n\
+        each item is digested independently\n\
+    packed : bool\n\
+        if True return a single buffer containing the concatenated\n\
+        digests instead of a list\n\
+\n\
+Computes the hash_alg digest of every item in data_items. This is\n\
+equivalent to calling hash_buf() once per item but a single digest\n\
+context is reused for all the items and the loop runs without the\n\
+GIL, which removes most of the per item overhead when digesting\n\
+many small buffers.\n\
+\n\
+Returns a list of digests in the same order as data_items, or when\n\
+packed is True a buffer of len(data_items) * digest length octets.\n\
+");
+static PyObject *
+pk11_digest_many(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"hash_alg", "data_items", "packed", NULL};
+    unsigned long hash_alg;
+    PyObject *py_data_items = NULL;
+    PyObject *py_packed = NULL;
+    PyObject *py_seq = NULL;
+    PyObject *py_digests = NULL;
+    PyObject *py_result = NULL;
+    PyObject *py_digest = NULL;
+    PK11Context *pk11_context = NULL;
+    Py_buffer *views = NULL;
+    Py_ssize_t n_items, n_views = 0, total_len = 0, i, offset;
+    unsigned int hash_len, out_len;
+    unsigned char *out_buf;
+    SECStatus status = SECSuccess;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "kO|O!:digest_many", kwlist,
+                                     &hash_alg, &py_data_items,
+                                     &PyBool_Type, &py_packed))
+        return NULL;
+
+    if ((hash_len = HASH_ResultLenByOidTag(hash_alg)) == 0) {
+        return set_nspr_error("unable to determine resulting hash length for hash_alg = %s",
+                              oid_tag_str(hash_alg));
+    }
+
+    if ((py_seq = PySequence_Fast(py_data_items, "data_items must be iterable")) == NULL) {
+        return NULL;
+    }
+    n_items = PySequence_Fast_GET_SIZE(py_seq);
+
+    if ((views = PyMem_New(Py_buffer, n_items)) == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (n_views = 0; n_views < n_items; n_views++) {
+        if (PyObject_GetBuffer(PySequence_Fast_GET_ITEM(py_seq, n_views),
+                               &views[n_views], PyBUF_SIMPLE) != 0) {
+            goto exit;
+        }
+        total_len += views[n_views].len;
+    }
+
+    if ((py_digests = PyBytes_FromStringAndSize(NULL, n_items * hash_len)) == NULL) {
+        goto exit;
+    }
+    out_buf = (unsigned char *)PyBytes_AS_STRING(py_digests);
+
+    if ((pk11_context = PK11_CreateDigestContext(hash_alg)) == NULL) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    BEGIN_ALLOW_THREADS_IF(total_len >= GIL_RELEASE_THRESHOLD)
+    for (i = 0; i < n_items && status == SECSuccess; i++) {
+        if ((status = PK11_DigestBegin(pk11_context)) != SECSuccess) {
+            break;
+        }
+        for (offset = 0; offset < views[i].len; offset += MAX_PK11_CHUNK_LEN) {
+            if ((status = PK11_DigestOp(pk11_context,
+                                        (unsigned char *)views[i].buf + offset,
+                                        MIN(views[i].len - offset, MAX_PK11_CHUNK_LEN))) != SECSuccess) {
+                break;
+            }
+        }
+        if (status == SECSuccess) {
+            status = PK11_DigestFinal(pk11_context, out_buf + i * hash_len,
+                                      &out_len, hash_len);
+        }
+    }
+    END_ALLOW_THREADS_IF()
 
-    TraceMethodEnter(self);
+    if (status != SECSuccess) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
 
-#if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:sha256_digest", &in_data, &in_data_len))
-        return NULL;
-#else
-    if (!PyArg_ParseTuple(args, "t#:sha256_digest", &in_data, &in_data_len))
-        return NULL;
-#endif
+    if (py_packed && PyBoolAsPRBool(py_packed)) {
+        py_result = py_digests;
+        py_digests = NULL;
+        goto exit;
+    }
 
-    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, SHA256_LENGTH)) == NULL) {
-        return NULL;
+    if ((py_result = PyList_New(n_items)) == NULL) {
+        goto exit;
     }
 
-    if ((out_buf = PyBytes_AsString(py_out_buf)) == NULL) {
-        return NULL;
+    for (i = 0; i < n_items; i++) {
+        if ((py_digest = PyBytes_FromStringAndSize((char *)out_buf + i * hash_len,
+                                                   hash_len)) == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_digest);
     }
 
-    if (PK11_HashBuf(SEC_OID_SHA256, out_buf, in_data, in_data_len) != SECSuccess) {
-        return set_nspr_error(NULL);
+ exit:
+    if (pk11_context) {
+        PK11_DestroyContext(pk11_context, PR_TRUE);
+    }
+    for (i = 0; i < n_views; i++) {
+        PyBuffer_Release(&views[i]);
     }
+    PyMem_Free(views);
+    Py_XDECREF(py_digests);
+    Py_DECREF(py_seq);
 
-    return py_out_buf;
+    return py_result;
 }
 
-PyDoc_STRVAR(pk11_sha512_digest_doc,
-"sha512_digest(data) --> digest\n\
+static SECStatus
+digest_file_chunk(void *arg, const unsigned char *buf, Py_ssize_t len)
+{
+    return PK11_DigestOp((PK11Context *)arg, buf, len);
+}
+
+PyDoc_STRVAR(pk11_digest_file_doc,
+"digest_file(file, hash_alg) --> digest\n\
 \n\
 :Parameters:\n\
-    data : buffer or string\n\
-        buffer the digest will be computed for\n\
-\n\
-Returns 64 octet SHA512 digest data as buffer object.\n\
+    file : str\n\
+        pathname of the file to digest\n\
+    hash_alg : int\n\
+        hash algorithm enumeration (SEC_OID_*)\n\
+        e.g.: SEC_OID_MD5, SEC_OID_SHA1, SEC_OID_SHA256, SEC_OID_SHA512, etc.\n\
 \n\
-Note, if a hexidecimal string representation is desired then pass\n\
-result to data_to_hex()\n\
+Computes the hash_alg digest of the contents of file. The file is\n\
+memory mapped and digested in large chunks with the GIL released, it\n\
+is never read into a Python object.\n\
 ");
 static PyObject *
-pk11_sha512_digest(PyObject *self, PyObject *args)
+pk11_digest_file(PyObject *self, PyObject *args)
 {
-    unsigned char *in_data = NULL;
-    Py_ssize_t in_data_len = 0;
+    PyObject *py_path = NULL;
+    unsigned long hash_alg;
+    unsigned int hash_len, out_len;
+    PK11Context *pk11_context = NULL;
+    PRFileDesc *fd = NULL;
+    PRInt64 file_size = 0;
     PyObject *py_out_buf = NULL;
-    void *out_buf;
+    SECStatus status = SECFailure;
 
     TraceMethodEnter(self);
 
-#if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:sha512_digest", &in_data, &in_data_len))
+    if (!PyArg_ParseTuple(args, "O&k:digest_file",
+                          PyUnicode_FSConverter, &py_path, &hash_alg))
         return NULL;
-#else
-    if (!PyArg_ParseTuple(args, "t#:sha512_digest", &in_data, &in_data_len))
-        return NULL;
-#endif
 
-    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, SHA512_LENGTH)) == NULL) {
-        return NULL;
+    if ((hash_len = HASH_ResultLenByOidTag(hash_alg)) == 0) {
+        Py_DECREF(py_path);
+        return set_nspr_error("unable to determine resulting hash length for hash_alg = %s",
+                              oid_tag_str(hash_alg));
     }
 
-    if ((out_buf = PyBytes_AsString(py_out_buf)) == NULL) {
+    if ((py_out_buf = PyBytes_FromStringAndSize(NULL, hash_len)) == NULL) {
+        Py_DECREF(py_path);
         return NULL;
     }
 
-    if (PK11_HashBuf(SEC_OID_SHA512, out_buf, in_data, in_data_len) != SECSuccess) {
-        return set_nspr_error(NULL);
+    Py_BEGIN_ALLOW_THREADS
+    if ((fd = open_mapped_file(PyBytes_AS_STRING(py_path), &file_size)) != NULL &&
+        (pk11_context = PK11_CreateDigestContext(hash_alg)) != NULL &&
+        PK11_DigestBegin(pk11_context) == SECSuccess &&
+        process_mapped_file(fd, file_size, digest_file_chunk, pk11_context) == SECSuccess) {
+        status = PK11_DigestFinal(pk11_context,
+                                  (unsigned char *)PyBytes_AS_STRING(py_out_buf),
+                                  &out_len, hash_len);
+    }
+    if (pk11_context) {
+        PK11_DestroyContext(pk11_context, PR_TRUE);
+    }
+    if (fd) {
+        PR_Close(fd);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (status != SECSuccess) {
+        set_nspr_error("unable to digest file \"%s\"", PyBytes_AS_STRING(py_path));
+        Py_DECREF(py_path);
+        Py_DECREF(py_out_buf);
+        return NULL;
     }
 
+    Py_DECREF(py_path);
     return py_out_buf;
 }
 
@@ -14895,94 +16883,588 @@ PK11SymKey_derive(PyPK11SymKey *self, PyObject *args)
     return PyPK11SymKey_new_from_PK11SymKey(derived_key);
 }
 
-PyDoc_STRVAR(PK11SymKey_wrap_sym_key_doc,
-"wrap_sym_key(mechanism, sec_param, sym_key) -> SecItem\n\
+PyDoc_STRVAR(PK11SymKey_wrap_sym_key_doc,
+"wrap_sym_key(mechanism, sec_param, sym_key) -> SecItem\n\
+\n\
+:Parameters:\n\
+    mechanism : int\n\
+        key mechanism enumeration constant (CKM_*)\n\
+    sec_param : SecItem object or None\n\
+        mechanism parameters or None.\n\
+    sym_key : PK11SymKey object\n\
+        the symmetric key to wrap\n\
+\n\
+Wrap (encrypt) the supplied sym_key using the mechanism\n\
+and parameter. Return the wrapped key as a SecItem.\n\
+");
+static PyObject *
+PK11SymKey_wrap_sym_key(PyPK11SymKey *self, PyObject *args)
+{
+    unsigned long mechanism;
+    SecItem *py_sec_param;
+    PyPK11SymKey *py_sym_key = NULL;
+    SECItem wrapped_key;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "kO&O!:wrap_sym_key",
+                          &mechanism, SecItemOrNoneConvert, &py_sec_param,
+                          &PK11SymKeyType, &py_sym_key))
+        return NULL;
+
+    if (PK11_WrapSymKey(mechanism, py_sec_param ? &py_sec_param->item : NULL,
+                        self->pk11_sym_key, py_sym_key->pk11_sym_key,
+                        &wrapped_key) != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    return SecItem_new_from_SECItem(&wrapped_key, SECITEM_wrapped_key);
+}
+
+PyDoc_STRVAR(PK11SymKey_unwrap_sym_key_doc,
+"unwrap_sym_key(mechanism, sec_param, wrapped_key, target, operation, key_size) -> PK11SymKey\n\
+\n\
+:Parameters:\n\
+    mechanism : int\n\
+        key mechanism enumeration constant (CKM_*)\n\
+    sec_param : SecItem object or None\n\
+        mechanism parameters or None.\n\
+    wrapped_key : SecItem object\n\
+        the symmetric key to unwrap\n\
+    target : int\n\
+        key mechanism enumeration constant (CKM_*)\n\
+    operation : int\n\
+        type of operation. A (CKA_*) constant\n\
+        (e.g. CKA_ENCRYPT, CKA_DECRYPT, CKA_SIGN, CKA_VERIFY, CKA_DIGEST)\n\
+    key_size : int\n\
+        key size.\n\
+\n\
+Unwrap (decrypt) the supplied wrapped key.\n\
+Return the unwrapped key as a PK11SymKey.\n\
+");
+static PyObject *
+PK11SymKey_unwrap_sym_key(PyPK11SymKey *self, PyObject *args)
+{
+    unsigned long mechanism;
+    SecItem *py_sec_param;
+    unsigned long target;
+    unsigned long operation;
+    int key_size;
+    SecItem *py_wrapped_key = NULL;
+    PK11SymKey *sym_key = NULL;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "kO&O!kki:unwrap_sym_key",
+                          &mechanism, SecItemOrNoneConvert, &py_sec_param,
+                          &SecItemType, &py_wrapped_key,
+                          &target, &operation, &key_size))
+        return NULL;
+
+    if ((sym_key = PK11_UnwrapSymKey(self->pk11_sym_key, mechanism,
+                                     py_sec_param ? &py_sec_param->item : NULL,
+                                     &py_wrapped_key->item,
+                                     target, operation, key_size)) == NULL) {
+        return set_nspr_error(NULL);
+    }
+
+    return PyPK11SymKey_new_from_PK11SymKey(sym_key);
+}
+
+#ifdef HAVE_AEAD
+
+#define AEAD_TAG_LEN_DEFAULT 16
+
+typedef union {
+    CK_NSS_GCM_PARAMS gcm;
+    CK_NSS_AEAD_PARAMS nss_chacha20;
+    CK_SALSA20_CHACHA20_POLY1305_PARAMS chacha20;
+} AEADParams;
+
+/*
+ * Select the AEAD mechanism used with sym_key. If the caller did not
+ * name one it is derived from the key type so an AES key created for
+ * e.g. CKM_AES_CBC can still be used for AES-GCM.
+ */
+static CK_MECHANISM_TYPE
+aead_mechanism(PK11SymKey *sym_key, CK_MECHANISM_TYPE mechanism)
+{
+    if (mechanism == CKM_INVALID_MECHANISM) {
+        mechanism = PK11_GetMechanism(sym_key);
+    }
+
+    switch (mechanism) {
+    case CKM_AES_GCM:
+    case CKM_NSS_CHACHA20_POLY1305:
+    case CKM_CHACHA20_POLY1305:
+        return mechanism;
+    }
+
+    switch (PK11_GetKeyType(mechanism, 0)) {
+    case CKK_AES:
+        return CKM_AES_GCM;
+    case CKK_NSS_CHACHA20:
+        return CKM_NSS_CHACHA20_POLY1305;
+    case CKK_CHACHA20:
+        return CKM_CHACHA20_POLY1305;
+    }
+
+    PyErr_Format(PyExc_ValueError, "mechanism %lu is not an AEAD mechanism",
+                 mechanism);
+    return CKM_INVALID_MECHANISM;
+}
+
+/*
+ * Fill in the mechanism specific parameters for an AEAD operation and
+ * point param_item at them. The nonce and aad buffers must outlive the
+ * operation. Returns -1 with an exception set on error.
+ */
+static int
+aead_params_init(CK_MECHANISM_TYPE mechanism, unsigned int tag_len,
+                 Py_buffer *nonce, Py_buffer *aad,
+                 AEADParams *params, SECItem *param_item)
+{
+    param_item->type = siBuffer;
+    param_item->data = (unsigned char *)params;
+
+    switch (mechanism) {
+    case CKM_AES_GCM:
+        params->gcm.pIv = nonce->buf;
+        params->gcm.ulIvLen = nonce->len;
+        params->gcm.pAAD = aad->buf;
+        params->gcm.ulAADLen = aad->len;
+        params->gcm.ulTagBits = tag_len * 8;
+        param_item->len = sizeof(params->gcm);
+        return 0;
+    case CKM_NSS_CHACHA20_POLY1305:
+        params->nss_chacha20.pNonce = nonce->buf;
+        params->nss_chacha20.ulNonceLen = nonce->len;
+        params->nss_chacha20.pAAD = aad->buf;
+        params->nss_chacha20.ulAADLen = aad->len;
+        params->nss_chacha20.ulTagLen = tag_len;
+        param_item->len = sizeof(params->nss_chacha20);
+        return 0;
+    case CKM_CHACHA20_POLY1305:
+        if (tag_len != AEAD_TAG_LEN_DEFAULT) {
+            PyErr_Format(PyExc_ValueError, "CKM_CHACHA20_POLY1305 requires a %d octet tag",
+                         AEAD_TAG_LEN_DEFAULT);
+            return -1;
+        }
+        params->chacha20.pNonce = nonce->buf;
+        params->chacha20.ulNonceLen = nonce->len;
+        params->chacha20.pAAD = aad->buf;
+        params->chacha20.ulAADLen = aad->len;
+        param_item->len = sizeof(params->chacha20);
+        return 0;
+    }
+
+    PyErr_Format(PyExc_ValueError, "mechanism %lu is not an AEAD mechanism",
+                 mechanism);
+    return -1;
+}
+
+/*
+ * Upper bound on the output of an AEAD operation on in_len octets,
+ * or -1 with an exception set if the lengths are out of range.
+ */
+static Py_ssize_t
+aead_out_bound(PRBool encrypt, Py_ssize_t in_len, unsigned int tag_len)
+{
+    if (in_len > UINT_MAX - tag_len) {
+        PyErr_SetString(PyExc_OverflowError, "data too large for a single AEAD operation");
+        return -1;
+    }
+
+    return encrypt ? in_len + tag_len : in_len;
+}
+
+/*
+ * Seal or open one record. Does not touch any Python object and may
+ * be called without the GIL.
+ */
+static SECStatus
+aead_op_buf(PK11SymKey *sym_key, CK_MECHANISM_TYPE mechanism, PRBool encrypt,
+            SECItem *param, unsigned char *out_buf, Py_ssize_t out_buf_len,
+            const unsigned char *in_buf, Py_ssize_t in_buf_len, Py_ssize_t *out_len)
+{
+    unsigned int actual_out_len = 0;
+    SECStatus status;
+
+    if (encrypt) {
+        status = PK11_Encrypt(sym_key, mechanism, param,
+                              out_buf, &actual_out_len, MIN(out_buf_len, UINT_MAX),
+                              in_buf, in_buf_len);
+    } else {
+        status = PK11_Decrypt(sym_key, mechanism, param,
+                              out_buf, &actual_out_len, MIN(out_buf_len, UINT_MAX),
+                              in_buf, in_buf_len);
+    }
+
+    *out_len = actual_out_len;
+    return status;
+}
+
+/*
+ * Common implementation of encrypt_aead, decrypt_aead and their _into
+ * variants. If out_view is NULL a new bytes object is returned,
+ * otherwise the output is written into out_view and the number of
+ * octets written is returned.
+ */
+static PyObject *
+PK11SymKey_aead_op(PyPK11SymKey *self, PRBool encrypt,
+                   Py_buffer *nonce, Py_buffer *aad, Py_buffer *in_view,
+                   Py_buffer *out_view, unsigned long mechanism, unsigned int tag_len)
+{
+    AEADParams params;
+    SECItem param_item;
+    Py_ssize_t out_buf_len, actual_out_len = 0;
+    unsigned char *out_buf;
+    PyObject *py_out_bytes = NULL;
+    SECStatus status;
+
+    if ((mechanism = aead_mechanism(self->pk11_sym_key, mechanism)) == CKM_INVALID_MECHANISM) {
+        return NULL;
+    }
+
+    if (aead_params_init(mechanism, tag_len, nonce, aad, &params, &param_item) < 0) {
+        return NULL;
+    }
+
+    if ((out_buf_len = aead_out_bound(encrypt, in_view->len, tag_len)) < 0) {
+        return NULL;
+    }
+
+    if (out_view) {
+        if (out_view->len < out_buf_len) {
+            PyErr_Format(PyExc_ValueError,
+                         "output buffer too small, need %zd octets but only %zd available",
+                         out_buf_len, out_view->len);
+            return NULL;
+        }
+        out_buf = out_view->buf;
+        out_buf_len = out_view->len;
+    } else {
+        if ((py_out_bytes = PyBytes_FromStringAndSize(NULL, out_buf_len)) == NULL) {
+            return NULL;
+        }
+        out_buf = (unsigned char *)PyBytes_AS_STRING(py_out_bytes);
+    }
+
+    BEGIN_ALLOW_THREADS_IF(in_view->len >= GIL_RELEASE_THRESHOLD)
+    status = aead_op_buf(self->pk11_sym_key, mechanism, encrypt, &param_item,
+                         out_buf, out_buf_len, in_view->buf, in_view->len,
+                         &actual_out_len);
+    END_ALLOW_THREADS_IF()
+
+    if (status != SECSuccess) {
+        Py_XDECREF(py_out_bytes);
+        return set_nspr_error(NULL);
+    }
+
+    if (out_view) {
+        return PyLong_FromSsize_t(actual_out_len);
+    }
+
+    if (actual_out_len != out_buf_len) {
+        if (_PyBytes_Resize(&py_out_bytes, actual_out_len) < 0) {
+            return NULL;
+        }
+    }
+
+    return py_out_bytes;
+}
+
+static PyObject *
+PK11SymKey_aead(PyPK11SymKey *self, PyObject *args, PyObject *kwds,
+                PRBool encrypt, PRBool into)
+{
+    static char *kwlist[] = {"nonce", "aad", "data", "mechanism", "tag_len", NULL};
+    static char *into_kwlist[] = {"nonce", "aad", "data", "out", "mechanism", "tag_len", NULL};
+    Py_buffer nonce, aad, in_view, out_view;
+    unsigned long mechanism = CKM_INVALID_MECHANISM;
+    unsigned int tag_len = AEAD_TAG_LEN_DEFAULT;
+    PyObject *py_result = NULL;
+
+    TraceMethodEnter(self);
+
+    if (into) {
+        if (!PyArg_ParseTupleAndKeywords(args, kwds,
+                                         encrypt ? "y*y*y*w*|O&I:encrypt_aead_into" :
+                                                   "y*y*y*w*|O&I:decrypt_aead_into",
+                                         into_kwlist,
+                                         &nonce, &aad, &in_view, &out_view,
+                                         MechanismOrNoneConvert, &mechanism,
+                                         &tag_len))
+            return NULL;
+    } else {
+        if (!PyArg_ParseTupleAndKeywords(args, kwds,
+                                         encrypt ? "y*y*y*|O&I:encrypt_aead" :
+                                                   "y*y*y*|O&I:decrypt_aead",
+                                         kwlist,
+                                         &nonce, &aad, &in_view,
+                                         MechanismOrNoneConvert, &mechanism,
+                                         &tag_len))
+            return NULL;
+    }
+
+    py_result = PK11SymKey_aead_op(self, encrypt, &nonce, &aad, &in_view,
+                                   into ? &out_view : NULL, mechanism, tag_len);
+
+    PyBuffer_Release(&nonce);
+    PyBuffer_Release(&aad);
+    PyBuffer_Release(&in_view);
+    if (into) {
+        PyBuffer_Release(&out_view);
+    }
+
+    return py_result;
+}
+
+PyDoc_STRVAR(PK11SymKey_encrypt_aead_doc,
+"encrypt_aead(nonce, aad, data, mechanism=None, tag_len=16) -> data\n\
 \n\
 :Parameters:\n\
-    mechanism : int\n\
-        key mechanism enumeration constant (CKM_*)\n\
-    sec_param : SecItem object or None\n\
-        mechanism parameters or None.\n\
-    sym_key : PK11SymKey object\n\
-        the symmetric key to wrap\n\
-\n\
-Wrap (encrypt) the supplied sym_key using the mechanism\n\
-and parameter. Return the wrapped key as a SecItem.\n\
+    nonce : buffer\n\
+        the nonce (initialization vector), must never be reused with\n\
+        the same key\n\
+    aad : buffer\n\
+        additional authenticated data, use b'' if there is none\n\
+    data : buffer\n\
+        the plain text to encrypt\n\
+    mechanism : int or None\n\
+        AEAD mechanism (CKM_AES_GCM, CKM_NSS_CHACHA20_POLY1305 or\n\
+        CKM_CHACHA20_POLY1305). If None it is derived from the key\n\
+        type.\n\
+    tag_len : int\n\
+        length of the authentication tag in octets\n\
+\n\
+Encrypt and authenticate data in a single operation. Returns the\n\
+cipher text followed by the tag_len octet authentication tag.\n\
+\n\
+All buffer protocol objects are accepted as input, large inputs\n\
+are processed with the GIL released.\n\
 ");
 static PyObject *
-PK11SymKey_wrap_sym_key(PyPK11SymKey *self, PyObject *args)
+PK11SymKey_encrypt_aead(PyPK11SymKey *self, PyObject *args, PyObject *kwds)
 {
-    unsigned long mechanism;
-    SecItem *py_sec_param;
-    PyPK11SymKey *py_sym_key = NULL;
-    SECItem wrapped_key;
-
-    TraceMethodEnter(self);
-
-    if (!PyArg_ParseTuple(args, "kO&O!:wrap_sym_key",
-                          &mechanism, SecItemOrNoneConvert, &py_sec_param,
-                          &PK11SymKeyType, &py_sym_key))
-        return NULL;
+    return PK11SymKey_aead(self, args, kwds, PR_TRUE, PR_FALSE);
+}
 
-    if (PK11_WrapSymKey(mechanism, py_sec_param ? &py_sec_param->item : NULL,
-                        self->pk11_sym_key, py_sym_key->pk11_sym_key,
-                        &wrapped_key) != SECSuccess) {
-        return set_nspr_error(NULL);
-    }
+PyDoc_STRVAR(PK11SymKey_decrypt_aead_doc,
+"decrypt_aead(nonce, aad, data, mechanism=None, tag_len=16) -> data\n\
+\n\
+:Parameters:\n\
+    nonce : buffer\n\
+        the nonce (initialization vector) used to encrypt\n\
+    aad : buffer\n\
+        additional authenticated data, use b'' if there is none\n\
+    data : buffer\n\
+        the cipher text followed by the authentication tag as\n\
+        returned by encrypt_aead()\n\
+    mechanism : int or None\n\
+        AEAD mechanism (CKM_AES_GCM, CKM_NSS_CHACHA20_POLY1305 or\n\
+        CKM_CHACHA20_POLY1305). If None it is derived from the key\n\
+        type.\n\
+    tag_len : int\n\
+        length of the authentication tag in octets\n\
+\n\
+Verify the authentication tag and decrypt data. Returns the plain\n\
+text. If the tag does not verify an NSPRError is raised and no plain\n\
+text is returned.\n\
+");
+static PyObject *
+PK11SymKey_decrypt_aead(PyPK11SymKey *self, PyObject *args, PyObject *kwds)
+{
+    return PK11SymKey_aead(self, args, kwds, PR_FALSE, PR_FALSE);
+}
 
-    return SecItem_new_from_SECItem(&wrapped_key, SECITEM_wrapped_key);
+PyDoc_STRVAR(PK11SymKey_encrypt_aead_into_doc,
+"encrypt_aead_into(nonce, aad, data, out, mechanism=None, tag_len=16) -> int\n\
+\n\
+:Parameters:\n\
+    nonce : buffer\n\
+        the nonce (initialization vector)\n\
+    aad : buffer\n\
+        additional authenticated data, use b'' if there is none\n\
+    data : buffer\n\
+        the plain text to encrypt\n\
+    out : writable buffer\n\
+        receives the cipher text and tag, must be at least\n\
+        len(data) + tag_len octets\n\
+    mechanism : int or None\n\
+        AEAD mechanism, see encrypt_aead()\n\
+    tag_len : int\n\
+        length of the authentication tag in octets\n\
+\n\
+Like encrypt_aead() but write into out, returns the number of octets\n\
+written.\n\
+");
+static PyObject *
+PK11SymKey_encrypt_aead_into(PyPK11SymKey *self, PyObject *args, PyObject *kwds)
+{
+    return PK11SymKey_aead(self, args, kwds, PR_TRUE, PR_TRUE);
 }
 
-PyDoc_STRVAR(PK11SymKey_unwrap_sym_key_doc,
-"unwrap_sym_key(mechanism, sec_param, wrapped_key, target, operation, key_size) -> PK11SymKey\n\
+PyDoc_STRVAR(PK11SymKey_decrypt_aead_into_doc,
+"decrypt_aead_into(nonce, aad, data, out, mechanism=None, tag_len=16) -> int\n\
 \n\
 :Parameters:\n\
-    mechanism : int\n\
-        key mechanism enumeration constant (CKM_*)\n\
-    sec_param : SecItem object or None\n\
-        mechanism parameters or None.\n\
-    wrapped_key : SecItem object\n\
-        the symmetric key to unwrap\n\
-    target : int\n\
-        key mechanism enumeration constant (CKM_*)\n\
-    operation : int\n\
-        type of operation. A (CKA_*) constant\n\
-        (e.g. CKA_ENCRYPT, CKA_DECRYPT, CKA_SIGN, CKA_VERIFY, CKA_DIGEST)\n\
-    key_size : int\n\
-        key size.\n\
+    nonce : buffer\n\
+        the nonce (initialization vector) used to encrypt\n\
+    aad : buffer\n\
+        additional authenticated data, use b'' if there is none\n\
+    data : buffer\n\
+        the cipher text followed by the authentication tag\n\
+    out : writable buffer\n\
+        receives the plain text, must be at least len(data) octets\n\
+    mechanism : int or None\n\
+        AEAD mechanism, see decrypt_aead()\n\
+    tag_len : int\n\
+        length of the authentication tag in octets\n\
+\n\
+Like decrypt_aead() but write into out, returns the number of octets\n\
+written.\n\
+");
+static PyObject *
+PK11SymKey_decrypt_aead_into(PyPK11SymKey *self, PyObject *args, PyObject *kwds)
+{
+    return PK11SymKey_aead(self, args, kwds, PR_FALSE, PR_TRUE);
+}
+
+PyDoc_STRVAR(PK11SymKey_encrypt_aead_many_doc,
+"encrypt_aead_many(records, mechanism=None, tag_len=16) -> [data, ...]\n\
 \n\
-Unwrap (decrypt) the supplied wrapped key.\n\
-Return the unwrapped key as a PK11SymKey.\n\
+:Parameters:\n\
+    records : iterable of (nonce, aad, data) tuples\n\
+        the records to seal, each element is a buffer\n\
+    mechanism : int or None\n\
+        AEAD mechanism, see encrypt_aead()\n\
+    tag_len : int\n\
+        length of the authentication tag in octets\n\
+\n\
+Seal every record under this key in a single call, equivalent to\n\
+calling encrypt_aead(nonce, aad, data) for each record but the loop\n\
+runs in C with the GIL released. Returns a list of cipher text plus\n\
+tag in the same order as records.\n\
 ");
 static PyObject *
-PK11SymKey_unwrap_sym_key(PyPK11SymKey *self, PyObject *args)
+PK11SymKey_encrypt_aead_many(PyPK11SymKey *self, PyObject *args, PyObject *kwds)
 {
-    unsigned long mechanism;
-    SecItem *py_sec_param;
-    unsigned long target;
-    unsigned long operation;
-    int key_size;
-    SecItem *py_wrapped_key = NULL;
-    PK11SymKey *sym_key = NULL;
+    static char *kwlist[] = {"records", "mechanism", "tag_len", NULL};
+    PyObject *py_records = NULL;
+    unsigned long mechanism = CKM_INVALID_MECHANISM;
+    unsigned int tag_len = AEAD_TAG_LEN_DEFAULT;
+    PyObject *py_seq = NULL;
+    PyObject *py_record = NULL;
+    PyObject *py_out_bytes = NULL;
+    PyObject *py_result = NULL;
+    PyObject *py_item = NULL;
+    Py_buffer *views = NULL;        /* nonce, aad, data per record */
+    AEADParams *params = NULL;
+    SECItem *param_items = NULL;
+    Py_ssize_t *out_offsets = NULL;
+    Py_ssize_t n_records, n_parsed = 0, total_len = 0, bound, i;
+    Py_ssize_t out_len;
+    unsigned char *out_buf;
+    SECStatus status = SECSuccess;
 
     TraceMethodEnter(self);
 
-    if (!PyArg_ParseTuple(args, "kO&O!kki:unwrap_sym_key",
-                          &mechanism, SecItemOrNoneConvert, &py_sec_param,
-                          &SecItemType, &py_wrapped_key,
-                          &target, &operation, &key_size))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O&I:encrypt_aead_many", kwlist,
+                                     &py_records,
+                                     MechanismOrNoneConvert, &mechanism,
+                                     &tag_len))
         return NULL;
 
-    if ((sym_key = PK11_UnwrapSymKey(self->pk11_sym_key, mechanism,
-                                     py_sec_param ? &py_sec_param->item : NULL,
-                                     &py_wrapped_key->item,
-                                     target, operation, key_size)) == NULL) {
-        return set_nspr_error(NULL);
+    if ((mechanism = aead_mechanism(self->pk11_sym_key, mechanism)) == CKM_INVALID_MECHANISM) {
+        return NULL;
     }
 
-    return PyPK11SymKey_new_from_PK11SymKey(sym_key);
+    if ((py_seq = PySequence_Fast(py_records, "records must be iterable")) == NULL) {
+        return NULL;
+    }
+    n_records = PySequence_Fast_GET_SIZE(py_seq);
+
+    views = PyMem_New(Py_buffer, n_records * 3);
+    params = PyMem_New(AEADParams, n_records);
+    param_items = PyMem_New(SECItem, n_records);
+    out_offsets = PyMem_New(Py_ssize_t, n_records + 1);
+    if (!views || !params || !param_items || !out_offsets) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    out_offsets[0] = 0;
+    for (n_parsed = 0; n_parsed < n_records; n_parsed++) {
+        Py_buffer *record_views = &views[n_parsed * 3];
+
+        if ((py_record = PySequence_Tuple(PySequence_Fast_GET_ITEM(py_seq, n_parsed))) == NULL) {
+            goto exit;
+        }
+        if (!PyArg_ParseTuple(py_record, "y*y*y*:encrypt_aead_many",
+                              &record_views[0], &record_views[1], &record_views[2])) {
+            Py_CLEAR(py_record);
+            goto exit;
+        }
+        Py_CLEAR(py_record);
+
+        if (aead_params_init(mechanism, tag_len, &record_views[0], &record_views[1],
+                             &params[n_parsed], &param_items[n_parsed]) < 0 ||
+            (bound = aead_out_bound(PR_TRUE, record_views[2].len, tag_len)) < 0) {
+            n_parsed++;
+            goto exit;
+        }
+
+        total_len += record_views[2].len;
+        out_offsets[n_parsed + 1] = out_offsets[n_parsed] + bound;
+    }
+
+    if ((py_out_bytes = PyBytes_FromStringAndSize(NULL, out_offsets[n_records])) == NULL) {
+        goto exit;
+    }
+    out_buf = (unsigned char *)PyBytes_AS_STRING(py_out_bytes);
+
+    BEGIN_ALLOW_THREADS_IF(total_len >= GIL_RELEASE_THRESHOLD)
+    for (i = 0; i < n_records && status == SECSuccess; i++) {
+        status = aead_op_buf(self->pk11_sym_key, mechanism, PR_TRUE, &param_items[i],
+                             out_buf + out_offsets[i], out_offsets[i + 1] - out_offsets[i],
+                             views[i * 3 + 2].buf, views[i * 3 + 2].len, &out_len);
+    }
+    END_ALLOW_THREADS_IF()
+
+    if (status != SECSuccess) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    if ((py_result = PyList_New(n_records)) == NULL) {
+        goto exit;
+    }
+
+    for (i = 0; i < n_records; i++) {
+        if ((py_item = PyBytes_FromStringAndSize((char *)out_buf + out_offsets[i],
+                                                 out_offsets[i + 1] - out_offsets[i])) == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_item);
+    }
+
+ exit:
+    for (i = 0; i < n_parsed * 3; i++) {
+        PyBuffer_Release(&views[i]);
+    }
+    PyMem_Free(views);
+    PyMem_Free(params);
+    PyMem_Free(param_items);
+    PyMem_Free(out_offsets);
+    Py_XDECREF(py_out_bytes);
+    Py_DECREF(py_seq);
+
+    return py_result;
 }
 
+#endif /* HAVE_AEAD */
 
 static PyMethodDef PK11SymKey_methods[] = {
     {"format_lines",   (PyCFunction)PK11SymKey_format_lines,     METH_VARARGS|METH_KEYWORDS, generic_format_lines_doc},
@@ -14990,6 +17472,13 @@ static PyMethodDef PK11SymKey_methods[] = {
     {"derive",         (PyCFunction)PK11SymKey_derive,           METH_VARARGS, PK11SymKey_derive_doc},
     {"wrap_sym_key",   (PyCFunction)PK11SymKey_wrap_sym_key,     METH_VARARGS, PK11SymKey_wrap_sym_key_doc},
     {"unwrap_sym_key", (PyCFunction)PK11SymKey_unwrap_sym_key,   METH_VARARGS, PK11SymKey_unwrap_sym_key_doc},
+#ifdef HAVE_AEAD
+    {"encrypt_aead",      (PyCFunction)PK11SymKey_encrypt_aead,      METH_VARARGS|METH_KEYWORDS, PK11SymKey_encrypt_aead_doc},
+    {"decrypt_aead",      (PyCFunction)PK11SymKey_decrypt_aead,      METH_VARARGS|METH_KEYWORDS, PK11SymKey_decrypt_aead_doc},
+    {"encrypt_aead_into", (PyCFunction)PK11SymKey_encrypt_aead_into, METH_VARARGS|METH_KEYWORDS, PK11SymKey_encrypt_aead_into_doc},
+    {"decrypt_aead_into", (PyCFunction)PK11SymKey_decrypt_aead_into, METH_VARARGS|METH_KEYWORDS, PK11SymKey_decrypt_aead_into_doc},
+    {"encrypt_aead_many", (PyCFunction)PK11SymKey_encrypt_aead_many, METH_VARARGS|METH_KEYWORDS, PK11SymKey_encrypt_aead_many_doc},
+#endif
     {NULL, NULL}  /* Sentinel */
 };
 
@@ -15148,6 +17637,7 @@ PK11Context_clone_context(PyPK11Context *self, PyObject *args)
         PyErr_SetString(PyExc_MemoryError, "unable to create PK11Context object");
         return NULL;
     }
+    ((PyPK11Context *)py_pk11_context)->mechanism = self->mechanism;
 
     return py_pk11_context;
 }
@@ -15172,106 +17662,372 @@ PK11Context_digest_begin(PyPK11Context *self, PyObject *args)
 PyDoc_STRVAR(PK11Context_digest_op_doc,
 "digest_op(data)\n\
 :Parameters:\n\
-    data : any read buffer compatible object (e.g. buffer or string)\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
         raw data to compute digest from\n\
 \n\
-Execute a digest/signature operation.\n\
+Execute a digest/signature operation. The GIL is released while\n\
+large buffers are digested.\n\
 ");
 static PyObject *
 PK11Context_digest_op(PyPK11Context *self, PyObject *args)
 {
-    const void *buffer = NULL;
-    Py_ssize_t buffer_len;
+    Py_buffer in_view;
+    Py_ssize_t offset = 0;
+    SECStatus status = SECSuccess;
 
     TraceMethodEnter(self);
 
 #if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:digest_op", &buffer, &buffer_len))
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:digest_op", &in_view))
         return NULL;
 #else
-    if (!PyArg_ParseTuple(args, "t#:digest_op", &buffer, &buffer_len))
+    if (!PyArg_ParseTuple(args, "s*:digest_op", &in_view))
         return NULL;
 #endif
 
-    if (PK11_DigestOp(self->pk11_context, buffer, buffer_len) != SECSuccess) {
+    BEGIN_ALLOW_THREADS_IF(in_view.len >= GIL_RELEASE_THRESHOLD)
+    do {
+        status = PK11_DigestOp(self->pk11_context,
+                               (unsigned char *)in_view.buf + offset,
+                               MIN(in_view.len - offset, MAX_PK11_CHUNK_LEN));
+        offset += MAX_PK11_CHUNK_LEN;
+    } while (status == SECSuccess && offset < in_view.len);
+    END_ALLOW_THREADS_IF()
+
+    PyBuffer_Release(&in_view);
+
+    if (status != SECSuccess) {
         return set_nspr_error(NULL);
     }
 
     Py_RETURN_NONE;
 }
 
+/*
+ * Return an upper bound on the number of octets PK11_CipherOp can
+ * produce for in_buf_len octets of input, or -1 with an exception set.
+ *
+ * A block cipher never emits more than the input plus one block (the
+ * data buffered from a previous call, or the padding block), so when
+ * the mechanism is known the bound is computed without calling into
+ * PKCS #11. Otherwise fall back to asking the token by passing a NULL
+ * output buffer.
+ */
+static Py_ssize_t
+PK11Context_cipher_op_bound(PyPK11Context *self,
+                            const unsigned char *in_buf, Py_ssize_t in_buf_len)
+{
+    int block_size;
+    int suggested_out_len = 0;
+    int first_len;
+
+    if (self->mechanism != CKM_INVALID_MECHANISM) {
+        block_size = PK11_GetBlockSize(self->mechanism, NULL);
+        return in_buf_len + MAX(block_size, 1);
+    }
+
+    first_len = MIN(in_buf_len, MAX_PK11_CHUNK_LEN);
+    if (PK11_CipherOp(self->pk11_context, NULL, &suggested_out_len, 0,
+                      (unsigned char *)in_buf, first_len) != SECSuccess) {
+        set_nspr_error(NULL);
+        return -1;
+    }
+
+    return suggested_out_len + (in_buf_len - first_len);
+}
+
+/*
+ * Perform the cipher operation writing into out_buf, which must be
+ * large enough to hold PK11Context_cipher_op_bound() octets. The
+ * number of octets written is returned in out_len.
+ *
+ * Does not touch any Python object and may be called without the GIL.
+ */
+static SECStatus
+pk11_cipher_op_buf(PK11Context *pk11_context,
+                   unsigned char *out_buf, Py_ssize_t out_buf_len,
+                   const unsigned char *in_buf, Py_ssize_t in_buf_len,
+                   Py_ssize_t *out_len)
+{
+    Py_ssize_t in_offset = 0, out_offset = 0;
+    int chunk_len, chunk_out_len, max_out_len;
+
+    do {
+        chunk_len = MIN(in_buf_len - in_offset, MAX_PK11_CHUNK_LEN);
+        max_out_len = MIN(out_buf_len - out_offset, INT_MAX);
+
+        if (PK11_CipherOp(pk11_context, out_buf + out_offset, &chunk_out_len,
+                          max_out_len, (unsigned char *)in_buf + in_offset,
+                          chunk_len) != SECSuccess) {
+            return SECFailure;
+        }
+
+        in_offset += chunk_len;
+        out_offset += chunk_out_len;
+    } while (in_offset < in_buf_len);
+
+    *out_len = out_offset;
+    return SECSuccess;
+}
+
 PyDoc_STRVAR(PK11Context_cipher_op_doc,
 "cipher_op(data) -> data\n\
 :Parameters:\n\
     data : any read buffer compatible object (e.g. buffer or string)\n\
-        raw data to compute digest from\n\
+        raw data to encrypt or decrypt\n\
 \n\
-Execute a digest/signature operation.\n\
+Execute an encryption/decryption operation, returns the output\n\
+produced by this step. Call digest_final() when all the input has been\n\
+supplied to obtain any remaining output.\n\
+\n\
+See also cipher_op_into() which writes into a caller supplied buffer.\n\
 ");
 static PyObject *
 PK11Context_cipher_op(PyPK11Context *self, PyObject *args)
 {
-    const void *in_buf = NULL;
-    void *out_buf = NULL;
+    Py_buffer in_view;
     PyObject *py_out_bytes;
-    Py_ssize_t in_buf_len;
     Py_ssize_t out_buf_alloc_len;
-    int suggested_out_len = 0, actual_out_len;
+    Py_ssize_t actual_out_len = 0;
+    SECStatus status;
 
     TraceMethodEnter(self);
 
 #if PY_MAJOR_VERSION >= 3
-    /* Py2 -> Py3 difference is t# -> y# */
-    if (!PyArg_ParseTuple(args, "y#:cipher_op", &in_buf, &in_buf_len))
+    /* Py2 -> Py3 difference is s* -> y* */
+    if (!PyArg_ParseTuple(args, "y*:cipher_op", &in_view))
         return NULL;
 #else
-    if (!PyArg_ParseTuple(args, "t#:cipher_op", &in_buf, &in_buf_len))
+    if (!PyArg_ParseTuple(args, "s*:cipher_op", &in_view))
         return NULL;
 #endif
 
     /*
-     * Create an output buffer to hold the result.
+     * Create an output buffer large enough to hold the result, then
+     * shrink it to the number of octets actually written.
      */
+    if ((out_buf_alloc_len =
+         PK11Context_cipher_op_bound(self, in_view.buf, in_view.len)) < 0) {
+        PyBuffer_Release(&in_view);
+        return NULL;
+    }
 
-    /*
-     * We call the PK11 function with a NULL output buffer and it returns an
-     * upper bound on the size of the output data buffer. We create a string to
-     * hold the data using the upper bound as it's size. We then invoke the PK11
-     * function again which performs the operation writing into string buffer.
-     * It returns the exact number of bytes written. If the allocated size does
-     * not equal the actual number of bytes written we resize the string before
-     * returning it so the caller sees a string whose length exactly matches
-     * the number of bytes written by the PK11 function.
-     */
-    if (PK11_CipherOp(self->pk11_context, NULL, &suggested_out_len, 0,
-                      (unsigned char *)in_buf, in_buf_len) != SECSuccess) {
+    if ((py_out_bytes = PyBytes_FromStringAndSize(NULL, out_buf_alloc_len)) == NULL) {
+        PyBuffer_Release(&in_view);
+        return NULL;
+    }
+
+    BEGIN_ALLOW_THREADS_IF(in_view.len >= GIL_RELEASE_THRESHOLD)
+    status = pk11_cipher_op_buf(self->pk11_context,
+                                (unsigned char *)PyBytes_AS_STRING(py_out_bytes),
+                                out_buf_alloc_len,
+                                in_view.buf, in_view.len, &actual_out_len);
+    END_ALLOW_THREADS_IF()
+
+    PyBuffer_Release(&in_view);
+
+    if (status != SECSuccess) {
+        Py_DECREF(py_out_bytes);
         return set_nspr_error(NULL);
     }
 
-    out_buf_alloc_len = suggested_out_len;
+    if (actual_out_len != out_buf_alloc_len) {
+        if (_PyBytes_Resize(&py_out_bytes, actual_out_len) < 0) {
+            return NULL;
+        }
+    }
+
+    return py_out_bytes;
+}
+
+PyDoc_STRVAR(PK11Context_cipher_op_into_doc,
+"cipher_op_into(data, out) -> int\n\
+:Parameters:\n\
+    data : any read buffer compatible object (e.g. bytes, memoryview, mmap)\n\
+        raw data to encrypt or decrypt\n\
+    out : any writable buffer compatible object (e.g. bytearray, memoryview)\n\
+        buffer the output is written into\n\
+\n\
+Execute an encryption/decryption operation like cipher_op() but write\n\
+the output into the caller supplied out buffer instead of allocating a\n\
+new object. Returns the number of octets written to out.\n\
+\n\
+out must be at least len(data) plus the cipher block size octets long,\n\
+otherwise a ValueError is raised. Large inputs are processed with the\n\
+GIL released so multiple contexts may be driven from a thread pool.\n\
+");
+static PyObject *
+PK11Context_cipher_op_into(PyPK11Context *self, PyObject *args)
+{
+    Py_buffer in_view;
+    Py_buffer out_view;
+    Py_ssize_t out_buf_bound;
+    Py_ssize_t actual_out_len = 0;
+    SECStatus status;
+
+    TraceMethodEnter(self);
+
+#if PY_MAJOR_VERSION >= 3
+    if (!PyArg_ParseTuple(args, "y*w*:cipher_op_into", &in_view, &out_view))
+        return NULL;
+#else
+    if (!PyArg_ParseTuple(args, "s*w*:cipher_op_into", &in_view, &out_view))
+        return NULL;
+#endif
+
+    if ((out_buf_bound =
+         PK11Context_cipher_op_bound(self, in_view.buf, in_view.len)) < 0) {
+        goto fail;
+    }
+
+    if (out_view.len < out_buf_bound) {
+        PyErr_Format(PyExc_ValueError,
+                     "output buffer too small, need %zd octets but only %zd available",
+                     out_buf_bound, out_view.len);
+        goto fail;
+    }
+
+    BEGIN_ALLOW_THREADS_IF(in_view.len >= GIL_RELEASE_THRESHOLD)
+    status = pk11_cipher_op_buf(self->pk11_context,
+                                out_view.buf, out_view.len,
+                                in_view.buf, in_view.len, &actual_out_len);
+    END_ALLOW_THREADS_IF()
+
+    PyBuffer_Release(&in_view);
+    PyBuffer_Release(&out_view);
+
+    if (status != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    return PyLong_FromSsize_t(actual_out_len);
+
+ fail:
+    PyBuffer_Release(&in_view);
+    PyBuffer_Release(&out_view);
+    return NULL;
+}
+
+typedef struct {
+    PK11Context *pk11_context;
+    PRFileDesc *dst_fd;
+    unsigned char *out_buf;
+    Py_ssize_t out_buf_len;
+    PRInt64 n_written;
+} CipherFileState;
+
+static SECStatus
+cipher_file_write(CipherFileState *state, Py_ssize_t len)
+{
+    if (len > 0) {
+        if (PR_Write(state->dst_fd, state->out_buf, len) != len) {
+            return SECFailure;
+        }
+        state->n_written += len;
+    }
+    return SECSuccess;
+}
+
+static SECStatus
+cipher_file_chunk(void *arg, const unsigned char *buf, Py_ssize_t len)
+{
+    CipherFileState *state = arg;
+    Py_ssize_t out_len;
+
+    if (pk11_cipher_op_buf(state->pk11_context, state->out_buf, state->out_buf_len,
+                           buf, len, &out_len) != SECSuccess) {
+        return SECFailure;
+    }
+
+    return cipher_file_write(state, out_len);
+}
+
+PyDoc_STRVAR(PK11Context_cipher_file_doc,
+"cipher_file(src_file, dst_file) -> int\n\
+:Parameters:\n\
+    src_file : str\n\
+        pathname of the file to encrypt or decrypt\n\
+    dst_file : str\n\
+        pathname of the file the output is written to, it is created\n\
+        if it does not exist and truncated if it does\n\
+\n\
+Run the entire contents of src_file through the cipher and write the\n\
+result, including the final block normally returned by digest_final(),\n\
+to dst_file. The source file is memory mapped and processed in large\n\
+chunks with the GIL released through a single output buffer.\n\
+\n\
+The context must have been created by create_context_by_sym_key().\n\
+Returns the number of octets written to dst_file.\n\
+");
+static PyObject *
+PK11Context_cipher_file(PyPK11Context *self, PyObject *args)
+{
+    PyObject *py_src_path = NULL;
+    PyObject *py_dst_path = NULL;
+    PRFileDesc *src_fd = NULL;
+    PRInt64 file_size = 0;
+    CipherFileState state = {self->pk11_context, NULL, NULL, 0, 0};
+    unsigned int final_len;
+    const char *failed_path = NULL;
+    SECStatus status = SECFailure;
+    PyObject *py_result = NULL;
+
+    TraceMethodEnter(self);
 
-    if ((py_out_bytes = PyBytes_FromStringAndSize(NULL, out_buf_alloc_len)) == NULL) {
-        return NULL;
+    if (!PyArg_ParseTuple(args, "O&O&:cipher_file",
+                          PyUnicode_FSConverter, &py_src_path,
+                          PyUnicode_FSConverter, &py_dst_path))
+        goto exit;
+
+    if (self->mechanism == CKM_INVALID_MECHANISM) {
+        PyErr_SetString(PyExc_ValueError,
+                        "cipher_file requires a context created by create_context_by_sym_key");
+        goto exit;
     }
-    out_buf = PyBytes_AsString(py_out_bytes);
 
-    /*
-     * Now that we have both the input and output buffers perform the cipher operation.
-     */
-    if (PK11_CipherOp(self->pk11_context, out_buf, &actual_out_len, out_buf_alloc_len,
-                      (unsigned char *)in_buf, in_buf_len) != SECSuccess) {
-        Py_DECREF(py_out_bytes);
-        return set_nspr_error(NULL);
+    state.out_buf_len = FILE_MAP_WINDOW_LEN + MAX(PK11_GetBlockSize(self->mechanism, NULL), 1);
+    if ((state.out_buf = PyMem_Malloc(state.out_buf_len)) == NULL) {
+        PyErr_NoMemory();
+        goto exit;
     }
 
-    if (actual_out_len != out_buf_alloc_len) {
-        if (_PyBytes_Resize(&py_out_bytes, actual_out_len) < 0) {
-        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    if ((src_fd = open_mapped_file(PyBytes_AS_STRING(py_src_path), &file_size)) == NULL) {
+        failed_path = PyBytes_AS_STRING(py_src_path);
+    } else if ((state.dst_fd = PR_Open(PyBytes_AS_STRING(py_dst_path),
+                                       PR_WRONLY | PR_CREATE_FILE | PR_TRUNCATE,
+                                       0644)) == NULL) {
+        failed_path = PyBytes_AS_STRING(py_dst_path);
+    } else if (process_mapped_file(src_fd, file_size, cipher_file_chunk, &state) == SECSuccess &&
+               PK11_DigestFinal(self->pk11_context, state.out_buf, &final_len,
+                                state.out_buf_len) == SECSuccess) {
+        status = cipher_file_write(&state, final_len);
+    }
+    if (state.dst_fd) {
+        PR_Close(state.dst_fd);
+    }
+    if (src_fd) {
+        PR_Close(src_fd);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (status != SECSuccess) {
+        if (failed_path) {
+            set_nspr_error("unable to open \"%s\"", failed_path);
+        } else {
+            set_nspr_error(NULL);
         }
+        goto exit;
     }
 
-    return py_out_bytes;
+    py_result = PyLong_FromLongLong(state.n_written);
+
+ exit:
+    PyMem_Free(state.out_buf);
+    Py_XDECREF(py_src_path);
+    Py_XDECREF(py_dst_path);
+    return py_result;
 }
 
 PyDoc_STRVAR(PK11Context_finalize_doc,
@@ -15380,6 +18136,8 @@ static PyMethodDef PK11Context_methods[] = {
     {"digest_begin",  (PyCFunction)PK11Context_digest_begin,  METH_NOARGS,  PK11Context_digest_begin_doc},
     {"digest_op",     (PyCFunction)PK11Context_digest_op,     METH_VARARGS, PK11Context_digest_op_doc},
     {"cipher_op",     (PyCFunction)PK11Context_cipher_op,     METH_VARARGS, PK11Context_cipher_op_doc},
+    {"cipher_op_into", (PyCFunction)PK11Context_cipher_op_into, METH_VARARGS, PK11Context_cipher_op_into_doc},
+    {"cipher_file",   (PyCFunction)PK11Context_cipher_file,   METH_VARARGS, PK11Context_cipher_file_doc},
     {"finalize",      (PyCFunction)PK11Context_finalize,      METH_NOARGS,  PK11Context_finalize_doc},
     {"digest_final",  (PyCFunction)PK11Context_digest_final,  METH_NOARGS,  PK11Context_digest_final_doc},
     {NULL, NULL}  /* Sentinel */
@@ -15399,6 +18157,7 @@ PK11Context_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     }
 
     self->pk11_context = NULL;
+    self->mechanism = CKM_INVALID_MECHANISM;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -20777,8 +23536,435 @@ static PyTypeObject CertVerifyLogType = {
     0,						/* tp_dictoffset */
     0,						/* tp_init */
     0,						/* tp_alloc */
-    CertVerifyLog_new,				/* tp_new */
+    CertVerifyLog_new,				/* tp_new */
+};
+/* ========================================================================== */
+/* ======================== CertificateBundle Class ========================= */
+/* ========================================================================== */
+
+#define PEM_CERT_BEGIN "-----BEGIN CERTIFICATE-----"
+#define PEM_CERT_END "-----END CERTIFICATE-----"
+
+static const char certificate_bundle_no_memory[] = "out of memory";
+
+static const unsigned char *
+find_bytes(const unsigned char *p, const unsigned char *end,
+           const char *needle, size_t needle_len)
+{
+    while ((size_t)(end - p) >= needle_len &&
+           (p = memchr(p, needle[0], end - p - needle_len + 1)) != NULL) {
+        if (memcmp(p, needle, needle_len) == 0) {
+            return p;
+        }
+        p++;
+    }
+    return NULL;
+}
+
+/*
+ * Find the certificates in the bundle data and record where each one
+ * is. Data starting with a DER SEQUENCE tag is a stream of concatenated
+ * DER certificates, otherwise it is PEM text and every CERTIFICATE
+ * block is an entry, other text and PEM blocks are skipped.
+ *
+ * Returns NULL on success, otherwise a message describing the problem
+ * found at *error_offset. Does not touch any Python object and may be
+ * called without the GIL.
+ */
+static const char *
+CertificateBundle_scan(CertificateBundle *self, Py_ssize_t *error_offset)
+{
+    const unsigned char *data = self->data;
+    const unsigned char *end = data + self->data_len;
+    const unsigned char *p, *body, *body_end;
+    CertificateBundleEntry *entries;
+    Py_ssize_t n_allocated = 0, offset, len, header_len, i, n;
+
+    for (p = data; p < end && isspace(*p); p++);
+    self->pem = !(p < end && *p == SEC_ASN1_SEQUENCE + SEC_ASN1_CONSTRUCTED);
+
+    while (p < end) {
+        if (self->pem) {
+            if ((p = find_bytes(p, end, PEM_CERT_BEGIN,
+                                sizeof(PEM_CERT_BEGIN) - 1)) == NULL) {
+                break;
+            }
+            body = p + sizeof(PEM_CERT_BEGIN) - 1;
+            if ((body_end = find_bytes(body, end, PEM_CERT_END,
+                                       sizeof(PEM_CERT_END) - 1)) == NULL) {
+                *error_offset = p - data;
+                return "no PEM END found";
+            }
+            offset = body - data;
+            len = body_end - body;
+            p = body_end + sizeof(PEM_CERT_END) - 1;
+        } else {
+            *error_offset = p - data;
+            if (*p != (SEC_ASN1_SEQUENCE + SEC_ASN1_CONSTRUCTED)) {
+                return "expected a DER SEQUENCE";
+            }
+            if (end - p < 2) {
+                return "truncated DER certificate";
+            }
+            header_len = 2;
+            if (p[1] < 0x80) {
+                len = p[1];
+            } else {
+                n = p[1] & 0x7f;
+                if (n == 0 || n > 4) {
+                    return "unsupported DER length";
+                }
+                if (end - p < 2 + n) {
+                    return "truncated DER certificate";
+                }
+                for (len = 0, i = 0; i < n; i++) {
+                    len = (len << 8) | p[2 + i];
+                }
+                header_len += n;
+            }
+            if (len > end - p - header_len) {
+                return "truncated DER certificate";
+            }
+            offset = p - data;
+            len += header_len;
+            p += len;
+        }
+
+        if (self->n_entries == n_allocated) {
+            n_allocated = n_allocated ? n_allocated * 2 : 64;
+            if ((entries = PyMem_RawRealloc(self->entries,
+                                            n_allocated * sizeof(CertificateBundleEntry))) == NULL) {
+                return certificate_bundle_no_memory;
+            }
+            self->entries = entries;
+        }
+        self->entries[self->n_entries].offset = offset;
+        self->entries[self->n_entries].len = len;
+        self->n_entries++;
+    }
+
+    return NULL;
+}
+
+/*
+ * Point der at the DER of entry i, base64 decoding it into arena if
+ * the bundle is PEM. With a NULL arena a decoded der must be freed with
+ * SECITEM_FreeItem(der, PR_FALSE).
+ */
+static SECStatus
+CertificateBundle_entry_der(CertificateBundle *self, Py_ssize_t i,
+                            SECItem *der, PLArenaPool *arena)
+{
+    CertificateBundleEntry *entry = &self->entries[i];
+
+    der->type = siDERCertBuffer;
+    if (!self->pem) {
+        der->data = (unsigned char *)self->data + entry->offset;
+        der->len = entry->len;
+        return SECSuccess;
+    }
+
+    der->data = NULL;
+    der->len = 0;
+    if (NSSBase64_DecodeBuffer(arena, der, (const char *)self->data + entry->offset,
+                               entry->len) == NULL) {
+        PORT_SetError(SEC_ERROR_BAD_DATA);
+        return SECFailure;
+    }
+    return SECSuccess;
+}
+
+static CERTCertDBHandle *
+CertificateBundle_certdb_handle(CertificateBundle *self)
+{
+    if (self->py_certdb) {
+        return ((CertDB *)self->py_certdb)->handle;
+    }
+    return CERT_GetDefaultCertDB();
+}
+
+/* ============================== Class Methods ============================= */
+
+PyDoc_STRVAR(CertificateBundle_import_certs_doc,
+"import_certs(perm=False) -> count\n\
+\n\
+:Parameters:\n\
+    perm : bool\n\
+        If True the certificates are stored in the certdb permanently.\n\
+\n\
+Decode and import every certificate of the bundle into its certdb\n\
+with a single CERT_ImportCerts() call, equivalent to constructing a\n\
+`Certificate` for each entry. Entries which were not accessed yet\n\
+become available without further decoding.\n\
+\n\
+Returns the number of certificates imported, entries which fail to\n\
+decode are skipped and raise when accessed.\n\
+");
+
+static PyObject *
+CertificateBundle_import_certs(CertificateBundle *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"perm", NULL};
+    PyObject *py_perm = NULL;
+    PRBool perm = PR_FALSE;
+    PLArenaPool *arena = NULL;
+    SECItem *ders = NULL;
+    SECItem **der_ptrs = NULL;
+    CERTCertificate **certs = NULL;
+    CERTCertDBHandle *certdb_handle = NULL;
+    PyObject *py_cert = NULL;
+    Py_ssize_t n_ders = 0, n_imported = 0, i, j;
+    SECStatus status;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O!:import_certs", kwlist,
+                                     &PyBool_Type, &py_perm))
+        return NULL;
+
+    if (py_perm) {
+        perm = PyBoolAsPRBool(py_perm);
+    }
+
+    if (self->n_entries == 0) {
+        return PyLong_FromLong(0);
+    }
+
+    if ((arena = PORT_NewArena(DER_DEFAULT_CHUNKSIZE)) == NULL) {
+        return set_nspr_error(NULL);
+    }
+
+    ders = PORT_ArenaZNewArray(arena, SECItem, self->n_entries);
+    der_ptrs = PORT_ArenaZNewArray(arena, SECItem *, self->n_entries);
+    if (!ders || !der_ptrs) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    /* Entries which are not valid base64 are left out */
+    for (i = 0; i < self->n_entries; i++) {
+        if (CertificateBundle_entry_der(self, i, &ders[i], arena) == SECSuccess) {
+            der_ptrs[n_ders++] = &ders[i];
+        }
+    }
+
+    certdb_handle = CertificateBundle_certdb_handle(self);
+
+    Py_BEGIN_ALLOW_THREADS
+    status = CERT_ImportCerts(certdb_handle, certUsageUserCertImport,
+                              n_ders, der_ptrs, &certs, perm, PR_FALSE, NULL);
+    Py_END_ALLOW_THREADS
+
+    if (status != SECSuccess) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    /*
+     * CERT_ImportCerts() returns the certificates it could decode in
+     * order, match them back to their entries by DER.
+     */
+    for (j = 0; j < n_ders && n_imported < n_ders; j++) {
+        if (certs[n_imported] == NULL ||
+            !SECITEM_ItemsAreEqual(&certs[n_imported]->derCert, der_ptrs[j])) {
+            continue;
+        }
+        i = der_ptrs[j] - ders;
+        if (self->certs[i] == NULL) {
+            if ((py_cert = Certificate_new_from_CERTCertificate(certs[n_imported], true)) == NULL) {
+                goto exit;
+            }
+            self->certs[i] = py_cert;
+        }
+        n_imported++;
+    }
+
+ exit:
+    if (certs) {
+        CERT_DestroyCertArray(certs, n_ders);
+    }
+    PORT_FreeArena(arena, PR_FALSE);
+
+    if (PyErr_Occurred()) {
+        return NULL;
+    }
+    return PyLong_FromSsize_t(n_imported);
+}
+
+static PyMethodDef CertificateBundle_methods[] = {
+    {"import_certs", (PyCFunction)CertificateBundle_import_certs, METH_VARARGS|METH_KEYWORDS, CertificateBundle_import_certs_doc},
+    {NULL, NULL}  /* Sentinel */
+};
+
+/* =========================== Sequence Protocol ============================ */
+
+static Py_ssize_t
+CertificateBundle_length(CertificateBundle *self)
+{
+    return self->n_entries;
+}
+
+static PyObject *
+CertificateBundle_item(CertificateBundle *self, register Py_ssize_t i)
+{
+    CERTCertificate *cert = NULL;
+    SECItem der;
+
+    if (i < 0 || i >= self->n_entries) {
+        PyErr_SetString(PyExc_IndexError, "CertificateBundle index out of range");
+        return NULL;
+    }
+
+    if (self->certs[i] == NULL) {
+        if (CertificateBundle_entry_der(self, i, &der, NULL) != SECSuccess) {
+            return set_nspr_error("could not base64 decode certificate %zd", i);
+        }
+
+        cert = CERT_NewTempCertificate(CertificateBundle_certdb_handle(self),
+                                       &der, NULL, PR_FALSE, PR_TRUE);
+        if (self->pem) {
+            SECITEM_FreeItem(&der, PR_FALSE);
+        }
+        if (cert == NULL) {
+            return set_nspr_error("could not decode certificate %zd", i);
+        }
+
+        if ((self->certs[i] = Certificate_new_from_CERTCertificate(cert, false)) == NULL) {
+            CERT_DestroyCertificate(cert);
+            return NULL;
+        }
+    }
+
+    Py_INCREF(self->certs[i]);
+    return self->certs[i];
+}
+
+/* =========================== Class Construction =========================== */
+
+static PyObject *
+CertificateBundle_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    CertificateBundle *self;
+
+    TraceObjNewEnter(type);
+
+    if ((self = (CertificateBundle *)type->tp_alloc(type, 0)) == NULL) {
+        return NULL;
+    }
+
+    self->py_certdb = NULL;
+    self->view.obj = NULL;
+    self->fd = NULL;
+    self->file_map = NULL;
+    self->addr = NULL;
+    self->map_len = 0;
+    self->data = NULL;
+    self->data_len = 0;
+    self->pem = false;
+    self->n_entries = 0;
+    self->entries = NULL;
+    self->certs = NULL;
+
+    TraceObjNewLeave(self);
+    return (PyObject *)self;
+}
+
+static void
+CertificateBundle_dealloc(CertificateBundle* self)
+{
+    Py_ssize_t i;
+
+    TraceMethodEnter(self);
+
+    if (self->certs) {
+        for (i = 0; i < self->n_entries; i++) {
+            Py_XDECREF(self->certs[i]);
+        }
+        PyMem_Free(self->certs);
+    }
+    PyMem_RawFree(self->entries);
+
+    if (self->view.obj) {
+        PyBuffer_Release(&self->view);
+    }
+    if (self->addr) {
+        PR_MemUnmap(self->addr, self->map_len);
+    }
+    if (self->file_map) {
+        PR_CloseFileMap(self->file_map);
+    }
+    if (self->fd) {
+        PR_Close(self->fd);
+    }
+    Py_XDECREF(self->py_certdb);
+
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+PyDoc_STRVAR(CertificateBundle_doc,
+"CertificateBundle()\n\
+\n\
+A sequence of the certificates found in a PEM bundle or a stream of\n\
+concatenated DER certificates, see `nss.load_certificates()`.\n\
+\n\
+Each certificate is decoded into a `Certificate` the first time it is\n\
+accessed, later accesses return the same object.\n\
+");
+
+static PySequenceMethods CertificateBundle_as_sequence = {
+    (lenfunc)CertificateBundle_length,		/* sq_length */
+    0,						/* sq_concat */
+    0,						/* sq_repeat */
+    (ssizeargfunc)CertificateBundle_item,	/* sq_item */
+    0,						/* sq_slice */
+    0,						/* sq_ass_item */
+    0,						/* sq_ass_slice */
+    0,						/* sq_contains */
+    0,						/* sq_inplace_concat */
+    0,						/* sq_inplace_repeat */
+};
+
+static PyTypeObject CertificateBundleType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "nss.nss.CertificateBundle",		/* tp_name */
+    sizeof(CertificateBundle),			/* tp_basicsize */
+    0,						/* tp_itemsize */
+    (destructor)CertificateBundle_dealloc,	/* tp_dealloc */
+    0,						/* tp_print */
+    0,						/* tp_getattr */
+    0,						/* tp_setattr */
+    0,						/* tp_compare */
+    0,						/* tp_repr */
+    0,						/* tp_as_number */
+    &CertificateBundle_as_sequence,		/* tp_as_sequence */
+    0,						/* tp_as_mapping */
+    0,						/* tp_hash */
+    0,						/* tp_call */
+    0,						/* tp_str */
+    0,						/* tp_getattro */
+    0,						/* tp_setattro */
+    0,						/* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,				/* tp_flags */
+    CertificateBundle_doc,			/* tp_doc */
+    (traverseproc)0,				/* tp_traverse */
+    (inquiry)0,					/* tp_clear */
+    0,						/* tp_richcompare */
+    0,						/* tp_weaklistoffset */
+    0,						/* tp_iter */
+    0,						/* tp_iternext */
+    CertificateBundle_methods,			/* tp_methods */
+    0,						/* tp_members */
+    0,						/* tp_getset */
+    0,						/* tp_base */
+    0,						/* tp_dict */
+    0,						/* tp_descr_get */
+    0,						/* tp_descr_set */
+    0,						/* tp_dictoffset */
+    0,						/* tp_init */
+    0,						/* tp_alloc */
+    CertificateBundle_new,			/* tp_new */
 };
+
 /* ========================== PK11 Methods =========================== */
 
 static char *
@@ -22080,6 +25266,8 @@ nss_nss_shutdown_context(PyObject *self, PyObject *args)
     }
     Py_END_ALLOW_THREADS
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -22165,6 +25353,9 @@ nss_nss_shutdown(PyObject *self, PyObject *args)
     }
     Py_END_ALLOW_THREADS
 
+    /* The certdb handles in the cache keys are no longer valid */
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -22897,6 +26088,7 @@ pk11_create_context_by_sym_key(PyObject *self, PyObject *args, PyObject *kwds)
         PyErr_SetString(PyExc_MemoryError, "unable to create PK11Context object");
         return NULL;
     }
+    ((PyPK11Context *)py_pk11_context)->mechanism = mechanism;
 
     return py_pk11_context;
 }
@@ -23372,6 +26564,8 @@ pk11_import_crl(PyObject *self, PyObject *args)
 
     Py_DECREF(pin_args);
 
+    verify_cache_invalidate();
+
     return SignedCRL_new_from_CERTSignedCRL(signed_crl);
 }
 
@@ -23505,6 +26699,13 @@ PyDoc_STRVAR(cert_decode_der_crl_doc,
         \n\
         or use CRL_DECODE_DEFAULT_OPTIONS\n\
 \n\
+Decode a DER encoded CRL without importing it.\n\
+\n\
+With CRL_DECODE_SKIP_ENTRIES only the CRL header is decoded, which\n\
+makes loading a large CRL fast. The entries are decoded the first time\n\
+`SignedCRL.entries` or `SignedCRL.is_revoked()` is used. With\n\
+CRL_DECODE_DONT_COPY_DER the `SignedCRL` shares the memory of der_crl\n\
+and keeps a reference to it.\n\
 ");
 
 static PyObject *
@@ -23515,19 +26716,34 @@ cert_decode_der_crl(PyObject *self, PyObject *args, PyObject *kwds)
     int type = SEC_CRL_TYPE;
     int decode_options = CRL_DECODE_DEFAULT_OPTIONS;
     CERTSignedCrl *signed_crl;
+    SignedCRL *py_signed_crl = NULL;
 
     TraceMethodEnter(self);
 
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|ii:decode_der_crl", kwlist,
                                      &SecItemType, &py_der_crl,
-                                     &py_der_crl, &type, &decode_options))
+                                     &type, &decode_options))
         return NULL;
 
-    if ((signed_crl = CERT_DecodeDERCrlWithFlags(NULL, &py_der_crl->item, type,  decode_options)) == NULL) {
+    Py_BEGIN_ALLOW_THREADS
+    signed_crl = CERT_DecodeDERCrlWithFlags(NULL, &py_der_crl->item, type, decode_options);
+    Py_END_ALLOW_THREADS
+
+    if (signed_crl == NULL) {
         return set_nspr_error(NULL);
     }
 
-    return SignedCRL_new_from_CERTSignedCRL(signed_crl);
+    if ((py_signed_crl = (SignedCRL *)SignedCRL_new_from_CERTSignedCRL(signed_crl)) == NULL) {
+        SEC_DestroyCrl(signed_crl);
+        return NULL;
+    }
+
+    if (decode_options & CRL_DECODE_DONT_COPY_DER) {
+        Py_INCREF(py_der_crl);
+        py_signed_crl->py_der = (PyObject *)py_der_crl;
+    }
+
+    return (PyObject *)py_signed_crl;
 }
 
 PyDoc_STRVAR(nss_read_der_from_file_doc,
@@ -23603,6 +26819,154 @@ nss_read_der_from_file(PyObject *self, PyObject *args, PyObject *kwds)
     return NULL;
 }
 
+PyDoc_STRVAR(nss_decode_certificate_doc,
+"decode_certificate(data) -> Certificate\n\
+\n\
+:Parameters:\n\
+    data : SecItem or any buffer compatible object\n\
+        Data to initialize the certificate from, must be in DER format\n\
+\n\
+Decode data into a `Certificate` without registering it with any\n\
+certdb, equivalent to `Certificate.parse()`.\n\
+");
+
+static PyObject *
+nss_decode_certificate(PyObject *self, PyObject *args)
+{
+    SECItem_param *data_param = NULL;
+    PyObject *py_cert = NULL;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "O&:decode_certificate",
+                          SECItemConvert, &data_param))
+        return NULL;
+
+    py_cert = Certificate_new_from_der_parse_only(&data_param->item);
+    SECItem_param_release(data_param);
+
+    return py_cert;
+}
+
+PyDoc_STRVAR(nss_load_certificates_doc,
+"load_certificates(source, certdb=None) -> CertificateBundle\n\
+\n\
+:Parameters:\n\
+    source : path or buffer\n\
+        If a str or path-like object the pathname of the file to\n\
+        load, otherwise any read buffer compatible object holding\n\
+        the bundle.\n\
+    certdb : CertDB object or None\n\
+        CertDB certificate database object the certificates are\n\
+        decoded into, if None the default certdb is used.\n\
+\n\
+Load a bundle of certificates, either PEM text holding any number\n\
+of CERTIFICATE blocks (other text and PEM blocks are ignored) or a\n\
+stream of concatenated DER certificates.\n\
+\n\
+A file is memory mapped and a buffer is referenced, not copied. The\n\
+certificate boundaries are found in C with the GIL released but no\n\
+certificate is decoded until it is accessed, the returned\n\
+`CertificateBundle` is a sequence of `Certificate` objects decoded on\n\
+first access. Use `CertificateBundle.import_certs()` to decode all of\n\
+them at once.\n\
+\n\
+Raises ValueError if the data is not a well formed bundle.\n\
+");
+
+static PyObject *
+nss_load_certificates(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"source", "certdb", NULL};
+    PyObject *py_source = NULL;
+    PyObject *py_certdb = NULL;
+    PyObject *py_path = NULL;
+    CertificateBundle *py_bundle = NULL;
+    PRInt64 file_size = 0;
+    const char *error_message = NULL;
+    Py_ssize_t error_offset = 0;
+    bool too_large = false;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O&:load_certificates", kwlist,
+                                     &py_source,
+                                     CertDBOrNoneConvert, &py_certdb))
+        return NULL;
+
+    if ((py_bundle = (CertificateBundle *)
+         CertificateBundle_new(&CertificateBundleType, NULL, NULL)) == NULL) {
+        return NULL;
+    }
+
+    Py_XINCREF(py_certdb);
+    py_bundle->py_certdb = py_certdb;
+
+    if (PyUnicode_Check(py_source) || PyObject_HasAttrString(py_source, "__fspath__")) {
+        if (!PyUnicode_FSConverter(py_source, &py_path)) {
+            goto fail;
+        }
+
+        Py_BEGIN_ALLOW_THREADS
+        if ((py_bundle->fd = open_mapped_file(PyBytes_AS_STRING(py_path), &file_size)) != NULL &&
+            file_size > 0) {
+            if (file_size > PR_UINT32_MAX) {
+                too_large = true;
+            } else if ((py_bundle->file_map = PR_CreateFileMap(py_bundle->fd, file_size,
+                                                               PR_PROT_READONLY)) != NULL &&
+                       (py_bundle->addr = PR_MemMap(py_bundle->file_map, 0, file_size)) != NULL) {
+                py_bundle->map_len = file_size;
+            }
+        }
+        Py_END_ALLOW_THREADS
+
+        if (too_large) {
+            PyErr_Format(PyExc_ValueError, "file \"%s\" is too large to map",
+                         PyBytes_AS_STRING(py_path));
+            goto fail;
+        }
+        if (py_bundle->fd == NULL || (file_size > 0 && py_bundle->addr == NULL)) {
+            set_nspr_error("unable to map file \"%s\"", PyBytes_AS_STRING(py_path));
+            goto fail;
+        }
+        py_bundle->data = py_bundle->addr;
+        py_bundle->data_len = py_bundle->map_len;
+    } else {
+        if (PyObject_GetBuffer(py_source, &py_bundle->view, PyBUF_SIMPLE) != 0) {
+            goto fail;
+        }
+        py_bundle->data = py_bundle->view.buf;
+        py_bundle->data_len = py_bundle->view.len;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    error_message = CertificateBundle_scan(py_bundle, &error_offset);
+    Py_END_ALLOW_THREADS
+
+    if (error_message == certificate_bundle_no_memory) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+    if (error_message) {
+        PyErr_Format(PyExc_ValueError, "%s at offset %zd", error_message, error_offset);
+        goto fail;
+    }
+
+    if ((py_bundle->certs = PyMem_Calloc(py_bundle->n_entries ? py_bundle->n_entries : 1,
+                                         sizeof(PyObject *))) == NULL) {
+        PyErr_NoMemory();
+        goto fail;
+    }
+
+    Py_XDECREF(py_path);
+    return (PyObject *)py_bundle;
+
+ fail:
+    Py_XDECREF(py_path);
+    Py_DECREF(py_bundle);
+    return NULL;
+}
+
 PyDoc_STRVAR(nss_base64_to_binary_doc,
 "base64_to_binary(text) -> SecItem\n\
 \n\
@@ -24807,6 +28171,8 @@ cert_set_use_pkix_for_validation(PyObject *self, PyObject *args)
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     if (prev_flag) {
         Py_RETURN_TRUE;
     } else {
@@ -24848,6 +28214,8 @@ cert_enable_ocsp_checking(PyObject *self, PyObject *args, PyObject *kwds)
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -24889,6 +28257,8 @@ cert_disable_ocsp_checking(PyObject *self, PyObject *args, PyObject *kwds)
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -24961,6 +28331,8 @@ cert_set_ocsp_failure_mode(PyObject *self, PyObject *args)
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -25007,9 +28379,388 @@ cert_clear_ocsp_cache(PyObject *self, PyObject *args)
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
+    Py_RETURN_NONE;
+}
+
+/*
+ * State shared by the verify_certificates() workers. Each worker claims
+ * the next unverified item by atomically incrementing next, results
+ * are written to the item's slot so no locking is needed.
+ */
+typedef struct {
+    CERTCertDBHandle *certdb_handle;
+    PRBool check_sig;
+    SECCertificateUsage required_usages;
+    PRTime pr_time;
+    PRInt32 n_items;
+    PRInt32 next;
+    CERTCertificate **certs;    /* NULL for items given as DER */
+    Py_buffer *views;           /* DER of items given as DER */
+    CertVerifyLog **logs;       /* NULL unless logs were requested */
+    SECCertificateUsage *usages;
+    PRErrorCode *errors;
+} VerifyBatch;
+
+static void
+verify_batch_worker(void *arg)
+{
+    VerifyBatch *batch = arg;
+    CERTCertificate *cert = NULL;
+    SECItem der;
+    PRInt32 i;
+
+    while ((i = PR_AtomicIncrement(&batch->next) - 1) < batch->n_items) {
+        if ((cert = batch->certs[i]) == NULL) {
+            der.type = siDERCertBuffer;
+            der.data = batch->views[i].buf;
+            der.len = batch->views[i].len;
+            if ((cert = CERT_NewTempCertificate(batch->certdb_handle, &der,
+                                                NULL, PR_FALSE, PR_TRUE)) == NULL) {
+                batch->errors[i] = PORT_GetError();
+                continue;
+            }
+        }
+
+        if (CERT_VerifyCertificate(batch->certdb_handle, cert,
+                                   batch->check_sig, batch->required_usages,
+                                   batch->pr_time, NULL,
+                                   batch->logs ? &batch->logs[i]->log : NULL,
+                                   &batch->usages[i]) != SECSuccess) {
+            batch->errors[i] = PORT_GetError();
+        }
+
+        if (cert != batch->certs[i]) {
+            CERT_DestroyCertificate(cert);
+        }
+    }
+}
+
+PyDoc_STRVAR(cert_verify_certificates_doc,
+"verify_certificates(certs, certdb, check_sig, required_usages, time=None, workers=0, log=False) -> [(valid_usages, error), ...]\n\
+\n\
+:Parameters:\n\
+    certs : sequence of `Certificate` objects or DER buffers\n\
+        the certificates to verify, an item which is not a\n\
+        `Certificate` must support the buffer protocol and contain\n\
+        a DER encoded certificate\n\
+    certdb : CertDB object\n\
+        CertDB certificate database object\n\
+    check_sig : bool\n\
+        True if certificate signatures should be checked\n\
+    required_usages : integer\n\
+        A bitfield of all cert usages that are required for verification\n\
+        to succeed. If zero return all possible valid usages.\n\
+    time : number or None\n\
+        an optional point in time as number of microseconds\n\
+        since the NSPR epoch, midnight (00:00:00) 1 January\n\
+        1970 UTC, either as an integer or a float. If time \n\
+        is None the current time is used.\n\
+    workers : int\n\
+        number of threads verifying certificates, the calling\n\
+        thread included. If zero the number of processors is used.\n\
+    log : bool\n\
+        if True return a `CertVerifyLog` for each certificate\n\
+\n\
+Verify a batch of certificates, equivalent to calling\n\
+`Certificate.verify()` for each item of certs but the certificates\n\
+are verified in parallel by native threads without the GIL.\n\
+\n\
+Returns a list in the same order as certs. Each element is a\n\
+(valid_usages, error) tuple, error is 0 if the certificate verified\n\
+successfully and otherwise the NSPR error code, see\n\
+`nss.error.get_nspr_error_string()`. If log is True each element is a\n\
+(valid_usages, error, log) tuple.\n\
+\n\
+Verification failures do not raise an exception. The password\n\
+callback is not invoked from the worker threads and the verification\n\
+cache (see `set_verify_cache_settings()`) is not used.\n\
+");
+static PyObject *
+cert_verify_certificates(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"certs", "certdb", "check_sig", "required_usages",
+                             "time", "workers", "log", NULL};
+    PyObject *py_certs = NULL;
+    CertDB *py_certdb = NULL;
+    PyObject *py_check_sig = NULL;
+    long required_usages = 0;
+    PRTime pr_time = 0;
+    int workers = 0;
+    PyObject *py_log = NULL;
+    PyObject *py_seq = NULL;
+    PyObject *py_item = NULL;
+    PyObject *py_result = NULL;
+    PRThread **threads = NULL;
+    VerifyBatch batch;
+    Py_ssize_t n_items, n_views = 0, n_logs = 0, i;
+    int n_threads = 0;
+
+    TraceMethodEnter(self);
+
+    memset(&batch, 0, sizeof(batch));
+    pr_time = PR_Now();
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO!O!l|O&iO!:verify_certificates", kwlist,
+                                     &py_certs,
+                                     &CertDBType, &py_certdb,
+                                     &PyBool_Type, &py_check_sig,
+                                     &required_usages,
+                                     PRTimeConvert, &pr_time,
+                                     &workers,
+                                     &PyBool_Type, &py_log))
+        return NULL;
+
+    if (workers < 0) {
+        PyErr_SetString(PyExc_ValueError, "workers must not be negative");
+        return NULL;
+    }
+
+    /*
+     * Snapshot certs in a tuple, a list could be modified (dropping the
+     * last reference to one of its Certificates) by another thread
+     * while the GIL is released.
+     */
+    if ((py_seq = PySequence_Tuple(py_certs)) == NULL) {
+        return NULL;
+    }
+    n_items = PyTuple_GET_SIZE(py_seq);
+
+    /* Leave room for every worker to increment next past the end */
+    if (n_items > PR_INT32_MAX / 2) {
+        PyErr_SetString(PyExc_OverflowError, "too many certs");
+        goto exit;
+    }
+
+    batch.certdb_handle = py_certdb->handle;
+    batch.check_sig = PyBoolAsPRBool(py_check_sig);
+    batch.required_usages = required_usages;
+    batch.pr_time = pr_time;
+    batch.n_items = n_items;
+
+    batch.certs = PyMem_New(CERTCertificate *, n_items);
+    batch.views = PyMem_New(Py_buffer, n_items);
+    batch.usages = PyMem_New(SECCertificateUsage, n_items);
+    batch.errors = PyMem_New(PRErrorCode, n_items);
+    if (!batch.certs || !batch.views || !batch.usages || !batch.errors) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    /*
+     * The tuple keeps the Certificate objects alive and the views
+     * keep the DER buffers valid while the GIL is released.
+     */
+    for (i = 0; i < n_items; i++) {
+        py_item = PyTuple_GET_ITEM(py_seq, i);
+        batch.usages[i] = 0;
+        batch.errors[i] = 0;
+        if (PyCertificate_Check(py_item)) {
+            batch.certs[i] = ((Certificate *)py_item)->cert;
+            batch.views[i].obj = NULL;
+            continue;
+        }
+        batch.certs[i] = NULL;
+        if (PyObject_GetBuffer(py_item, &batch.views[i], PyBUF_SIMPLE) != 0) {
+            goto exit;
+        }
+        n_views = i + 1;
+    }
+
+    if (py_log && PyBoolAsPRBool(py_log)) {
+        if ((batch.logs = PyMem_New(CertVerifyLog *, n_items)) == NULL) {
+            PyErr_NoMemory();
+            goto exit;
+        }
+        for (n_logs = 0; n_logs < n_items; n_logs++) {
+            if ((batch.logs[n_logs] = (CertVerifyLog *)
+                 CertVerifyLog_new(&CertVerifyLogType, NULL, NULL)) == NULL) {
+                goto exit;
+            }
+        }
+    }
+
+    if (workers == 0) {
+        workers = PR_GetNumberOfProcessors();
+    }
+    if (workers > n_items) {
+        workers = n_items;
+    }
+    if (workers > 1 && (threads = PyMem_New(PRThread *, workers - 1)) == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    /* If a thread cannot be created the remaining workers do its share */
+    for (n_threads = 0; n_threads < workers - 1; n_threads++) {
+        if ((threads[n_threads] = PR_CreateThread(PR_USER_THREAD, verify_batch_worker, &batch,
+                                                  PR_PRIORITY_NORMAL, PR_GLOBAL_THREAD,
+                                                  PR_JOINABLE_THREAD, 0)) == NULL) {
+            break;
+        }
+    }
+    verify_batch_worker(&batch);
+    for (i = 0; i < n_threads; i++) {
+        PR_JoinThread(threads[i]);
+    }
+    Py_END_ALLOW_THREADS
+
+    if ((py_result = PyList_New(n_items)) == NULL) {
+        goto exit;
+    }
+
+    for (i = 0; i < n_items; i++) {
+        if (batch.logs) {
+            py_item = Py_BuildValue("KiO", batch.usages[i], batch.errors[i],
+                                    batch.logs[i]);
+        } else {
+            py_item = Py_BuildValue("Ki", batch.usages[i], batch.errors[i]);
+        }
+        if (py_item == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_item);
+    }
+
+ exit:
+    for (i = 0; i < n_views; i++) {
+        if (batch.certs[i] == NULL) {
+            PyBuffer_Release(&batch.views[i]);
+        }
+    }
+    for (i = 0; i < n_logs; i++) {
+        Py_DECREF(batch.logs[i]);
+    }
+    PyMem_Free(threads);
+    PyMem_Free(batch.certs);
+    PyMem_Free(batch.views);
+    PyMem_Free(batch.usages);
+    PyMem_Free(batch.errors);
+    PyMem_Free(batch.logs);
+    Py_DECREF(py_seq);
+
+    return py_result;
+}
+
+PyDoc_STRVAR(cert_set_verify_cache_settings_doc,
+"set_verify_cache_settings(max_cache_entries, ttl=300)\n\
+\n\
+:Parameters:\n\
+    max_cache_entries : int\n\
+        Maximum number of cache entries, 0 disables the cache.\n\
+    ttl : int\n\
+        Maximum number of seconds a verification result is cached.\n\
+\n\
+Enables or disables the cache of certificate verification results\n\
+used by `Certificate.verify_now()` and `Certificate.verify()`. The\n\
+cache is disabled by default.\n\
+\n\
+Only successful verifications are cached, keyed by the certificate\n\
+DER, required_usages, certdb, check_sig and the verification time\n\
+divided by ttl. When the cache holds max_cache_entries results the\n\
+least recently used is evicted. A result is not returned past ttl\n\
+seconds or the certificate's not_after time, whichever is earlier.\n\
+\n\
+The cache is cleared when CRLs are imported or deleted, trust is\n\
+changed with `Certificate.set_trust_attributes()`, the OCSP cache is\n\
+cleared or the OCSP or PKIX validation settings are changed through\n\
+this module. Call `clear_verify_cache()` if verification inputs are\n\
+changed by other means.\n\
+\n\
+Changing the settings clears the cache, see also `get_verify_cache_stats()`.\n\
+");
+static PyObject *
+cert_set_verify_cache_settings(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"max_cache_entries", "ttl", NULL};
+    Py_ssize_t max_cache_entries = 0;
+    unsigned int ttl = 300;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "n|I:set_verify_cache_settings", kwlist,
+                                     &max_cache_entries, &ttl))
+        return NULL;
+
+    if (max_cache_entries < 0) {
+        PyErr_SetString(PyExc_ValueError, "max_cache_entries must not be negative");
+        return NULL;
+    }
+    if (ttl == 0) {
+        PyErr_SetString(PyExc_ValueError, "ttl must be at least 1 second");
+        return NULL;
+    }
+
+    verify_cache_invalidate();
+
+    if (max_cache_entries == 0) {
+        Py_CLEAR(verify_cache);
+    } else if (verify_cache == NULL) {
+        if ((verify_cache = PyDict_New()) == NULL) {
+            return NULL;
+        }
+    }
+    verify_cache_max_entries = max_cache_entries;
+    verify_cache_ttl = (PRTime)ttl * PR_USEC_PER_SEC;
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(cert_clear_verify_cache_doc,
+"clear_verify_cache()\n\
+\n\
+Removes all items currently stored in the certificate verification\n\
+cache, see `set_verify_cache_settings()`.\n\
+");
+static PyObject *
+cert_clear_verify_cache(PyObject *self, PyObject *args)
+{
+    TraceMethodEnter(self);
+
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
+PyDoc_STRVAR(cert_get_verify_cache_stats_doc,
+"get_verify_cache_stats() -> dict\n\
+\n\
+Returns a dict of the certificate verification cache statistics:\n\
+\n\
+    enabled\n\
+        True if the cache is enabled\n\
+    max_entries\n\
+        the maximum number of entries\n\
+    entries\n\
+        the number of cached results\n\
+    hits\n\
+        verifications answered from the cache\n\
+    misses\n\
+        verifications performed while the cache was enabled\n\
+    evictions\n\
+        results removed to make room for new ones\n\
+    invalidations\n\
+        times the cache was cleared\n\
+\n\
+The counters are cumulative, see `set_verify_cache_settings()`.\n\
+");
+static PyObject *
+cert_get_verify_cache_stats(PyObject *self, PyObject *args)
+{
+    TraceMethodEnter(self);
+
+    return Py_BuildValue("{s:N,s:n,s:n,s:k,s:k,s:k,s:k}",
+                         "enabled", PyBool_FromLong(verify_cache != NULL),
+                         "max_entries", verify_cache_max_entries,
+                         "entries", verify_cache ? PyDict_GET_SIZE(verify_cache) : 0,
+                         "hits", verify_cache_hits,
+                         "misses", verify_cache_misses,
+                         "evictions", verify_cache_evictions,
+                         "invalidations", verify_cache_invalidations);
+}
+
 PyDoc_STRVAR(cert_set_ocsp_default_responder_doc,
 "set_ocsp_default_responder(certdb, url, nickname)\n\
 \n\
@@ -25056,6 +28807,8 @@ cert_set_ocsp_default_responder(PyObject *self, PyObject *args)
     Py_XDECREF(py_url_utf8);
     Py_XDECREF(py_nickname_utf8);
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -25097,6 +28850,8 @@ cert_enable_ocsp_default_responder(PyObject *self, PyObject *args, PyObject *kwd
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -25134,6 +28889,8 @@ cert_disable_ocsp_default_responder(PyObject *self, PyObject *args, PyObject *kw
         return set_nspr_error(NULL);
     }
 
+    verify_cache_invalidate();
+
     Py_RETURN_NONE;
 }
 
@@ -25168,6 +28925,8 @@ module_methods[] = {
     {"sha1_digest",                      (PyCFunction)pk11_sha1_digest,                    METH_VARARGS,               pk11_sha1_digest_doc},
     {"sha256_digest",                    (PyCFunction)pk11_sha256_digest,                  METH_VARARGS,               pk11_sha256_digest_doc},
     {"sha512_digest",                    (PyCFunction)pk11_sha512_digest,                  METH_VARARGS,               pk11_sha512_digest_doc},
+    {"digest_many",                      (PyCFunction)pk11_digest_many,                    METH_VARARGS|METH_KEYWORDS, pk11_digest_many_doc},
+    {"digest_file",                      (PyCFunction)pk11_digest_file,                    METH_VARARGS,               pk11_digest_file_doc},
     {"indented_format",                  (PyCFunction)py_indented_format,                  METH_VARARGS|METH_KEYWORDS, py_indented_format_doc},
     {"make_line_fmt_tuples",             (PyCFunction)py_make_line_fmt_tuples,             METH_VARARGS|METH_KEYWORDS, py_make_line_fmt_tuples_doc},
     {"der_universal_secitem_fmt_lines",  (PyCFunction)cert_der_universal_secitem_fmt_lines, METH_VARARGS|METH_KEYWORDS, cert_der_universal_secitem_fmt_lines_doc},
@@ -25210,6 +28969,8 @@ module_methods[] = {
     {"is_fips",                          (PyCFunction)pk11_pk11_is_fips,                   METH_NOARGS,                pk11_pk11_is_fips_doc},
     {"decode_der_crl",                   (PyCFunction)cert_decode_der_crl,                 METH_VARARGS|METH_KEYWORDS, cert_decode_der_crl_doc},
     {"read_der_from_file",               (PyCFunction)nss_read_der_from_file,              METH_VARARGS|METH_KEYWORDS, nss_read_der_from_file_doc},
+    {"load_certificates",                (PyCFunction)nss_load_certificates,               METH_VARARGS|METH_KEYWORDS, nss_load_certificates_doc},
+    {"decode_certificate",               (PyCFunction)nss_decode_certificate,              METH_VARARGS,               nss_decode_certificate_doc},
     {"base64_to_binary",                 (PyCFunction)nss_base64_to_binary,                METH_VARARGS|METH_KEYWORDS, nss_base64_to_binary_doc},
     {"x509_key_usage",                   (PyCFunction)cert_x509_key_usage,                 METH_VARARGS|METH_KEYWORDS, cert_x509_key_usage_doc},
     {"x509_cert_type",                   (PyCFunction)cert_x509_cert_type,                 METH_VARARGS|METH_KEYWORDS, cert_x509_cert_type_doc},
@@ -25236,6 +28997,10 @@ module_methods[] = {
     {"set_ocsp_failure_mode",            (PyCFunction)cert_set_ocsp_failure_mode,          METH_VARARGS,               cert_set_ocsp_failure_mode_doc},
     {"set_ocsp_timeout",                 (PyCFunction)cert_set_ocsp_timeout,               METH_VARARGS,               cert_set_ocsp_timeout_doc},
     {"clear_ocsp_cache",                 (PyCFunction)cert_clear_ocsp_cache,               METH_NOARGS,                cert_clear_ocsp_cache_doc},
+    {"verify_certificates",              (PyCFunction)cert_verify_certificates,            METH_VARARGS|METH_KEYWORDS, cert_verify_certificates_doc},
+    {"set_verify_cache_settings",        (PyCFunction)cert_set_verify_cache_settings,      METH_VARARGS|METH_KEYWORDS, cert_set_verify_cache_settings_doc},
+    {"clear_verify_cache",               (PyCFunction)cert_clear_verify_cache,             METH_NOARGS,                cert_clear_verify_cache_doc},
+    {"get_verify_cache_stats",           (PyCFunction)cert_get_verify_cache_stats,         METH_NOARGS,                cert_get_verify_cache_stats_doc},
     {"set_ocsp_default_responder",       (PyCFunction)cert_set_ocsp_default_responder,     METH_VARARGS,               cert_set_ocsp_default_responder_doc},
     {"enable_ocsp_default_responder",    (PyCFunction)cert_enable_ocsp_default_responder,  METH_VARARGS|METH_KEYWORDS, cert_enable_ocsp_default_responder_doc},
     {"disable_ocsp_default_responder",   (PyCFunction)cert_disable_ocsp_default_responder, METH_VARARGS|METH_KEYWORDS, cert_disable_ocsp_default_responder_doc},
@@ -25336,6 +29101,8 @@ MOD_INIT(nss)
     TYPE_READY(CertificateType);
     TYPE_READY(PrivateKeyType);
     TYPE_READY(SignedCRLType);
+    TYPE_READY(CRLEntryType);
+    TYPE_READY(CRLEntriesType);
     TYPE_READY(PK11SlotType);
     TYPE_READY(PK11SymKeyType);
     TYPE_READY(PK11ContextType);
@@ -25357,6 +29124,7 @@ MOD_INIT(nss)
     TYPE_READY(PKCS12DecoderType);
     TYPE_READY(CertVerifyLogNodeType);
     TYPE_READY(CertVerifyLogType);
+    TYPE_READY(CertificateBundleType);
 
     /* Export C API */
     if (PyModule_AddObject(m, "_C_API",
@@ -25839,6 +29607,12 @@ if (_AddIntConstantWithLookup(m, #constant, constant, \
 
     ExportConstant(CKM_ECDSA);
     ExportConstant(CKM_ECDSA_SHA1);
+#if defined(CKM_ECDSA_SHA256)
+    ExportConstant(CKM_ECDSA_SHA224);
+    ExportConstant(CKM_ECDSA_SHA256);
+    ExportConstant(CKM_ECDSA_SHA384);
+    ExportConstant(CKM_ECDSA_SHA512);
+#endif
 
     /* CKM_ECDH1_DERIVE, CKM_ECDH1_COFACTOR_DERIVE, and CKM_ECMQV_DERIVE
      * are new for v2.11 */
@@ -25864,6 +29638,15 @@ if (_AddIntConstantWithLookup(m, #constant, constant, \
     ExportConstant(CKM_AES_MAC);
     ExportConstant(CKM_AES_MAC_GENERAL);
     ExportConstant(CKM_AES_CBC_PAD);
+    ExportConstant(CKM_AES_CTR);
+    ExportConstant(CKM_AES_GCM);
+
+#ifdef HAVE_AEAD
+    ExportConstant(CKM_CHACHA20_KEY_GEN);
+    ExportConstant(CKM_CHACHA20_POLY1305);
+    ExportConstant(CKM_NSS_CHACHA20_KEY_GEN);
+    ExportConstant(CKM_NSS_CHACHA20_POLY1305);
+#endif
 
     /* BlowFish and TwoFish are new for v2.20 */
     ExportConstant(CKM_BLOWFISH_KEY_GEN);
@@ -53,6 +53,7 @@ typedef struct {
     SECItem item;
     SECItemKind kind;
     int buffer_exports;
+    Py_hash_t hash;             /* -1 until computed */
 } SecItem;
 
 #define SecItem_GET_SIZE(op)  (Py_ssize_t)(op->item.len)
@@ -94,6 +95,13 @@ typedef struct {
 typedef struct {
     PyObject_HEAD
     CERTCertificate *cert;
+    Py_hash_t hash;             /* hash of the DER, -1 until computed */
+    /* Lazily decoded views of cert, NULL until first accessed */
+    PyObject *py_subject;
+    PyObject *py_issuer;
+    PyObject *py_signed_data;
+    PyObject *py_subject_public_key_info;
+    PyObject *py_extensions;
 } Certificate;
 
 
@@ -113,8 +121,30 @@ typedef struct {
 typedef struct {
     PyObject_HEAD
     CERTSignedCrl *signed_crl;
+    PyObject *py_der;               /* keeps uncopied DER data alive */
+    Py_ssize_t n_entries;           /* -1 until the entries are decoded */
+    CERTCrlEntry **serial_index;    /* entries sorted by serial number */
 } SignedCRL;
 
+/* ========================================================================== */
+/* ============================== CRLEntry Class ============================ */
+/* ========================================================================== */
+
+typedef struct {
+    PyObject_HEAD
+    SignedCRL *py_crl;
+    CERTCrlEntry *entry;
+} CRLEntry;
+
+/* ========================================================================== */
+/* ============================= CRLEntries Class =========================== */
+/* ========================================================================== */
+
+typedef struct {
+    PyObject_HEAD
+    SignedCRL *py_crl;
+} CRLEntries;
+
 /* ========================================================================== */
 /* =========================== PyRSAPublicKey Class ========================= */
 /* ========================================================================== */
@@ -216,6 +246,7 @@ typedef struct {
 typedef struct {
     PyObject_HEAD
     PK11Context *pk11_context;
+    CK_MECHANISM_TYPE mechanism;  /* CKM_INVALID_MECHANISM if unknown */
 } PyPK11Context;
 
 /* ========================================================================== */
@@ -246,6 +277,7 @@ typedef struct {
     PyObject_HEAD
     PRArenaPool *arena;
     CERTName name;
+    Py_hash_t hash;             /* -1 until computed, then immutable */
 } DN;
 
 /* ========================================================================== */
@@ -401,6 +433,31 @@ typedef struct {
     CERTVerifyLog log;
 } CertVerifyLog;
 
+/* ========================================================================== */
+/* ========================== CertificateBundle Class ======================= */
+/* ========================================================================== */
+
+typedef struct {
+    Py_ssize_t offset;          /* of the DER, or of the base64 text if PEM */
+    Py_ssize_t len;
+} CertificateBundleEntry;
+
+typedef struct {
+    PyObject_HEAD
+    PyObject *py_certdb;        /* CertDB, NULL for the default certdb */
+    Py_buffer view;             /* source buffer, view.obj NULL if mapped */
+    PRFileDesc *fd;             /* mapped source file */
+    PRFileMap *file_map;
+    void *addr;
+    PRUint32 map_len;
+    const unsigned char *data;
+    Py_ssize_t data_len;
+    bool pem;
+    Py_ssize_t n_entries;
+    CertificateBundleEntry *entries;
+    PyObject **certs;           /* Certificate per entry, NULL until decoded */
+} CertificateBundle;
+
 /* ========================================================================== */
 
 typedef struct {
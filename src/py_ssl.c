@@ -19,6 +19,7 @@
 #include "py_nspr_error.h"
 
 #include "sslproto.h"           /* for cipher constants */
+#include "sslexp.h"             /* for resumption tokens */
 
 static PyObject *empty_tuple = NULL;
 
@@ -56,6 +57,20 @@ ssl_library_version_from_pyobject(PyObject *py_value, const char *bound, unsigne
 static PyObject *
 SSLChannelInformation_new_from_SSLChannelInfo(SSLChannelInfo *info);
 
+static SECStatus
+ssl_auth_certificate(void *arg, PRFileDesc *pr_socket, PRBool check_sig, PRBool is_server);
+
+static void
+ssl_handshake_callback(PRFileDesc *fd, void *arg);
+
+static SECStatus
+get_client_auth_data(void *arg, PRFileDesc *fd, CERTDistNames *caNames, CERTCertificate **pRetCert, SECKEYPrivateKey **pRetKey);
+
+static int
+SSLSocket_check_model(PyObject **py_model);
+
+static SECStatus
+ssl_resumption_token(PRFileDesc *fd, const PRUint8 *token, unsigned int len, void *arg);
 
 static PyObject *
 cipher_suite_to_name(unsigned long cipher_suite)
@@ -352,6 +367,10 @@ SSL_NO_CACHE: (default=False)\n\
     turn this option on, this socket will be unable to resume a session\n\
     begun by another socket. When this socket's session is finished, no\n\
     other socket will be able to resume the session begun by this socket.\n\
+SSL_ENABLE_SESSION_TICKETS: (default=False)\n\
+    Enables session tickets (RFC 5077). A server issues tickets, a client\n\
+    asks for them with TLS 1.2. Only sessions backed by a ticket can be\n\
+    exported with `SSLSocket.set_resumption_token_callback()`.\n\
 SSL_ROLLBACK_DETECTION: (default=True)\n\
     Disables detection of a rollback attack. Factory setting is on. You\n\
     must turn this option off to interoperate with TLS clients ( such as\n\
@@ -521,6 +540,58 @@ SSLSocket_get_ssl_option(SSLSocket *self, PyObject *args)
     return PyLong_FromLong(value);
 }
 
+/*
+ * A socket accepted on a listening SSL socket, or imported with a model
+ * socket, inherits the listener's (model's) hooks, including their arg
+ * which is the listening SSLSocket. Rebind them to the new SSLSocket so
+ * callbacks are handed the socket object the application holds and
+ * don't reference the listener.
+ */
+static SECStatus
+SSLSocket_inherit_callbacks(SSLSocket *self, SSLSocket *listener)
+{
+    if (listener->py_auth_certificate_callback) {
+        ASSIGN_REF(self->py_auth_certificate_callback, listener->py_auth_certificate_callback);
+        ASSIGN_REF(self->py_auth_certificate_callback_data, listener->py_auth_certificate_callback_data);
+        if (SSL_AuthCertificateHook(self->pr_socket, ssl_auth_certificate, self) != SECSuccess) {
+            return SECFailure;
+        }
+    }
+
+    if (listener->py_handshake_callback) {
+        ASSIGN_REF(self->py_handshake_callback, listener->py_handshake_callback);
+        ASSIGN_REF(self->py_handshake_callback_data, listener->py_handshake_callback_data);
+        if (SSL_HandshakeCallback(self->pr_socket, ssl_handshake_callback, self) != SECSuccess) {
+            return SECFailure;
+        }
+    }
+
+    if (listener->py_client_auth_data_callback) {
+        ASSIGN_REF(self->py_client_auth_data_callback, listener->py_client_auth_data_callback);
+        ASSIGN_REF(self->py_client_auth_data_callback_data, listener->py_client_auth_data_callback_data);
+        if (SSL_GetClientAuthDataHook(self->pr_socket, get_client_auth_data, self) != SECSuccess) {
+            return SECFailure;
+        }
+    }
+
+    if (listener->py_resumption_token_callback) {
+        ASSIGN_REF(self->py_resumption_token_callback, listener->py_resumption_token_callback);
+        ASSIGN_REF(self->py_resumption_token_callback_data, listener->py_resumption_token_callback_data);
+        if (SSL_SetResumptionTokenCallback(self->pr_socket, ssl_resumption_token, self) != SECSuccess) {
+            return SECFailure;
+        }
+    }
+
+    if (listener->py_pk11_pin_args) {
+        ASSIGN_REF(self->py_pk11_pin_args, listener->py_pk11_pin_args);
+        if (SSL_SetPKCS11PinArg(self->pr_socket, self->py_pk11_pin_args) != SECSuccess) {
+            return SECFailure;
+        }
+    }
+
+    return SECSuccess;
+}
+
 PyDoc_STRVAR(SSLSocket_accept_doc,
 "accept(timeout=PR_INTERVAL_NO_TIMEOUT) -> (Socket, NetworkAddress)\n\
 \n\
@@ -543,6 +614,9 @@ nss.error.NSPRError exception with the error code PR_IO_TIMEOUT_ERROR.\n\
 \n\
 Socket.accept() returns a tuple containing a new Socket object and\n\
 Networkaddress object for the peer.\n\
+\n\
+The new socket inherits the callbacks installed on the listening\n\
+socket, they are invoked with the new socket as their socket argument.\n\
 ");
 
 static PyObject *
@@ -577,6 +651,11 @@ SSLSocket_accept(SSLSocket *self, PyObject *args, PyObject *kwds)
         goto error;
     }
 
+    if (SSLSocket_inherit_callbacks((SSLSocket *)py_ssl_socket, self) != SECSuccess) {
+        set_nspr_error(NULL);
+        goto error;
+    }
+
     if ((return_value = Py_BuildValue("NN", py_ssl_socket, py_netaddr)) == NULL) {
         goto error;
     }
@@ -589,6 +668,94 @@ SSLSocket_accept(SSLSocket *self, PyObject *args, PyObject *kwds)
     return NULL;
 }
 
+/*
+ * Callbacks are invoked with n_base_args per call arguments followed
+ * by the caller supplied user data. Rather than building that tuple
+ * on every invocation it is built once and cached on the socket, the
+ * per call slots are filled in with callback_args_set() and cleared
+ * again by callback_args_release().
+ *
+ * The cached tuple is only reused when nothing but the cache refers
+ * to it, a callback which kept a reference (e.g. through *args) or a
+ * nested invocation gets a fresh tuple instead.
+ *
+ * Returns a new reference.
+ */
+static PyObject *
+callback_args_acquire(PyObject **cached, Py_ssize_t n_base_args, PyObject *user_data)
+{
+    PyObject *args = NULL;
+    PyObject *item;
+    Py_ssize_t argc, i;
+
+    if (*cached && Py_REFCNT(*cached) == 1) {
+        Py_INCREF(*cached);
+        return *cached;
+    }
+
+    argc = n_base_args;
+    if (user_data) {
+        argc += PyTuple_Size(user_data);
+    }
+
+    if ((args = PyTuple_New(argc)) == NULL) {
+        return NULL;
+    }
+
+    for (i = 0; i < n_base_args; i++) {
+        Py_INCREF(Py_None);
+        PyTuple_SET_ITEM(args, i, Py_None);
+    }
+
+    for (i = n_base_args; i < argc; i++) {
+        item = PyTuple_GET_ITEM(user_data, i - n_base_args);
+        Py_INCREF(item);
+        PyTuple_SET_ITEM(args, i, item);
+    }
+
+    if (*cached == NULL) {
+        Py_INCREF(args);
+        *cached = args;
+    }
+
+    return args;
+}
+
+/* Store obj (reference is stolen) in the per call slot i of args */
+static void
+callback_args_set(PyObject *args, Py_ssize_t i, PyObject *obj)
+{
+    PyObject *tmp;
+
+    tmp = PyTuple_GET_ITEM(args, i);
+    PyTuple_SET_ITEM(args, i, obj);
+    Py_XDECREF(tmp);
+}
+
+/*
+ * Release args obtained from callback_args_acquire(). If args is the
+ * cached tuple its per call slots are reset so the cache does not
+ * keep them alive, unless the callback held on to the tuple in which
+ * case it can no longer be modified and is dropped from the cache.
+ */
+static void
+callback_args_release(PyObject **cached, PyObject *args, Py_ssize_t n_base_args)
+{
+    Py_ssize_t i;
+
+    if (args == *cached) {
+        if (Py_REFCNT(args) == 2) {
+            for (i = 0; i < n_base_args; i++) {
+                Py_INCREF(Py_None);
+                callback_args_set(args, i, Py_None);
+            }
+        } else {
+            Py_CLEAR(*cached);
+        }
+    }
+    Py_DECREF(args);
+}
+
 static SECStatus
 ssl_auth_certificate(void *arg, PRFileDesc *pr_socket, PRBool check_sig, PRBool is_server)
 {
@@ -598,47 +765,69 @@ ssl_auth_certificate(void *arg, PRFileDesc *pr_socket, PRBool check_sig, PRBool
     PyObject *py_ssl_socket = NULL;
     PyObject *result = NULL;
     PyObject *args = NULL;
-    PyObject *item;
-    Py_ssize_t argc;
-    int i, j;
+    long value;
+    int is_true;
     SECStatus sec_status = SECFailure;
 
     gstate = PyGILState_Ensure();
 
-    argc = n_base_args;
-    if (self->py_auth_certificate_callback_data)
-        argc += PyTuple_Size(self->py_auth_certificate_callback_data);
-
-    if ((args = PyTuple_New(argc)) == NULL) {
-        PySys_WriteStderr("SSLSocket.auth_certificate_func: out of memory\n");
+    /*
+     * Pass the SSLSocket the hook was installed on. Only a socket
+     * which inherited the hook without going through
+     * SSLSocket.accept() lacks one, wrap its descriptor.
+     */
+    if (pr_socket == self->pr_socket) {
+        Py_INCREF(self);
+        py_ssl_socket = (PyObject *)self;
+    } else if ((py_ssl_socket = SSLSocket_new_from_PRFileDesc(pr_socket, self->family)) == NULL) {
+        PySys_WriteStderr("SSLSocket.auth_certificate_func: cannot create socket object\n");
 	goto exit;
     }
 
-    if ((py_ssl_socket = SSLSocket_new_from_PRFileDesc(pr_socket, self->family)) == NULL) { /* FIXME: cached? what is family? */
-        PySys_WriteStderr("SSLSocket.auth_certificate_func: cannot create socket object\n");
+    if ((args = callback_args_acquire(&self->py_auth_certificate_args, n_base_args,
+                                      self->py_auth_certificate_callback_data)) == NULL) {
+        PySys_WriteStderr("SSLSocket.auth_certificate_func: out of memory\n");
+        Py_DECREF(py_ssl_socket);
 	goto exit;
     }
 
-    PyTuple_SetItem(args, 0, py_ssl_socket);
-    PyTuple_SetItem(args, 1, PyBool_FromLong(check_sig));
-    PyTuple_SetItem(args, 2, PyBool_FromLong(is_server));
+    callback_args_set(args, 0, py_ssl_socket);
+    callback_args_set(args, 1, PyBool_FromLong(check_sig));
+    callback_args_set(args, 2, PyBool_FromLong(is_server));
 
-    for (i = n_base_args, j = 0; i < argc; i++, j++) {
-        item = PyTuple_GetItem(self->py_auth_certificate_callback_data, j);
-        Py_INCREF(item);
-        PyTuple_SetItem(args, i, item);
-    }
+    result = PyObject_CallObject(self->py_auth_certificate_callback, args);
+    callback_args_release(&self->py_auth_certificate_args, args, n_base_args);
 
-    if ((result = PyObject_CallObject(self->py_auth_certificate_callback, args)) == NULL) {
+    if (result == NULL) {
         PySys_WriteStderr("exception in SSLSocket.auth_certificate_func\n");
         PyErr_Print();  /* this also clears the error */
 	goto exit;
     }
 
-    sec_status = PyObject_IsTrue(result) ? SECSuccess : SECFailure;
+    /*
+     * SECWouldBlock is an int, compare by value but do not let a bool
+     * (an int subclass) be mistaken for it.
+     */
+    if (PyLong_CheckExact(result)) {
+        value = PyLong_AsLong(result);
+        if (value == -1 && PyErr_Occurred()) {
+            /* Too large for a long, certainly not SECWouldBlock */
+            PyErr_Clear();
+        } else if (value == SECWouldBlock) {
+            sec_status = SECWouldBlock;
+            goto exit;
+        }
+    }
+
+    if ((is_true = PyObject_IsTrue(result)) < 0) {
+        PySys_WriteStderr("exception in SSLSocket.auth_certificate_func\n");
+        PyErr_Print();  /* this also clears the error */
+        sec_status = SECFailure;
+    } else {
+        sec_status = is_true ? SECSuccess : SECFailure;
+    }
 
  exit:
-    Py_XDECREF(args);
     Py_XDECREF(result);
 
     PyGILState_Release(gstate);
@@ -691,6 +880,15 @@ PIN argument (see ssl.set_pkcs11_pin_arg() for details). To obtain the\n\
 value that was set with ssl.set_pkcs11_pin_arg(), the callback calls\n\
 ssl.get_pkcs11_pin_arg().\n\
 \n\
+The callback may instead return ssl.SECWouldBlock to authenticate the\n\
+certificate asynchronously, e.g. to run the verification on a worker\n\
+thread so the handshake thread is not stalled by OCSP fetches or chain\n\
+building. The handshake then pauses, once the result is known call\n\
+`SSLSocket.auth_certificate_complete()` from any thread and drive the\n\
+handshake again. SECWouldBlock is only supported on the client side of\n\
+a non-blocking socket and the bad-certificate callback is never\n\
+invoked for it.\n\
+\n\
 If the callback returns False, the SSL connection is terminated\n\
 immediately unless the application has supplied a bad-certificate\n\
 callback function by having previously called\n\
@@ -779,6 +977,7 @@ SSLSocket_set_auth_certificate_callback(SSLSocket *self, PyObject *args)
 
     ASSIGN_REF(self->py_auth_certificate_callback, callback);
     ASSIGN_NEW_REF(self->py_auth_certificate_callback_data, callback_args);
+    Py_CLEAR(self->py_auth_certificate_args);
 
     if (SSL_AuthCertificateHook(self->pr_socket, ssl_auth_certificate, self) != SECSuccess) {
         return set_nspr_error(NULL);
@@ -787,6 +986,52 @@ SSLSocket_set_auth_certificate_callback(SSLSocket *self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+PyDoc_STRVAR(SSLSocket_auth_certificate_complete_doc,
+"auth_certificate_complete(error=0)\n\
+\n\
+:Parameters:\n\
+    error : int\n\
+        0 if the peer certificate is valid, otherwise the NSPR/NSS\n\
+        error code describing why it is not\n\
+        (e.g. SEC_ERROR_REVOKED_CERTIFICATE)\n\
+\n\
+Restart a handshake which was paused because the auth certificate\n\
+callback returned ssl.SECWouldBlock. It may be called from any\n\
+thread. It does not complete the handshake itself, afterwards the\n\
+handshake must be driven again (e.g. `SSLSocket.do_handshake_step()`,\n\
+`SSLSocket.force_handshake()`, recv or send). A socket waiting in poll\n\
+for the paused handshake will not become ready on its own, wake the\n\
+poller (e.g. `io.PollSet.wakeup()`) after calling this.\n\
+\n\
+If error is non-zero an alert corresponding to the error is sent to\n\
+the peer and the handshake fails with that error, the socket should\n\
+then be closed.\n\
+");
+
+static PyObject *
+SSLSocket_auth_certificate_complete(SSLSocket *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"error", NULL};
+    int error = 0;
+    SECStatus status;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|i:auth_certificate_complete", kwlist,
+                                     &error))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    status = SSL_AuthCertificateComplete(self->pr_socket, error);
+    Py_END_ALLOW_THREADS
+
+    if (status != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_NONE;
+}
+
 
 static SECStatus
 get_client_auth_data(void *arg, PRFileDesc *fd, CERTDistNames *caNames, CERTCertificate **pRetCert, SECKEYPrivateKey **pRetKey)
@@ -796,39 +1041,31 @@ get_client_auth_data(void *arg, PRFileDesc *fd, CERTDistNames *caNames, CERTCert
     SSLSocket *self = arg;
     PyObject *return_args = NULL;
     PyObject *args = NULL;
-    PyObject *item;
-    Py_ssize_t argc, return_argc;
-    int i, j;
+    Py_ssize_t return_argc;
     PyObject *py_cert_dist_names = NULL;
     PyObject *py_cert = NULL;
     PyObject *py_priv_key = NULL;
 
     gstate = PyGILState_Ensure();
 
-    argc = n_base_args;
-    if (self->py_client_auth_data_callback_data) {
-        argc += PyTuple_Size(self->py_client_auth_data_callback_data);
-    }
-
-    if ((args = PyTuple_New(argc)) == NULL) {
+    if ((py_cert_dist_names = cert_distnames_new_from_CERTDistNames(caNames)) == NULL) {
         PySys_WriteStderr("SSLSocket.client_auth_data_callback: out of memory\n");
-	goto fail;
+        goto fail;
     }
 
-    if ((py_cert_dist_names = cert_distnames_new_from_CERTDistNames(caNames)) == NULL) {
+    if ((args = callback_args_acquire(&self->py_client_auth_data_args, n_base_args,
+                                      self->py_client_auth_data_callback_data)) == NULL) {
         PySys_WriteStderr("SSLSocket.client_auth_data_callback: out of memory\n");
-        goto fail;
+        Py_DECREF(py_cert_dist_names);
+	goto fail;
     }
 
-    PyTuple_SetItem(args, 0, (PyObject *)py_cert_dist_names);
+    callback_args_set(args, 0, py_cert_dist_names);
 
-    for (i = n_base_args, j = 0; i < argc; i++, j++) {
-        item = PyTuple_GetItem(self->py_client_auth_data_callback_data, j);
-        Py_INCREF(item);
-        PyTuple_SetItem(args, i, item);
-    }
+    return_args = PyObject_CallObject(self->py_client_auth_data_callback, args);
+    callback_args_release(&self->py_client_auth_data_args, args, n_base_args);
 
-    if ((return_args = PyObject_CallObject(self->py_client_auth_data_callback, args)) == NULL) {
+    if (return_args == NULL) {
         PySys_WriteStderr("exception in SSLSocket.client_auth_data_callback\n");
         PyErr_Print();
         goto fail;
@@ -880,7 +1117,6 @@ get_client_auth_data(void *arg, PRFileDesc *fd, CERTDistNames *caNames, CERTCert
         goto fail;
     }
 
-    Py_DECREF(args);
     /*
      * NSS WART
      * There is no way to track the lifetime of the two returned objects.
@@ -907,7 +1143,6 @@ get_client_auth_data(void *arg, PRFileDesc *fd, CERTDistNames *caNames, CERTCert
     PyErr_Print();
 
  fail:
-    Py_XDECREF(args);
     Py_XDECREF(return_args);
 
     PyGILState_Release(gstate);
@@ -1007,6 +1242,7 @@ SSLSocket_set_client_auth_data_callback(SSLSocket *self, PyObject *args)
 
     ASSIGN_REF(self->py_client_auth_data_callback, callback);
     ASSIGN_NEW_REF(self->py_client_auth_data_callback_data, callback_args);
+    Py_CLEAR(self->py_client_auth_data_args);
 
     if (SSL_GetClientAuthDataHook(self->pr_socket, get_client_auth_data, self) != SECSuccess) {
         return set_nspr_error(NULL);
@@ -1023,38 +1259,27 @@ ssl_handshake_callback(PRFileDesc *fd, void *arg)
     SSLSocket *py_sslsocket = arg;
     PyObject *result = NULL;
     PyObject *args = NULL;
-    PyObject *item;
-    Py_ssize_t argc;
-    int i, j;
 
     gstate = PyGILState_Ensure();
 
-    argc = n_base_args;
-    if (py_sslsocket->py_handshake_callback_data)
-        argc += PyTuple_Size(py_sslsocket->py_handshake_callback_data);
-
-    if ((args = PyTuple_New(argc)) == NULL) {
+    if ((args = callback_args_acquire(&py_sslsocket->py_handshake_args, n_base_args,
+                                      py_sslsocket->py_handshake_callback_data)) == NULL) {
         PySys_WriteStderr("SSLSocket.handshake_callback: out of memory\n");
 	goto exit;
     }
 
     Py_INCREF(py_sslsocket);
-    PyTuple_SetItem(args, 0, (PyObject *)py_sslsocket);
+    callback_args_set(args, 0, (PyObject *)py_sslsocket);
 
-    for (i = n_base_args, j = 0; i < argc; i++, j++) {
-        item = PyTuple_GetItem(py_sslsocket->py_handshake_callback_data, j);
-        Py_INCREF(item);
-        PyTuple_SetItem(args, i, item);
-    }
+    result = PyObject_CallObject(py_sslsocket->py_handshake_callback, args);
+    callback_args_release(&py_sslsocket->py_handshake_args, args, n_base_args);
 
-    if ((result = PyObject_CallObject(py_sslsocket->py_handshake_callback, args)) == NULL) {
+    if (result == NULL) {
         PySys_WriteStderr("exception in SSLSocket.handshake_callback\n");
         PyErr_Print();  /* this also clears the error */
-        Py_DECREF(args);
 	goto exit;
     }
 
-    Py_DECREF(args);
     Py_DECREF(result);
 
  exit:
@@ -1118,6 +1343,7 @@ SSLSocket_set_handshake_callback(SSLSocket *self, PyObject *args)
 
     ASSIGN_REF(self->py_handshake_callback, callback);
     ASSIGN_NEW_REF(self->py_handshake_callback_data, callback_args);
+    Py_CLEAR(self->py_handshake_args);
 
     if (SSL_HandshakeCallback(self->pr_socket, ssl_handshake_callback, self) != SECSuccess) {
         return set_nspr_error(NULL);
@@ -1126,6 +1352,166 @@ SSLSocket_set_handshake_callback(SSLSocket *self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+static SECStatus
+ssl_resumption_token(PRFileDesc *fd, const PRUint8 *token, unsigned int len, void *arg)
+{
+    PyGILState_STATE gstate;
+    Py_ssize_t n_base_args = 2;
+    Py_ssize_t n_data_args, i;
+    SSLSocket *py_sslsocket = arg;
+    PyObject *py_token = NULL;
+    PyObject *result = NULL;
+    PyObject *args = NULL;
+    PyObject *item;
+
+    gstate = PyGILState_Ensure();
+
+    /* NSS owns token, it must be copied before returning */
+    if ((py_token = PyBytes_FromStringAndSize((const char *)token, len)) == NULL) {
+        goto error;
+    }
+
+    n_data_args = PyTuple_Size(py_sslsocket->py_resumption_token_callback_data);
+    if ((args = PyTuple_New(n_base_args + n_data_args)) == NULL) {
+        goto error;
+    }
+
+    Py_INCREF(py_sslsocket);
+    PyTuple_SET_ITEM(args, 0, (PyObject *)py_sslsocket);
+    PyTuple_SET_ITEM(args, 1, py_token);
+    py_token = NULL;
+
+    for (i = 0; i < n_data_args; i++) {
+        item = PyTuple_GET_ITEM(py_sslsocket->py_resumption_token_callback_data, i);
+        Py_INCREF(item);
+        PyTuple_SET_ITEM(args, n_base_args + i, item);
+    }
+
+    if ((result = PyObject_CallObject(py_sslsocket->py_resumption_token_callback, args)) == NULL) {
+        goto error;
+    }
+
+    Py_DECREF(result);
+    Py_DECREF(args);
+    PyGILState_Release(gstate);
+    return SECSuccess;
+
+ error:
+    PySys_WriteStderr("exception in SSLSocket.resumption_token_callback\n");
+    PyErr_Print();  /* this also clears the error */
+    Py_XDECREF(py_token);
+    Py_XDECREF(args);
+    PyGILState_Release(gstate);
+    return SECSuccess;
+}
+
+PyDoc_STRVAR(SSLSocket_set_resumption_token_callback_doc,
+"set_resumption_token_callback(callback, [user_data1, ...])\n\
+\n\
+:Parameters:\n\
+    callback : function pointer\n\
+        callback to invoke\n\
+    user_dataN:\n\
+        zero or more caller supplied parameters which will be passed to the callback\n\
+\n\
+The callback has the following signature::\n\
+    \n\
+    callback(socket, token, [user_data1, ...])\n\
+\n\
+socket\n\
+    the SSL socket the session was established on\n\
+token\n\
+    the serialized session state as bytes\n\
+user_dataN\n\
+    zero or more caller supplied optional parameters\n\
+\n\
+Export the client's TLS session state. The callback is invoked on the\n\
+client whenever the server provides a session which can be resumed, for\n\
+TLS 1.3 this is on receipt of a NewSessionTicket which may arrive after\n\
+the handshake completed. The token can later be passed to\n\
+`SSLSocket.set_resumption_token()` to resume the session on another\n\
+connection, possibly in another process.\n\
+\n\
+Only sessions backed by a session ticket are exported, the server must\n\
+have SSL_ENABLE_SESSION_TICKETS set (and for TLS 1.2 the client too).\n\
+Once a callback is set the socket does not use the process wide NSS\n\
+client session cache, the application is responsible for caching\n\
+tokens (see `nss.ssl_session_cache`).\n\
+");
+
+static PyObject *
+SSLSocket_set_resumption_token_callback(SSLSocket *self, PyObject *args)
+{
+    Py_ssize_t n_base_args = 1;
+    Py_ssize_t argc;
+    PyObject *callback;
+    PyObject *callback_args = NULL;
+
+    TraceMethodEnter(self);
+
+    argc = PyTuple_Size(args);
+
+    if ((callback = PyTuple_GetItem(args, 0)) == NULL) {
+        PyErr_SetString(PyExc_TypeError, "set_resumption_token_callback: missing callback argument");
+        return NULL;
+    }
+
+    if (!PyCallable_Check(callback)) {
+        PyErr_SetString(PyExc_TypeError, "callback must be callable");
+        return NULL;
+    }
+
+    callback_args = PyTuple_GetSlice(args, n_base_args, argc);
+
+    ASSIGN_REF(self->py_resumption_token_callback, callback);
+    ASSIGN_NEW_REF(self->py_resumption_token_callback_data, callback_args);
+
+    if (SSL_SetResumptionTokenCallback(self->pr_socket, ssl_resumption_token, self) != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(SSLSocket_set_resumption_token_doc,
+"set_resumption_token(token)\n\
+\n\
+:Parameters:\n\
+    token : buffer\n\
+        session state previously handed to a resumption token callback\n\
+\n\
+Import a TLS session so the next handshake on this client socket\n\
+attempts to resume it instead of performing a full handshake. Must be\n\
+called before the handshake, after `SSLSocket.set_hostname()`.\n\
+\n\
+Raises nss.error.NSPRError if the token cannot be used, e.g. it has\n\
+expired or is malformed, the token should then be discarded. Whether\n\
+the session was actually resumed is reported by\n\
+`SSLChannelInformation.resumed` after the handshake.\n\
+");
+
+static PyObject *
+SSLSocket_set_resumption_token(SSLSocket *self, PyObject *args)
+{
+    Py_buffer token;
+    SECStatus status;
+
+    TraceMethodEnter(self);
+
+    if (!PyArg_ParseTuple(args, "y*:set_resumption_token", &token)) {
+        return NULL;
+    }
+
+    status = SSL_SetResumptionToken(self->pr_socket, token.buf, token.len);
+    PyBuffer_Release(&token);
+
+    if (status != SECSuccess) {
+        return set_nspr_error(NULL);
+    }
+
+    Py_RETURN_NONE;
+}
+
 
 PyDoc_STRVAR(SSLSocket_set_pkcs11_pin_arg_doc,
 "set_pkcs11_pin_arg([user_dataN, ...])\n\
@@ -1751,6 +2137,85 @@ SSLSocket_force_handshake(SSLSocket *self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+PyDoc_STRVAR(SSLSocket_do_handshake_step_doc,
+"do_handshake_step() -> state\n\
+\n\
+Advance the SSL handshake as far as possible without blocking and\n\
+return one of:\n\
+\n\
+    - SSL_HANDSHAKE_DONE\n\
+        the handshake is complete (the value is 0)\n\
+    - SSL_HANDSHAKE_WANT_READ\n\
+        call again once the socket is readable\n\
+    - SSL_HANDSHAKE_WANT_WRITE\n\
+        call again once the socket is writable\n\
+\n\
+The socket should be in non-blocking mode (PR_SockOpt_Nonblocking), on\n\
+a blocking socket this behaves like `SSLSocket.force_handshake()`.\n\
+SSL_HANDSHAKE_WANT_READ and SSL_HANDSHAKE_WANT_WRITE are equal to\n\
+PR_POLL_READ and PR_POLL_WRITE so the state can be used directly as\n\
+the flags of `io.Socket.poll()` or `io.PollSet.register()`, which\n\
+allows many handshakes to be driven from one thread::\n\
+\n\
+    state = sock.do_handshake_step()\n\
+    while state != ssl.SSL_HANDSHAKE_DONE:\n\
+        io.Socket.poll([(sock, state)], timeout)\n\
+        state = sock.do_handshake_step()\n\
+\n\
+Any error other than PR_WOULD_BLOCK_ERROR raises a\n\
+nss.error.NSPRError.\n\
+");
+
+static PyObject *
+SSLSocket_do_handshake_step(SSLSocket *self, PyObject *args)
+{
+    SECStatus status;
+    PRErrorCode error = 0;
+    SSLChannelInfo info;
+    PRInt16 poll_flags;
+    PRInt16 out_flags = 0;
+
+    TraceMethodEnter(self);
+
+    Py_BEGIN_ALLOW_THREADS
+    if ((status = SSL_ForceHandshake(self->pr_socket)) != SECSuccess) {
+        error = PR_GetError();
+    }
+    Py_END_ALLOW_THREADS
+
+    if (status == SECSuccess) {
+        return PyLong_FromLong(SSL_HANDSHAKE_DONE);
+    }
+
+    if (error != PR_WOULD_BLOCK_ERROR) {
+        PR_SetError(error, 0);
+        return set_nspr_error(NULL);
+    }
+
+    /*
+     * Once the first handshake is done SSL_ForceHandshake goes on to
+     * read post-handshake records, which can block. This is also how
+     * a handshake which was completed by auth_certificate_complete()
+     * reports itself. The channel info is only filled in after the
+     * handshake.
+     */
+    if (SSL_GetChannelInfo(self->pr_socket, &info, sizeof(info)) == SECSuccess &&
+        info.cipherSuite != 0) {
+        return PyLong_FromLong(SSL_HANDSHAKE_DONE);
+    }
+
+    /*
+     * The SSL layer's poll method knows which direction the handshake
+     * is blocked on, e.g. a ClientHello or a flight which could not
+     * be completely written needs the socket to become writable.
+     */
+    poll_flags = self->pr_socket->methods->poll(self->pr_socket, PR_POLL_READ, &out_flags);
+    if (!out_flags && (poll_flags & PR_POLL_WRITE)) {
+        return PyLong_FromLong(SSL_HANDSHAKE_WANT_WRITE);
+    }
+    return PyLong_FromLong(SSL_HANDSHAKE_WANT_READ);
+}
+
 PyDoc_STRVAR(SSLSocket_force_handshake_timeout_doc,
 "force_handshake_timeout(timeout)\n\
 \n\
@@ -1869,33 +2334,43 @@ SSLSocket_rehandshake_timeout(SSLSocket *self, PyObject *args)
 }
 
 PyDoc_STRVAR(SSLSocket_import_tcp_socket_doc,
-"import_tcp_socket(osfd) -> Socket\n\
+"import_tcp_socket(osfd, model=None) -> Socket\n\
 :Parameters:\n\
     osfd : integer\n\
         file descriptor of the SOCK_STREAM socket to import\n\
+    model : SSLSocket\n\
+        optional SSLSocket whose SSL configuration is copied, see the\n\
+        model parameter of `SSLSocket`\n\
 \n\
 Returns a Socket object that uses the specified socket file descriptor for\n\
 communication.\n\
 ");
 
 static PyObject *
-SSLSocket_import_tcp_socket(Socket *self, PyObject *args)
+SSLSocket_import_tcp_socket(Socket *self, PyObject *args, PyObject *kwds)
 {
+    static char *kwlist[] = {"osfd", "model", NULL};
     int osfd;
+    SSLSocket *py_model = NULL;
     PRFileDesc *sock0, *sock;
     PRNetAddr addr;
     PyObject *return_value = NULL;
 
     TraceMethodEnter(self);
 
-    if (!PyArg_ParseTuple(args, "i:import_tcp_socket", &osfd))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "i|O:import_tcp_socket", kwlist,
+                                     &osfd, &py_model))
 	return NULL;
 
+    if (SSLSocket_check_model((PyObject **)&py_model) < 0) {
+        return NULL;
+    }
+
     sock0 = PR_ImportTCPSocket(osfd);
     if (sock0 == NULL) {
 	return set_nspr_error(NULL);
     }
-    sock = SSL_ImportFD(NULL, sock0);
+    sock = SSL_ImportFD(py_model ? py_model->pr_socket : NULL, sock0);
     if (sock == NULL) {
 	set_nspr_error(NULL);
 	PR_Close(sock0);
@@ -1916,6 +2391,13 @@ SSLSocket_import_tcp_socket(Socket *self, PyObject *args)
 	goto error;
     }
 
+    if (py_model &&
+        SSLSocket_inherit_callbacks((SSLSocket *)return_value, py_model) != SECSuccess) {
+        set_nspr_error(NULL);
+        Py_DECREF(return_value);
+        return NULL;
+    }
+
     return return_value;
 
  error:
@@ -2189,6 +2671,9 @@ static PyMethodDef SSLSocket_methods[] = {
     {"get_ssl_option",                (PyCFunction)SSLSocket_get_ssl_option,                METH_VARARGS,               SSLSocket_get_ssl_option_doc},
     {"accept",                        (PyCFunction)SSLSocket_accept,                        METH_VARARGS|METH_KEYWORDS, SSLSocket_accept_doc},
     {"set_auth_certificate_callback", (PyCFunction)SSLSocket_set_auth_certificate_callback, METH_VARARGS,               SSLSocket_set_auth_certificate_callback_doc},
+    {"set_resumption_token_callback", (PyCFunction)SSLSocket_set_resumption_token_callback, METH_VARARGS,               SSLSocket_set_resumption_token_callback_doc},
+    {"set_resumption_token",          (PyCFunction)SSLSocket_set_resumption_token,          METH_VARARGS,               SSLSocket_set_resumption_token_doc},
+    {"auth_certificate_complete",     (PyCFunction)SSLSocket_auth_certificate_complete,     METH_VARARGS|METH_KEYWORDS, SSLSocket_auth_certificate_complete_doc},
     {"set_client_auth_data_callback", (PyCFunction)SSLSocket_set_client_auth_data_callback, METH_VARARGS,               SSLSocket_set_client_auth_data_callback_doc},
     {"set_handshake_callback",        (PyCFunction)SSLSocket_set_handshake_callback,        METH_VARARGS,               SSLSocket_set_handshake_callback_doc},
     {"set_pkcs11_pin_arg",            (PyCFunction)SSLSocket_set_pkcs11_pin_arg,            METH_VARARGS,               SSLSocket_set_pkcs11_pin_arg_doc},
@@ -2209,9 +2694,10 @@ static PyMethodDef SSLSocket_methods[] = {
     {"reset_handshake",               (PyCFunction)SSLSocket_reset_handshake,               METH_VARARGS,               SSLSocket_reset_handshake_doc},
     {"force_handshake",               (PyCFunction)SSLSocket_force_handshake,               METH_NOARGS,                SSLSocket_force_handshake_doc},
     {"force_handshake_timeout",       (PyCFunction)SSLSocket_force_handshake_timeout,       METH_VARARGS,               SSLSocket_force_handshake_timeout_doc},
+    {"do_handshake_step",             (PyCFunction)SSLSocket_do_handshake_step,             METH_NOARGS,                SSLSocket_do_handshake_step_doc},
     {"rehandshake",                   (PyCFunction)SSLSocket_rehandshake,                   METH_VARARGS,               SSLSocket_rehandshake_doc},
     {"rehandshake_timeout",           (PyCFunction)SSLSocket_rehandshake_timeout,           METH_VARARGS,               SSLSocket_rehandshake_timeout_doc},
-    {"import_tcp_socket",             (PyCFunction)SSLSocket_import_tcp_socket,             METH_VARARGS|METH_STATIC,   SSLSocket_import_tcp_socket_doc},
+    {"import_tcp_socket",             (PyCFunction)SSLSocket_import_tcp_socket,             METH_VARARGS|METH_KEYWORDS|METH_STATIC, SSLSocket_import_tcp_socket_doc},
     {"set_ssl_version_range",         (PyCFunction)SSLSocket_set_ssl_version_range,         METH_VARARGS,               SSLSocket_set_ssl_version_range_doc},
     {"get_ssl_version_range",         (PyCFunction)SSLSocket_get_ssl_version_range,         METH_VARARGS|METH_KEYWORDS, SSLSocket_get_ssl_version_range_doc},
     {"get_ssl_channel_info",          (PyCFunction)SSLSocket_get_ssl_channel_info,          METH_NOARGS,                SSLSocket_get_ssl_channel_info_doc},
@@ -2244,6 +2730,11 @@ SSLSocket_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     self->py_handshake_callback_data = NULL;
     self->py_client_auth_data_callback = NULL;
     self->py_client_auth_data_callback_data = NULL;
+    self->py_resumption_token_callback = NULL;
+    self->py_resumption_token_callback_data = NULL;
+    self->py_auth_certificate_args = NULL;
+    self->py_handshake_args = NULL;
+    self->py_client_auth_data_args = NULL;
 
     TraceObjNewLeave(self);
     return (PyObject *)self;
@@ -2261,6 +2752,11 @@ SSLSocket_traverse(SSLSocket *self, visitproc visit, void *arg)
     Py_VISIT(self->py_handshake_callback_data);
     Py_VISIT(self->py_client_auth_data_callback);
     Py_VISIT(self->py_client_auth_data_callback_data);
+    Py_VISIT(self->py_resumption_token_callback);
+    Py_VISIT(self->py_resumption_token_callback_data);
+    Py_VISIT(self->py_auth_certificate_args);
+    Py_VISIT(self->py_handshake_args);
+    Py_VISIT(self->py_client_auth_data_args);
 
     return Py_TYPE(self)->tp_base->tp_traverse((PyObject *)self, visit, arg);
 }
@@ -2277,6 +2773,11 @@ SSLSocket_clear(SSLSocket* self)
     Py_CLEAR(self->py_handshake_callback_data);
     Py_CLEAR(self->py_client_auth_data_callback);
     Py_CLEAR(self->py_client_auth_data_callback_data);
+    Py_CLEAR(self->py_resumption_token_callback);
+    Py_CLEAR(self->py_resumption_token_callback_data);
+    Py_CLEAR(self->py_auth_certificate_args);
+    Py_CLEAR(self->py_handshake_args);
+    Py_CLEAR(self->py_client_auth_data_args);
 
     return Py_TYPE(self)->tp_base->tp_clear((PyObject *)self);
 
@@ -2293,7 +2794,7 @@ SSLSocket_dealloc(SSLSocket* self)
 }
 
 PyDoc_STRVAR(SSLSocket_doc,
-"SSLSocket(family=PR_AF_INET, type=PR_DESC_SOCKET_TCP)\n\
+"SSLSocket(family=PR_AF_INET, type=PR_DESC_SOCKET_TCP, model=None)\n\
 \n\
 \n\
 :Parameters:\n\
@@ -2306,29 +2807,107 @@ PyDoc_STRVAR(SSLSocket_doc,
         one of:\n\
             - PR_DESC_SOCKET_TCP\n\
             - PR_DESC_SOCKET_UDP\n\
+    model : SSLSocket\n\
+        optional, keyword only, a configured SSLSocket used as a template\n\
 \n\
 Create a new NSPR SSL socket:\n\
 \n\
+If model is given the new socket starts out with the model's SSL\n\
+configuration: SSL options, cipher preferences, version range,\n\
+server certificate and key, hostname, PKCS11 pin arg and callbacks.\n\
+NSS copies the configuration in a single call (SSL_ImportFD) which is\n\
+much cheaper than configuring every socket option by option. The model\n\
+works like a SSLContext, configure it once and never connect it::\n\
+\n\
+    model = ssl.SSLSocket(net_addr.family)\n\
+    model.set_ssl_option(ssl.SSL_SECURITY, True)\n\
+    model.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)\n\
+    model.set_ssl_version_range('tls1.2', 'tls1.3')\n\
+    model.set_auth_certificate_callback(auth_certificate_callback, certdb)\n\
+\n\
+    sock = ssl.SSLSocket(net_addr.family, model=model)\n\
+    sock.connect(net_addr)\n\
+\n\
+Callbacks are invoked with the new socket as their socket argument.\n\
+Changes made to the model afterwards do not affect sockets already\n\
+created from it.\n\
 ");
 
+/*
+ * Validate a model argument, None is the same as no model. Returns 0
+ * on success with *py_model set to the model or NULL, -1 with an
+ * exception set otherwise.
+ */
+static int
+SSLSocket_check_model(PyObject **py_model)
+{
+    if (*py_model == NULL || *py_model == Py_None) {
+        *py_model = NULL;
+        return 0;
+    }
+
+    if (!PySSLSocket_Check(*py_model)) {
+        PyErr_Format(PyExc_TypeError, "model must be SSLSocket or None, not %.50s",
+                     Py_TYPE(*py_model)->tp_name);
+        return -1;
+    }
+
+    if (((SSLSocket *)*py_model)->pr_socket == NULL) {
+        PyErr_SetString(PyExc_ValueError, "model socket is closed");
+        return -1;
+    }
+
+    return 0;
+}
+
 static int
 SSLSocket_init(SSLSocket *self, PyObject *args, PyObject *kwds)
 {
+    PyObject *py_model = NULL;
+    PyObject *socket_kwds = NULL;
     PRFileDesc *ssl_socket = NULL;
+    int result = -1;
 
     TraceMethodEnter(self);
 
+    /* model is ours, pass the remaining arguments on to Socket */
+    if (kwds && (py_model = PyDict_GetItemString(kwds, "model")) != NULL) {
+        if ((socket_kwds = PyDict_Copy(kwds)) == NULL) {
+            return -1;
+        }
+        if (PyDict_DelItemString(socket_kwds, "model") < 0) {
+            goto exit;
+        }
+        kwds = socket_kwds;
+    }
+
+    if (SSLSocket_check_model(&py_model) < 0) {
+        goto exit;
+    }
+
     if (SocketType.tp_init((PyObject *)self, args, kwds) < 0)
-        return -1;
+        goto exit;
 
-    if ((ssl_socket = SSL_ImportFD(NULL, self->pr_socket)) == NULL) {
+    if ((ssl_socket = SSL_ImportFD(py_model ? ((SSLSocket *)py_model)->pr_socket : NULL,
+                                   self->pr_socket)) == NULL) {
         set_nspr_error(NULL);
-        return -1;
+        goto exit;
     }
 
     assert(self->pr_socket == ssl_socket);
+
+    if (py_model &&
+        SSLSocket_inherit_callbacks(self, (SSLSocket *)py_model) != SECSuccess) {
+        set_nspr_error(NULL);
+        goto exit;
+    }
+
+    result = 0;
+
+ exit:
+    Py_XDECREF(socket_kwds);
     TraceMethodLeave(self);
-    return 0;
+    return result;
 }
 
 static PyTypeObject SSLSocketType = {
@@ -2932,6 +3511,14 @@ SSLChannelInformation_get_session_id(SSLChannelInformation *self, void *closure)
     return SecItem_new_from_SECItem(&item, SECITEM_buffer);
 }
 
+static PyObject *
+SSLChannelInformation_get_resumed(SSLChannelInformation *self, void *closure)
+{
+    TraceMethodEnter(self);
+
+    return PyBool_FromLong(self->info.resumed);
+}
+
 static
 PyGetSetDef SSLChannelInformation_getseters[] = {
     {"protocol_version",        (getter)SSLChannelInformation_get_protocol_version,        NULL, "Returns the protocol version, major in octet[1], minor in octet[0] ", NULL},
@@ -2951,6 +3538,7 @@ PyGetSetDef SSLChannelInformation_getseters[] = {
     {"compression_method",      (getter)SSLChannelInformation_get_compression_method,      NULL, "Returns the compression method enum", NULL},
     {"compression_method_name", (getter)SSLChannelInformation_get_compression_method_name, NULL, "Returns the compression method name", NULL},
     {"session_id",              (getter)SSLChannelInformation_get_session_id,              NULL, "Returns the session ID as a SecItem object", NULL},
+    {"resumed",                 (getter)SSLChannelInformation_get_resumed,                 NULL, "Returns True if the session was resumed rather than established by a full handshake", NULL},
     {NULL}  /* Sentinel */
 };
 
@@ -3051,6 +3639,9 @@ SSLChannelInformation_format_lines(SSLChannelInformation *self, PyObject *args,
     FMT_OBJ_AND_APPEND(lines, _("Compression Method"), obj1, level, fail);
     Py_CLEAR(obj1);
 
+    obj1 = PyBool_FromLong(self->info.resumed);
+    FMT_OBJ_AND_APPEND(lines, _("Resumed"), obj1, level, fail);
+    Py_CLEAR(obj1);
 
     if ((obj1 = raw_data_to_hex(self->info.sessionID,
                                 self->info.sessionIDLength,
@@ -4464,6 +5055,11 @@ if (_AddIntConstantWithLookup(m, alias, constant, \
     AddIntConstantName(SSL_VARIANT_STREAM, ssl_variant_stream);
     AddIntConstantName(SSL_VARIANT_DATAGRAM, ssl_variant_datagram);
 
+    AddIntConstant(SSL_HANDSHAKE_DONE);
+    AddIntConstant(SSL_HANDSHAKE_WANT_READ);
+    AddIntConstant(SSL_HANDSHAKE_WANT_WRITE);
+    AddIntConstant(SECWouldBlock);
+
 
     /* NSS SSL Constants */
     AddIntConstant(SSL_SECURITY);
@@ -4474,6 +5070,7 @@ if (_AddIntConstantWithLookup(m, alias, constant, \
     AddIntConstant(SSL_ENABLE_SSL2);
     AddIntConstant(SSL_ENABLE_SSL3);
     AddIntConstant(SSL_NO_CACHE);
+    AddIntConstant(SSL_ENABLE_SESSION_TICKETS);
     AddIntConstant(SSL_REQUIRE_CERTIFICATE);
     AddIntConstant(SSL_ENABLE_FDX);
     AddIntConstant(SSL_V2_COMPATIBLE_HELLO);
@@ -24,10 +24,21 @@ typedef struct {
     PyObject *py_handshake_callback_data;
     PyObject *py_client_auth_data_callback;
     PyObject *py_client_auth_data_callback_data;
+    PyObject *py_resumption_token_callback;
+    PyObject *py_resumption_token_callback_data;
+    /* Argument tuples reused across callback invocations */
+    PyObject *py_auth_certificate_args;
+    PyObject *py_handshake_args;
+    PyObject *py_client_auth_data_args;
 } SSLSocket;
 
 #define PySSLSocket_Check(op) PyObject_TypeCheck(op, &SSLSocketType)
 
+/* SSLSocket.do_handshake_step() results, usable as PR_Poll in_flags */
+#define SSL_HANDSHAKE_DONE       0
+#define SSL_HANDSHAKE_WANT_READ  PR_POLL_READ
+#define SSL_HANDSHAKE_WANT_WRITE PR_POLL_WRITE
+
 /* ========================================================================== */
 /* ====================== SSLCipherSuiteInformation Class =================== */
 /* ========================================================================== */
@@ -0,0 +1,248 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+Multi-threaded TLS server built on `nss.ssl.SSLSocket`.
+
+`TLSServer` runs an acceptor thread and a pool of worker threads. The
+acceptor accepts connections on a configured, listening SSLSocket and
+queues them, a worker performs the handshake (bounded by
+handshake_timeout) and then calls the application's handler with the
+connection::
+
+    def handler(sock, addr):
+        line = sock.readline()
+        sock.send(line)
+
+    ssl.config_server_session_id_cache()
+    listen_sock = ssl_server.listen_socket(net_addr, server_cert, priv_key)
+    with ssl_server.TLSServer(listen_sock, handler, workers=16):
+        ...
+
+The listening socket is the shared server context. NSS copies the SSL
+configuration of the listening socket (certificate, key, options,
+cipher preferences, version range and callbacks) to every socket it
+accepts, so connections are not configured one by one. Configure the
+socket returned by `listen_socket()` before starting the server.
+
+The server session id cache is process wide, the application must
+call `nss.ssl.config_server_session_id_cache()` once before serving.
+
+At most max_connections connections are queued or being served at any
+time. When the limit is reached the acceptor stops accepting and
+further connections wait in the kernel's listen backlog.
+"""
+from __future__ import absolute_import, print_function
+
+import queue
+import sys
+import threading
+import time
+import traceback
+
+from nss import error, io, ssl
+
+__all__ = [
+    'TLSServer',
+    'listen_socket',
+]
+
+
+def listen_socket(net_addr, server_cert, priv_key, backlog=128, pin_arg=None):
+    """
+    Create an `nss.ssl.SSLSocket` configured as a TLS server with
+    server_cert and priv_key, bound to the `nss.io.NetworkAddress`
+    net_addr and listening. pin_arg is passed to
+    `SSLSocket.set_pkcs11_pin_arg()` if given.
+    """
+    sock = ssl.SSLSocket(net_addr.family)
+    if pin_arg is not None:
+        sock.set_pkcs11_pin_arg(pin_arg)
+    sock.set_ssl_option(ssl.SSL_SECURITY, True)
+    sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_SERVER, True)
+    sock.config_secure_server(
+        server_cert, priv_key, server_cert.find_kea_type()
+    )
+    sock.set_socket_option(io.PR_SockOpt_Reuseaddr, True)
+    sock.bind(net_addr)
+    sock.listen(backlog)
+    return sock
+
+
+class TLSServer(object):
+    """
+    Serve connections accepted on listen_sock, a configured, bound and
+    listening `nss.ssl.SSLSocket` (see `listen_socket()`).
+
+    handler(sock, addr) is called on a worker thread for each
+    connection once its handshake completed, the socket is closed when
+    the handler returns.
+
+    workers
+        number of worker threads
+    max_connections
+        the maximum number of connections queued or being served
+    handshake_timeout
+        seconds a client has to complete the handshake
+
+    Errors accepting connections are reported to `handle_error()`,
+    the acceptor then waits accept_error_delay seconds and goes on.
+
+    The counters n_accepted, n_handshakes and n_handshake_errors are
+    updated as connections are served.
+    """
+
+    accept_error_delay = 0.1
+
+    def __init__(
+        self,
+        listen_sock,
+        handler,
+        workers=8,
+        max_connections=256,
+        handshake_timeout=10,
+    ):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        if max_connections < 1:
+            raise ValueError('max_connections must be at least 1')
+
+        self.listen_sock = listen_sock
+        self.handler = handler
+        self.workers = workers
+        self.max_connections = max_connections
+        self.handshake_timeout = handshake_timeout
+
+        self.n_accepted = 0
+        self.n_handshakes = 0
+        self.n_handshake_errors = 0
+
+        self._handshake_interval = io.milliseconds_to_interval(
+            int(handshake_timeout * 1000)
+        )
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_connections)
+        self._queue = queue.Queue()
+        self._poll_set = io.PollSet()
+        self._poll_set.register(listen_sock, io.PR_POLL_READ)
+        self._stopping = False
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """
+        Start the acceptor and worker threads.
+        """
+        if self._threads:
+            raise RuntimeError('server already started')
+        self._threads.append(
+            threading.Thread(target=self._accept_loop, name='tls-acceptor')
+        )
+        for i in range(self.workers):
+            self._threads.append(
+                threading.Thread(
+                    target=self._work_loop, name='tls-worker-%d' % i
+                )
+            )
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """
+        Stop accepting, serve the connections already accepted, wait
+        for the threads to exit and close the listening socket.
+        """
+        if not self._threads or self._stopping:
+            return
+        self._stopping = True
+        # Unblock the acceptor whether it waits for a slot or in poll.
+        self._slots.release()
+        self._poll_set.wakeup()
+        acceptor = self._threads[0]
+        acceptor.join()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in self._threads[1:]:
+            thread.join()
+        self._poll_set.unregister(self.listen_sock)
+        self.listen_sock.close()
+
+    def handle_error(self, sock, addr):
+        """
+        Called when the handler raises, or with the listening socket
+        and an addr of None when accepting a connection fails. By
+        default prints the traceback to stderr. May be overridden.
+        """
+        if addr is None:
+            print('Exception accepting connection:', file=sys.stderr)
+        else:
+            print('Exception serving %s:' % addr, file=sys.stderr)
+        traceback.print_exc()
+
+    def _accept_loop(self):
+        while True:
+            self._slots.acquire()
+            conn = None
+            while conn is None:
+                if self._stopping:
+                    return
+                if self._poll_set.poll():
+                    conn = self._accept()
+            with self._lock:
+                self.n_accepted += 1
+            self._queue.put(conn)
+
+    def _accept(self):
+        """
+        Accept a pending connection, returns (sock, addr) or None if
+        there was none or accepting failed. A failure is reported to
+        handle_error() and the acceptor keeps its slot for the next
+        connection.
+        """
+        try:
+            return self.listen_sock.accept(io.PR_INTERVAL_NO_WAIT)
+        except error.NSPRError as e:
+            if e.errno in (
+                error.PR_IO_TIMEOUT_ERROR,
+                error.PR_WOULD_BLOCK_ERROR,
+            ):
+                return None
+            self.handle_error(self.listen_sock, None)
+        # Back off, the condition (e.g. out of file descriptors) is
+        # likely to persist for a while.
+        time.sleep(self.accept_error_delay)
+        return None
+
+    def _work_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            sock, addr = item
+            try:
+                self._serve(sock, addr)
+            finally:
+                sock.close()
+                self._slots.release()
+
+    def _serve(self, sock, addr):
+        try:
+            sock.force_handshake_timeout(self._handshake_interval)
+        except error.NSPRError:
+            with self._lock:
+                self.n_handshake_errors += 1
+            return
+        with self._lock:
+            self.n_handshakes += 1
+
+        try:
+            self.handler(sock, addr)
+        except Exception:
+            self.handle_error(sock, addr)
@@ -0,0 +1,183 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+Client side TLS session cache.
+
+NSS keeps resumable client sessions in a process wide cache which can
+only be influenced through `SSLSocket.set_sock_peer_id()` and cleared
+as a whole with `ssl.clear_session_cache()`. `ClientSessionCache`
+replaces it for the sockets it is installed on: sessions are exported
+as resumption tokens (`SSLSocket.set_resumption_token_callback()`),
+kept in a bounded LRU cache keyed by peer id and imported into new
+connections to the same peer (`SSLSocket.set_resumption_token()`)::
+
+    cache = ssl_session_cache.ClientSessionCache(max_entries=1024)
+
+    sock = ssl.SSLSocket(net_addr.family)
+    ...
+    sock.set_hostname(hostname)
+    cache.install(sock, '%s:%d' % (hostname, net_addr.port))
+    sock.connect(net_addr)
+
+NSS only exports sessions backed by a session ticket, the server must
+issue tickets (SSL_ENABLE_SESSION_TICKETS). Sockets must not have
+SSL_NO_CACHE set. The cache counts full and resumed handshakes (from
+`SSLChannelInformation.resumed`) so the hit rate can be monitored, see
+`ClientSessionCache.stats()`.
+
+Tokens are plain bytes, `ClientSessionCache.export()` and
+`ClientSessionCache.load()` allow them to be persisted or shared.
+"""
+from __future__ import absolute_import
+
+import collections
+import threading
+
+from nss import error, ssl
+
+__all__ = [
+    'ClientSessionCache',
+]
+
+
+class ClientSessionCache(object):
+    """
+    A thread safe LRU cache of TLS client resumption tokens holding at
+    most max_entries peers.
+    """
+
+    def __init__(self, max_entries=1024):
+        if max_entries < 1:
+            raise ValueError('max_entries must be at least 1')
+        self.max_entries = max_entries
+        self._tokens = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.full_handshakes = 0
+        self.resumed_handshakes = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, peer_id):
+        return peer_id in self._tokens
+
+    def get(self, peer_id):
+        """
+        Return the token cached for peer_id or None, marking the entry
+        most recently used.
+        """
+        with self._lock:
+            token = self._tokens.get(peer_id)
+            if token is not None:
+                self._tokens.move_to_end(peer_id)
+            return token
+
+    def put(self, peer_id, token):
+        """
+        Cache token for peer_id, evicting the least recently used peer
+        if the cache is full.
+        """
+        with self._lock:
+            self._tokens[peer_id] = token
+            self._tokens.move_to_end(peer_id)
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, peer_id):
+        """
+        Remove the token cached for peer_id, if any.
+        """
+        with self._lock:
+            self._tokens.pop(peer_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def export(self):
+        """
+        Return the cached (peer_id, token) pairs, least recently used
+        first.
+        """
+        with self._lock:
+            return list(self._tokens.items())
+
+    def load(self, entries):
+        """
+        Cache the (peer_id, token) pairs of entries, e.g. as returned
+        by `export()`.
+        """
+        for peer_id, token in entries:
+            self.put(peer_id, token)
+
+    def stats(self):
+        """
+        Return a dict of the cache counters and the fraction of
+        handshakes which were resumed.
+        """
+        n_handshakes = self.full_handshakes + self.resumed_handshakes
+        return {
+            'entries': len(self._tokens),
+            'full_handshakes': self.full_handshakes,
+            'resumed_handshakes': self.resumed_handshakes,
+            'resumption_rate': (
+                self.resumed_handshakes / float(n_handshakes)
+                if n_handshakes
+                else 0.0
+            ),
+            'hits': self.hits,
+            'misses': self.misses,
+            'rejected': self.rejected,
+            'evictions': self.evictions,
+        }
+
+    def install(self, sock, peer_id, handshake_callback=None):
+        """
+        Use the cache for the client `nss.ssl.SSLSocket` sock which
+        will connect to peer_id. Offers the cached session, if any,
+        and caches the session the server provides.
+
+        This enables SSL_ENABLE_SESSION_TICKETS and sets the socket's
+        resumption token callback and handshake callback, a
+        handshake_callback(sock) of the application is called from the
+        latter. Call before the handshake and after
+        `SSLSocket.set_hostname()`.
+        """
+        sock.set_ssl_option(ssl.SSL_ENABLE_SESSION_TICKETS, True)
+        sock.set_resumption_token_callback(self._token_received, peer_id)
+        sock.set_handshake_callback(self._handshake_done, handshake_callback)
+
+        token = self.get(peer_id)
+        if token is None:
+            with self._lock:
+                self.misses += 1
+            return
+        try:
+            sock.set_resumption_token(token)
+        except error.NSPRError:
+            # Expired or unusable, NSS will not accept it again.
+            self.discard(peer_id)
+            with self._lock:
+                self.rejected += 1
+            return
+        with self._lock:
+            self.hits += 1
+
+    def _token_received(self, sock, token, peer_id):
+        self.put(peer_id, token)
+
+    def _handshake_done(self, sock, handshake_callback):
+        resumed = sock.get_ssl_channel_info().resumed
+        with self._lock:
+            if resumed:
+                self.resumed_handshakes += 1
+            else:
+                self.full_handshakes += 1
+        if handshake_callback is not None:
+            handshake_callback(sock)
@@ -14,13 +14,17 @@ from utils import get_build_dir
 def run_tests():
     """Run tests."""
     import setup_certs
+    import test_aio
     import test_cert_components
     import test_cert_request
+    import test_certificate
     import test_cipher
     import test_digest
     import test_misc
     import test_ocsp
     import test_pkcs12
+    import test_sign
+    import test_socket
 
     # import test_client_server
 
@@ -36,6 +40,10 @@ def run_tests():
     suite.addTests(loader.loadTestsFromModule(test_misc))
     suite.addTests(loader.loadTestsFromModule(test_ocsp))
     suite.addTests(loader.loadTestsFromModule(test_cert_request))
+    suite.addTests(loader.loadTestsFromModule(test_certificate))
+    suite.addTests(loader.loadTestsFromModule(test_sign))
+    suite.addTests(loader.loadTestsFromModule(test_socket))
+    suite.addTests(loader.loadTestsFromModule(test_aio))
     # XXX: causing segfault on exit with ubuntu
     # suite.addTests(loader.loadTestsFromModule(test_client_server))
 
@@ -0,0 +1,146 @@
+from __future__ import absolute_import, print_function
+
+import asyncio
+import unittest
+
+from nss import aio, io
+
+verbose = False
+payload_size = 1024 * 1024
+
+
+def listen_socket():
+    addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+    sock = io.Socket(addr.family)
+    sock.bind(addr)
+    sock.listen()
+    return sock
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class EchoProtocol(asyncio.Protocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+    def eof_received(self):
+        self.transport.close()
+
+
+class CollectProtocol(asyncio.Protocol):
+    def __init__(self, expected):
+        self.expected = expected
+        self.data = bytearray()
+        self.done = asyncio.get_event_loop().create_future()
+        self.closed = asyncio.get_event_loop().create_future()
+
+    def data_received(self, data):
+        self.data += data
+        if len(self.data) >= self.expected:
+            self.done.set_result(bytes(self.data))
+
+    def connection_lost(self, exc):
+        self.closed.set_result(exc)
+
+
+class TestAsyncSocket(unittest.TestCase):
+    async def echo(self):
+        listener = aio.AsyncSocket(listen_socket())
+        addr = listener.sock.get_sock_name()
+
+        async def serve():
+            sock, peer_addr = await listener.accept()
+            while True:
+                data = await sock.recv(65536)
+                if not data:
+                    break
+                await sock.sendall(data)
+            sock.close()
+
+        server = asyncio.ensure_future(serve())
+
+        client = aio.AsyncSocket(io.Socket(addr.family))
+        await client.connect(addr)
+
+        # Send and receive concurrently, neither side may block the loop.
+        payload = bytearray(b'0123456789abcdef' * (payload_size // 16))
+        sender = asyncio.ensure_future(client.sendall(memoryview(payload)))
+        received = bytearray()
+        buf = bytearray(65536)
+        while len(received) < len(payload):
+            n = await client.recv_into(buf)
+            self.assertNotEqual(n, 0)
+            received += buf[:n]
+        await sender
+
+        client.shutdown(io.PR_SHUTDOWN_SEND)
+        await server
+        self.assertEqual(await client.recv(1), b'')
+        client.close()
+        listener.close()
+        return received == payload
+
+    def test_echo(self):
+        self.assertTrue(run(self.echo()))
+
+
+class TestTransport(unittest.TestCase):
+    async def echo(self):
+        listener = listen_socket()
+        addr = listener.get_sock_name()
+        server = await aio.start_server(EchoProtocol, listener)
+
+        messages = [b'hello ', b'world', b'!' * 100000]
+        expected = b''.join(messages)
+        transport, protocol = await aio.create_connection(
+            lambda: CollectProtocol(len(expected)),
+            io.Socket(addr.family),
+            addr,
+        )
+        for message in messages:
+            transport.write(message)
+        received = await asyncio.wait_for(protocol.done, 10)
+
+        self.assertEqual(transport.get_extra_info('peername'), addr)
+        transport.close()
+        await asyncio.wait_for(protocol.closed, 10)
+        server.close()
+        # Waits for the server side of the connection as well.
+        await asyncio.wait_for(server.wait_closed(), 10)
+        self.assertFalse(server.is_serving())
+        return received == expected
+
+    async def close_connections(self):
+        listener = listen_socket()
+        addr = listener.get_sock_name()
+        server = await aio.start_server(EchoProtocol, listener)
+
+        transport, protocol = await aio.create_connection(
+            lambda: CollectProtocol(5), io.Socket(addr.family), addr
+        )
+        transport.write(b'hello')
+        await asyncio.wait_for(protocol.done, 10)
+
+        # Closing the server closes the established connections.
+        server.close()
+        await asyncio.wait_for(server.wait_closed(), 10)
+        return await asyncio.wait_for(protocol.closed, 10)
+
+    def test_echo(self):
+        self.assertTrue(run(self.echo()))
+
+    def test_close_connections(self):
+        self.assertIsNone(run(self.close_connections()))
+
+
+if __name__ == '__main__':
+    unittest.main()
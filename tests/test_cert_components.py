@@ -126,6 +126,37 @@ class TestCertName(unittest.TestCase):
         self.assertTrue(cn_rdn1 < ou_rdn)
         self.assertTrue(cn_rdn1 < cn_rdn3)
 
+    def test_hash(self):
+        cn_ava1 = nss.AVA('cn', self.cn_name)
+        cn_ava2 = nss.AVA('cn', self.cn_name.upper())
+        self.assertEqual(cn_ava1, cn_ava2)
+        self.assertEqual(hash(cn_ava1), hash(cn_ava2))
+
+        cn_rdn1 = nss.RDN(cn_ava1)
+        cn_rdn2 = nss.RDN(nss.AVA('cn', self.cn_name))
+        self.assertEqual(hash(cn_rdn1), hash(cn_rdn2))
+
+        name1 = nss.DN(self.subject_name)
+        name2 = nss.DN(self.subject_name.upper())
+        self.assertEqual(name1, name2)
+        self.assertEqual(hash(name1), hash(name2))
+
+        o_ava1 = nss.AVA('o', 'Soci\u00e9t\u00e9 G\u00e9n\u00e9rale')
+        o_ava2 = nss.AVA('o', 'SOCI\u00c9T\u00c9 G\u00c9N\u00c9RALE')
+        self.assertEqual(o_ava1, o_ava2)
+        self.assertEqual(hash(o_ava1), hash(o_ava2))
+
+        names = {name1: 1}
+        self.assertEqual(names[name2], 1)
+        self.assertNotIn(nss.DN('CN=%s' % self.cn_name), names)
+
+        # A hashed DN must not change.
+        name3 = nss.DN(cn_rdn1)
+        name3.add_rdn(nss.RDN(nss.AVA('ou', self.ou_name)))
+        with self.assertRaises(TypeError):
+            name1.add_rdn(cn_rdn1)
+        self.assertEqual(names[name2], 1)
+
     def test_rdn_create(self):
         cn_ava = nss.AVA('cn', self.cn_name)
         ou_ava = nss.AVA('ou', self.ou_name)
@@ -5,6 +5,7 @@ import sys
 import unittest
 
 from nss import nss
+from nss.error import NSPRError
 
 verbose = False
 mechanism = nss.CKM_DES_CBC_PAD
@@ -112,6 +113,59 @@ class TestCipher(unittest.TestCase):
 
         self.assertNotEqual(cipher_text, plain_text)
 
+    def test_into_buffer(self):
+        with open(in_filename, 'rb') as f:
+            in_data = f.read()
+
+        # The output buffer must hold the input plus one cipher block,
+        # the cipher text is itself up to one block longer than in_data.
+        block_size = nss.get_block_size(mechanism)
+        out_buf = bytearray(len(in_data) + 2 * block_size)
+
+        # Feed memoryview slices so no intermediate bytes are created.
+        in_view = memoryview(in_data)
+        cipher_text = bytearray()
+        for i in range(0, len(in_data), chunk_size):
+            n = self.encoding_ctx.cipher_op_into(
+                in_view[i : i + chunk_size], out_buf
+            )
+            cipher_text += out_buf[:n]
+        cipher_text += self.encoding_ctx.digest_final()
+
+        n = self.decoding_ctx.cipher_op_into(cipher_text, out_buf)
+        decoded_text = bytes(out_buf[:n]) + self.decoding_ctx.digest_final()
+
+        self.assertEqual(decoded_text, in_data)
+
+        with self.assertRaises(ValueError):
+            self.encoding_ctx.cipher_op_into(in_data, bytearray(1))
+
+    def test_cipher_file(self):
+        encrypted_filename = os.path.basename(in_filename) + '.encrypted'
+        decrypted_filename = os.path.basename(in_filename) + '.decrypted'
+
+        n_encrypted = self.encoding_ctx.cipher_file(
+            in_filename, encrypted_filename
+        )
+        n_decrypted = self.decoding_ctx.cipher_file(
+            encrypted_filename, decrypted_filename
+        )
+
+        with open(in_filename, 'rb') as f:
+            in_data = f.read()
+        with open(encrypted_filename, 'rb') as f:
+            encrypted_data = f.read()
+        with open(decrypted_filename, 'rb') as f:
+            decrypted_data = f.read()
+
+        os.unlink(encrypted_filename)
+        os.unlink(decrypted_filename)
+
+        self.assertEqual(n_encrypted, len(encrypted_data))
+        self.assertEqual(n_decrypted, len(decrypted_data))
+        self.assertNotEqual(encrypted_data, in_data)
+        self.assertEqual(decrypted_data, in_data)
+
     def test_file(self):
         encrypted_filename = os.path.basename(in_filename) + '.encrypted'
         decrypted_filename = os.path.basename(in_filename) + '.decrypted'
@@ -187,5 +241,79 @@ class TestCipher(unittest.TestCase):
         os.unlink(decrypted_filename)
 
 
+class TestAEAD(unittest.TestCase):
+    nonce = b'\x01' * 12
+    aad = b'record header'
+
+    def setUp(self):
+        nss.nss_init_nodb()
+
+    def tearDown(self):
+        nss.nss_shutdown()
+
+    def do_test(self, mechanism):
+        slot = nss.get_best_slot(mechanism)
+        sym_key = slot.key_gen(mechanism, None, 32)
+
+        cipher_text = sym_key.encrypt_aead(self.nonce, self.aad, plain_text)
+        self.assertEqual(len(cipher_text), len(plain_text) + 16)
+        self.assertEqual(
+            sym_key.decrypt_aead(self.nonce, self.aad, cipher_text),
+            plain_text,
+        )
+
+        # Tampering with the aad or the cipher text must fail verification.
+        with self.assertRaises(NSPRError):
+            sym_key.decrypt_aead(self.nonce, b'other header', cipher_text)
+        tampered = bytearray(cipher_text)
+        tampered[0] ^= 1
+        with self.assertRaises(NSPRError):
+            sym_key.decrypt_aead(self.nonce, self.aad, tampered)
+
+        out_buf = bytearray(len(cipher_text))
+        n = sym_key.decrypt_aead_into(
+            self.nonce, self.aad, memoryview(cipher_text), out_buf
+        )
+        self.assertEqual(bytes(out_buf[:n]), plain_text)
+
+        records = [
+            (i.to_bytes(12, 'big'), self.aad, plain_text * i)
+            for i in range(10)
+        ]
+        sealed = sym_key.encrypt_aead_many(records)
+        for (nonce, aad, data), cipher_text in zip(records, sealed):
+            self.assertEqual(
+                cipher_text, sym_key.encrypt_aead(nonce, aad, data)
+            )
+            self.assertEqual(
+                sym_key.decrypt_aead(nonce, aad, cipher_text), data
+            )
+
+        # None selects the mechanism from the key, like omitting it.
+        self.assertEqual(
+            sym_key.encrypt_aead(
+                self.nonce, self.aad, plain_text, mechanism=None
+            ),
+            sym_key.encrypt_aead(
+                self.nonce, self.aad, plain_text, mechanism=mechanism
+            ),
+        )
+        self.assertEqual(
+            sym_key.encrypt_aead_many(records, mechanism=None), sealed
+        )
+        with self.assertRaises(TypeError):
+            sym_key.decrypt_aead(self.nonce, self.aad, cipher_text, 'gcm')
+        with self.assertRaisesRegex(TypeError, '^decrypt_aead'):
+            sym_key.decrypt_aead(
+                self.nonce, self.aad, cipher_text, None, 16, 0
+            )
+
+    def test_aes_gcm(self):
+        self.do_test(nss.CKM_AES_GCM)
+
+    def test_chacha20_poly1305(self):
+        self.do_test(nss.CKM_CHACHA20_POLY1305)
+
+
 if __name__ == '__main__':
     unittest.main()
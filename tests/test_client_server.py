@@ -1,15 +1,28 @@
 from __future__ import absolute_import, print_function
 
+import asyncio
 import errno
 import os
+import queue
+import resource
 import signal
 import sys
+import threading
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from getpass import getpass
 
-from nss import io, nss, ssl
-from nss.error import NSPRError
+from nss import aio, io, nss, ssl, ssl_server, ssl_session_cache
+from nss.error import (
+    PR_IN_PROGRESS_ERROR,
+    PR_INSUFFICIENT_RESOURCES_ERROR,
+    PR_WOULD_BLOCK_ERROR,
+    SEC_ERROR_REVOKED_CERTIFICATE,
+    SSL_ERROR_HANDSHAKE_FAILED,
+    SSL_ERROR_REVOKED_CERT_ALERT,
+    NSPRError,
+)
 
 NO_CLIENT_CERT = 0
 REQUEST_CLIENT_CERT_ONCE = 1
@@ -417,5 +430,794 @@ class TestSSL(unittest.TestCase):
         self.assertEqual("{%s}" % request, reply)
 
 
+def handshake_rate(n_handshakes):
+    """
+    Perform n_handshakes full TLS handshakes against an in process
+    server over the loopback interface with a Python auth certificate
+    callback installed on the client. Returns (handshakes/sec, list of
+    sockets the auth callback received, list of client sockets).
+    """
+    server_cert = nss.find_cert_from_nickname(server_nickname, password)
+    priv_key = nss.find_key_by_any_cert(server_cert, password)
+
+    net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+    listen_sock = ssl.SSLSocket(net_addr.family)
+    listen_sock.set_pkcs11_pin_arg(password)
+    listen_sock.set_ssl_option(ssl.SSL_SECURITY, True)
+    listen_sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_SERVER, True)
+    listen_sock.config_secure_server(
+        server_cert, priv_key, server_cert.find_kea_type()
+    )
+    listen_sock.bind(net_addr)
+    listen_sock.listen()
+    net_addr.port = listen_sock.get_sock_name().port
+
+    def serve():
+        for _ in range(n_handshakes):
+            client_sock, client_addr = listen_sock.accept()
+            client_sock.set_socket_option(io.PR_SockOpt_NoDelay, True)
+            client_sock.readline()
+            client_sock.send(b'ok\n')
+            client_sock.close()
+
+    auth_socks = []
+
+    def auth_callback(sock, check_sig, is_server, certdb):
+        auth_socks.append(sock)
+        return True
+
+    client_socks = []
+    server_thread = threading.Thread(target=serve)
+    server_thread.start()
+    start = time.time()
+    for _ in range(n_handshakes):
+        sock = ssl.SSLSocket(net_addr.family)
+        sock.set_ssl_option(ssl.SSL_SECURITY, True)
+        sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+        sock.set_ssl_option(ssl.SSL_NO_CACHE, True)
+        sock.set_socket_option(io.PR_SockOpt_NoDelay, True)
+        sock.set_hostname(hostname)
+        sock.set_auth_certificate_callback(
+            auth_callback, nss.get_default_certdb()
+        )
+        sock.connect(net_addr)
+        sock.send(b'hello\n')
+        sock.readline()
+        sock.close()
+        client_socks.append(sock)
+    elapsed = time.time() - start
+    server_thread.join()
+    listen_sock.close()
+
+    return n_handshakes / elapsed, auth_socks, client_socks
+
+
+def concurrent_handshakes(n_handshakes, executor=None, verify=None):
+    """
+    Perform n_handshakes TLS handshakes concurrently, driving both the
+    client and the server side of every connection from the calling
+    thread with non-blocking sockets, an io.PollSet and
+    SSLSocket.do_handshake_step().
+
+    If executor is given the client auth certificate callback returns
+    ssl.SECWouldBlock and runs verify(cert), which returns an error code
+    (0 if the certificate is valid), on the executor. The worker passes
+    the result to SSLSocket.auth_certificate_complete() and wakes the
+    poll set. Returns (handshakes/sec, list of (is_client, error code)
+    for the handshakes which failed).
+    """
+    server_cert = nss.find_cert_from_nickname(server_nickname, password)
+    priv_key = nss.find_key_by_any_cert(server_cert, password)
+    poll_timeout = io.seconds_to_interval(timeout_secs)
+
+    net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+    listen_sock = ssl.SSLSocket(net_addr.family)
+    listen_sock.set_pkcs11_pin_arg(password)
+    listen_sock.set_ssl_option(ssl.SSL_SECURITY, True)
+    listen_sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_SERVER, True)
+    listen_sock.config_secure_server(
+        server_cert, priv_key, server_cert.find_kea_type()
+    )
+    listen_sock.set_socket_option(io.PR_SockOpt_Nonblocking, True)
+    listen_sock.bind(net_addr)
+    listen_sock.listen(128)
+    net_addr.port = listen_sock.get_sock_name().port
+
+    poll_set = io.PollSet()
+    poll_set.register(listen_sock, io.PR_POLL_READ)
+    connecting = set()
+    socks = []
+    client_socks = set()
+    failed = []
+    completed = queue.Queue()
+
+    def verify_async(sock, cert):
+        sock.auth_certificate_complete(verify(cert))
+        completed.put(sock)
+        poll_set.wakeup()
+
+    def auth_callback(sock, check_sig, is_server):
+        if executor is None:
+            return True
+        executor.submit(verify_async, sock, sock.get_peer_certificate())
+        return ssl.SECWouldBlock
+
+    start = time.time()
+    for _ in range(n_handshakes):
+        sock = ssl.SSLSocket(net_addr.family)
+        sock.set_ssl_option(ssl.SSL_SECURITY, True)
+        sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+        sock.set_ssl_option(ssl.SSL_NO_CACHE, True)
+        sock.set_hostname(hostname)
+        sock.set_auth_certificate_callback(auth_callback)
+        sock.set_socket_option(io.PR_SockOpt_Nonblocking, True)
+        try:
+            sock.connect(net_addr)
+        except NSPRError as e:
+            if e.errno != PR_IN_PROGRESS_ERROR:
+                raise
+        poll_set.register(sock, io.PR_POLL_WRITE)
+        connecting.add(sock)
+        client_socks.add(sock)
+        socks.append(sock)
+
+    n_done = 0
+    while n_done < 2 * n_handshakes:
+        ready = poll_set.poll(poll_timeout)
+        # A paused handshake is resumed by its worker, not by the socket
+        # becoming ready.
+        while not completed.empty():
+            sock = completed.get()
+            if sock in poll_set:
+                ready.append((sock, 0))
+        if not ready:
+            raise AssertionError(
+                '%d of %d handshakes stalled'
+                % (2 * n_handshakes - n_done, 2 * n_handshakes)
+            )
+        for sock, flags in ready:
+            if sock is listen_sock:
+                while True:
+                    try:
+                        server_sock, client_addr = listen_sock.accept()
+                    except NSPRError as e:
+                        if e.errno != PR_WOULD_BLOCK_ERROR:
+                            raise
+                        break
+                    server_sock.set_socket_option(
+                        io.PR_SockOpt_Nonblocking, True
+                    )
+                    poll_set.register(server_sock, ssl.SSL_HANDSHAKE_WANT_READ)
+                    socks.append(server_sock)
+                continue
+
+            if sock in connecting:
+                try:
+                    sock.connect_continue(flags)
+                except NSPRError as e:
+                    if e.errno != PR_IN_PROGRESS_ERROR:
+                        raise
+                    continue
+                connecting.discard(sock)
+
+            try:
+                state = sock.do_handshake_step()
+            except NSPRError as e:
+                failed.append((sock in client_socks, e.errno))
+                state = ssl.SSL_HANDSHAKE_DONE
+            if state == ssl.SSL_HANDSHAKE_DONE:
+                poll_set.unregister(sock)
+                n_done += 1
+            else:
+                poll_set.modify(sock, state)
+    elapsed = time.time() - start
+
+    for sock in socks:
+        sock.close()
+    listen_sock.close()
+
+    return n_handshakes / elapsed, failed
+
+
+def raise_open_files_limit(test, n_files):
+    """
+    Raise the soft RLIMIT_NOFILE to n_files for the duration of test,
+    skip the test if the hard limit is lower.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= n_files:
+        return
+    if hard != resource.RLIM_INFINITY and hard < n_files:
+        test.skipTest(
+            'needs %d open files, RLIMIT_NOFILE hard limit is %d'
+            % (n_files, hard)
+        )
+    resource.setrlimit(resource.RLIMIT_NOFILE, (n_files, hard))
+    test.addCleanup(resource.setrlimit, resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def verify_server_cert(cert):
+    """
+    Verify a server certificate the way auth_certificate_callback()
+    does, returning 0 if it is valid or the error code.
+    """
+    try:
+        cert.verify_now(
+            nss.get_default_certdb(), True, nss.certificateUsageSSLServer
+        )
+        cert.verify_hostname(hostname)
+    except NSPRError as e:
+        return e.errno
+    return 0
+
+
+def server_load(n_clients, n_connections, workers, max_connections):
+    """
+    Serve n_clients client threads, each making n_connections
+    connections, with an ssl_server.TLSServer. Every connection does a
+    full handshake and one request/reply round trip. Returns
+    (handshakes/sec, sorted list of connection latencies in seconds,
+    the most connections the handler served at once, the server).
+    """
+    server_cert = nss.find_cert_from_nickname(server_nickname, password)
+    priv_key = nss.find_key_by_any_cert(server_cert, password)
+    net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+    listen_sock = ssl_server.listen_socket(
+        net_addr, server_cert, priv_key, pin_arg=password
+    )
+    net_addr.port = listen_sock.get_sock_name().port
+
+    lock = threading.Lock()
+    active = [0, 0]  # current, maximum
+
+    def handler(sock, addr):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        try:
+            sock.send(sock.readline())
+        finally:
+            with lock:
+                active[0] -= 1
+
+    latencies = []
+
+    def client():
+        for _ in range(n_connections):
+            start = time.time()
+            sock = ssl.SSLSocket(net_addr.family)
+            sock.set_ssl_option(ssl.SSL_SECURITY, True)
+            sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+            sock.set_ssl_option(ssl.SSL_NO_CACHE, True)
+            sock.set_hostname(hostname)
+            sock.set_auth_certificate_callback(lambda *args: True)
+            sock.connect(net_addr)
+            sock.send(b'hello\n')
+            reply = sock.readline()
+            sock.close()
+            if reply != b'hello\n':
+                raise AssertionError('bad reply %r' % reply)
+            with lock:
+                latencies.append(time.time() - start)
+
+    server = ssl_server.TLSServer(
+        listen_sock,
+        handler,
+        workers=workers,
+        max_connections=max_connections,
+    )
+    with server:
+        start = time.time()
+        clients = [threading.Thread(target=client) for _ in range(n_clients)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.time() - start
+
+    return len(latencies) / elapsed, sorted(latencies), active[1], server
+
+
+def configure_client(sock, auth_callback):
+    """
+    Configure sock as a TLS client option by option.
+    """
+    sock.set_ssl_option(ssl.SSL_SECURITY, True)
+    sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+    sock.set_ssl_option(ssl.SSL_NO_CACHE, True)
+    sock.set_ssl_version_range('tls1.2', 'tls1.2')
+    for cipher in ssl.ssl_implemented_ciphers:
+        sock.set_cipher_pref(cipher, True)
+    sock.set_hostname(hostname)
+    sock.set_pkcs11_pin_arg(password)
+    sock.set_auth_certificate_callback(auth_callback)
+    sock.set_handshake_callback(handshake_callback)
+
+
+def socket_setup_time(n_sockets, model=None):
+    """
+    Create n_sockets client SSLSockets, configured option by option or
+    from model. Returns the elapsed time.
+    """
+    auth_callback = lambda *args: True
+    start = time.time()
+    for _ in range(n_sockets):
+        if model is None:
+            sock = ssl.SSLSocket(io.PR_AF_INET)
+            configure_client(sock, auth_callback)
+        else:
+            sock = ssl.SSLSocket(io.PR_AF_INET, model=model)
+        sock.close()
+    return time.time() - start
+
+
+class TestHandshakeRate(unittest.TestCase):
+    n_handshakes = 100
+
+    def setUp(self):
+        nss.nss_init(db_name)
+        nss.set_password_callback(password_callback)
+        ssl.set_domestic_policy()
+        ssl.config_server_session_id_cache()
+
+    def tearDown(self):
+        ssl.shutdown_server_session_id_cache()
+        nss.nss_shutdown()
+
+    def test_auth_callback_rate(self):
+        rate, auth_socks, client_socks = handshake_rate(self.n_handshakes)
+        if info:
+            print('%d handshakes: %.1f/sec' % (self.n_handshakes, rate))
+
+        # The callback receives the SSLSocket it was installed on.
+        self.assertEqual(len(auth_socks), self.n_handshakes)
+        for auth_sock, client_sock in zip(auth_socks, client_socks):
+            self.assertIs(auth_sock, client_sock)
+
+    def test_auth_callback_result(self):
+        server_cert = nss.find_cert_from_nickname(server_nickname, password)
+        priv_key = nss.find_key_by_any_cert(server_cert, password)
+        net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+        listen_sock = ssl_server.listen_socket(
+            net_addr, server_cert, priv_key, pin_arg=password
+        )
+        net_addr.port = listen_sock.get_sock_name().port
+
+        class NoTruth(object):
+            def __bool__(self):
+                raise ValueError('no truth value')
+
+            __nonzero__ = __bool__
+
+        # Only the exact int SECWouldBlock pauses the handshake, any
+        # other result is taken for its truth value.
+        results = ((2**64, True), (0, False), (NoTruth(), False))
+        with ssl_server.TLSServer(
+            listen_sock, lambda sock, addr: sock.send(sock.readline())
+        ):
+            for result, accepted in results:
+                sock = ssl.SSLSocket(net_addr.family)
+                configure_client(sock, lambda *args: result)
+                sock.connect(net_addr)
+                if accepted:
+                    sock.send(b'hello\n')
+                    self.assertEqual(sock.readline(), b'hello\n')
+                else:
+                    with self.assertRaises(NSPRError):
+                        sock.force_handshake()
+                sock.close()
+
+        # PyErr_Print() kept the exception of NoTruth, whose traceback
+        # references this frame and the sockets.
+        for name in ('last_type', 'last_value', 'last_traceback', 'last_exc'):
+            if hasattr(sys, name):
+                setattr(sys, name, None)
+
+    def test_concurrent_handshakes(self):
+        n_handshakes = 1000
+        # Every client and accepted socket is open at once, plus the
+        # listening socket and the NSS database.
+        raise_open_files_limit(self, 2 * n_handshakes + 64)
+        rate, failed = concurrent_handshakes(n_handshakes)
+        if info:
+            print(
+                '%d concurrent handshakes in one thread: %.1f/sec'
+                % (n_handshakes, rate)
+            )
+        self.assertEqual(failed, [])
+
+    def test_async_auth_certificate(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            rate, failed = concurrent_handshakes(
+                self.n_handshakes, executor, verify_server_cert
+            )
+        if info:
+            print(
+                '%d handshakes verified on a worker pool: %.1f/sec'
+                % (self.n_handshakes, rate)
+            )
+        self.assertEqual(failed, [])
+
+    def test_async_auth_certificate_failure(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            rate, failed = concurrent_handshakes(
+                self.n_handshakes,
+                executor,
+                lambda cert: SEC_ERROR_REVOKED_CERTIFICATE,
+            )
+        # The error is sent to the server as an alert, the client only
+        # learns the handshake failed.
+        self.assertEqual(
+            sorted(failed),
+            [(False, SSL_ERROR_REVOKED_CERT_ALERT)] * self.n_handshakes
+            + [(True, SSL_ERROR_HANDSHAKE_FAILED)] * self.n_handshakes,
+        )
+
+    def test_threaded_server(self):
+        n_clients = 16
+        n_connections = 50
+        max_connections = 8
+        rate, latencies, max_active, server = server_load(
+            n_clients, n_connections, 4, max_connections
+        )
+        n_total = n_clients * n_connections
+        if info:
+            print(
+                'TLSServer %d connections: %.1f handshakes/sec, '
+                'p50 %.1fms p99 %.1fms'
+                % (
+                    n_total,
+                    rate,
+                    latencies[n_total // 2] * 1000,
+                    latencies[n_total * 99 // 100] * 1000,
+                )
+            )
+
+        self.assertEqual(len(latencies), n_total)
+        self.assertEqual(server.n_accepted, n_total)
+        self.assertEqual(server.n_handshakes, n_total)
+        self.assertEqual(server.n_handshake_errors, 0)
+        self.assertLessEqual(max_active, max_connections)
+
+    def test_accept_error(self):
+        server_cert = nss.find_cert_from_nickname(server_nickname, password)
+        priv_key = nss.find_key_by_any_cert(server_cert, password)
+        net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+        listen_sock = ssl_server.listen_socket(
+            net_addr, server_cert, priv_key, pin_arg=password
+        )
+        net_addr.port = listen_sock.get_sock_name().port
+
+        class FailingAccept(object):
+            def accept(self, timeout):
+                server.listen_sock = listen_sock
+                raise NSPRError(
+                    'accept failed', PR_INSUFFICIENT_RESOURCES_ERROR
+                )
+
+        class Server(ssl_server.TLSServer):
+            accept_error_delay = 0
+
+            def __init__(self, *args, **kwargs):
+                super(Server, self).__init__(*args, **kwargs)
+                self.errors = []
+
+            def handle_error(self, sock, addr):
+                self.errors.append((sock, addr, sys.exc_info()[1].errno))
+
+        # The first accept fails, the acceptor must report it and go on
+        # accepting with max_connections=1, i.e. without losing its slot.
+        server = Server(
+            listen_sock,
+            lambda sock, addr: sock.send(sock.readline()),
+            max_connections=1,
+        )
+        server.listen_sock = FailingAccept()
+        with server:
+            for _ in range(2):
+                sock = ssl.SSLSocket(net_addr.family)
+                configure_client(sock, lambda *args: True)
+                sock.connect(net_addr)
+                sock.send(b'hello\n')
+                self.assertEqual(sock.readline(), b'hello\n')
+                sock.close()
+
+        self.assertEqual(
+            server.errors,
+            [(listen_sock, None, PR_INSUFFICIENT_RESOURCES_ERROR)],
+        )
+        self.assertEqual(server.n_accepted, 2)
+
+
+class TestSSLModel(unittest.TestCase):
+    n_sockets = 1000
+
+    def setUp(self):
+        nss.nss_init(db_name)
+        nss.set_password_callback(password_callback)
+        ssl.set_domestic_policy()
+        ssl.config_server_session_id_cache()
+
+    def tearDown(self):
+        ssl.shutdown_server_session_id_cache()
+        nss.nss_shutdown()
+
+    def test_model(self):
+        server_cert = nss.find_cert_from_nickname(server_nickname, password)
+        priv_key = nss.find_key_by_any_cert(server_cert, password)
+        net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+        listen_sock = ssl_server.listen_socket(
+            net_addr, server_cert, priv_key, pin_arg=password
+        )
+        net_addr.port = listen_sock.get_sock_name().port
+
+        auth_socks = []
+
+        def auth_callback(sock, check_sig, is_server):
+            auth_socks.append(sock)
+            return True
+
+        model = ssl.SSLSocket(net_addr.family)
+        configure_client(model, auth_callback)
+
+        socks = []
+        with ssl_server.TLSServer(
+            listen_sock, lambda sock, addr: sock.send(sock.readline())
+        ):
+            for _ in range(3):
+                sock = ssl.SSLSocket(net_addr.family, model=model)
+                sock.connect(net_addr)
+                sock.send(b'hello\n')
+                self.assertEqual(sock.readline(), b'hello\n')
+                self.assertEqual(sock.get_hostname(), hostname)
+                self.assertEqual(
+                    sock.get_ssl_channel_info().protocol_version_enum,
+                    ssl.SSL_LIBRARY_VERSION_TLS_1_2,
+                )
+                sock.close()
+                socks.append(sock)
+
+        # The inherited callback is handed the new socket, not the model.
+        self.assertEqual(auth_socks, socks)
+        model.close()
+
+        with self.assertRaises(ValueError):
+            ssl.SSLSocket(net_addr.family, model=model)
+        with self.assertRaises(TypeError):
+            ssl.SSLSocket(net_addr.family, model=io.Socket(net_addr.family))
+
+    def test_setup_benchmark(self):
+        # Before: every socket is configured option by option.
+        configured_elapsed = socket_setup_time(self.n_sockets)
+
+        # After: every socket copies the configuration of a model.
+        model = ssl.SSLSocket(io.PR_AF_INET)
+        configure_client(model, lambda *args: True)
+        model_elapsed = socket_setup_time(self.n_sockets, model)
+        model.close()
+
+        if info:
+            print(
+                'SSLSocket setup x%d: configured %.4fs model %.4fs'
+                % (self.n_sockets, configured_elapsed, model_elapsed)
+            )
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        nss.nss_init(db_name)
+        nss.set_password_callback(password_callback)
+        ssl.set_domestic_policy()
+        ssl.config_server_session_id_cache()
+
+        server_cert = nss.find_cert_from_nickname(server_nickname, password)
+        priv_key = nss.find_key_by_any_cert(server_cert, password)
+        self.net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+        listen_sock = ssl_server.listen_socket(
+            self.net_addr, server_cert, priv_key, pin_arg=password
+        )
+        listen_sock.set_ssl_option(ssl.SSL_ENABLE_SESSION_TICKETS, True)
+        self.net_addr.port = listen_sock.get_sock_name().port
+        self.server = ssl_server.TLSServer(
+            listen_sock, lambda sock, addr: sock.send(sock.readline())
+        )
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        del self.server
+        ssl.clear_session_cache()
+        ssl.shutdown_server_session_id_cache()
+        nss.nss_shutdown()
+
+    def connect(self, cache, peer_id, version):
+        sock = ssl.SSLSocket(self.net_addr.family)
+        sock.set_ssl_option(ssl.SSL_SECURITY, True)
+        sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+        sock.set_ssl_version_range(version, version)
+        sock.set_hostname(hostname)
+        sock.set_auth_certificate_callback(lambda *args: True)
+        cache.install(sock, peer_id)
+        sock.connect(self.net_addr)
+        sock.send(b'hello\n')
+        self.assertEqual(sock.readline(), b'hello\n')
+        resumed = sock.get_ssl_channel_info().resumed
+        sock.close()
+        return resumed
+
+    def do_test_resumption(self, version):
+        n_connections = 20
+        cache = ssl_session_cache.ClientSessionCache()
+        resumed = [
+            self.connect(cache, 'backend', version)
+            for _ in range(n_connections)
+        ]
+
+        self.assertEqual(resumed, [False] + [True] * (n_connections - 1))
+        stats = cache.stats()
+        self.assertEqual(stats['full_handshakes'], 1)
+        self.assertEqual(stats['resumed_handshakes'], n_connections - 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], n_connections - 1)
+        if info:
+            print('%s session cache: %s' % (version, stats))
+
+        # Exported tokens resume the session in a fresh cache.
+        other = ssl_session_cache.ClientSessionCache()
+        other.load(cache.export())
+        self.assertTrue(self.connect(other, 'backend', version))
+
+    def test_resumption_tls12(self):
+        self.do_test_resumption('tls1.2')
+
+    def test_resumption_tls13(self):
+        self.do_test_resumption('tls1.3')
+
+    def test_eviction(self):
+        cache = ssl_session_cache.ClientSessionCache(max_entries=2)
+        for peer_id in ('a', 'b', 'c'):
+            self.assertFalse(self.connect(cache, peer_id, 'tls1.3'))
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.evictions, 1)
+
+        # 'a' was evicted, 'b' and 'c' resume.
+        self.assertFalse(self.connect(cache, 'a', 'tls1.3'))
+        self.assertNotIn('b', cache)
+        self.assertTrue(self.connect(cache, 'c', 'tls1.3'))
+
+        cache.put('c', b'not a token')
+        self.assertFalse(self.connect(cache, 'c', 'tls1.3'))
+        self.assertEqual(cache.rejected, 1)
+
+
+class EchoProtocol(asyncio.Protocol):
+    def __init__(self):
+        self.closed = asyncio.get_event_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+    def eof_received(self):
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        self.closed.set_result(exc)
+
+
+class CollectProtocol(EchoProtocol):
+    def __init__(self, expected):
+        super(CollectProtocol, self).__init__()
+        self.expected = expected
+        self.data = bytearray()
+        self.done = asyncio.get_event_loop().create_future()
+
+    def data_received(self, data):
+        self.data += data
+        if len(self.data) >= self.expected:
+            self.done.set_result(bytes(self.data))
+
+
+class TestAioTLS(unittest.TestCase):
+    def setUp(self):
+        nss.nss_init(db_name)
+        nss.set_password_callback(password_callback)
+        ssl.set_domestic_policy()
+        ssl.config_server_session_id_cache()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.auth_socks = []
+
+    def tearDown(self):
+        # Every SSLSocket must be gone before NSS shuts down.
+        del self.auth_socks
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        ssl.shutdown_server_session_id_cache()
+        nss.nss_shutdown()
+
+    def listen_socket(self):
+        server_cert = nss.find_cert_from_nickname(server_nickname, password)
+        priv_key = nss.find_key_by_any_cert(server_cert, password)
+        net_addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+        listen_sock = ssl_server.listen_socket(
+            net_addr, server_cert, priv_key, pin_arg=password
+        )
+        net_addr.port = listen_sock.get_sock_name().port
+        return listen_sock, net_addr
+
+    async def close_server(self, server):
+        # Also waits until the server side connections are closed.
+        server.close()
+        await asyncio.wait_for(server.wait_closed(), timeout_secs)
+
+    def client_socket(self, net_addr):
+        def auth_callback(sock, check_sig, is_server):
+            self.auth_socks.append(sock)
+            return True
+
+        sock = ssl.SSLSocket(net_addr.family)
+        sock.set_ssl_option(ssl.SSL_SECURITY, True)
+        sock.set_ssl_option(ssl.SSL_HANDSHAKE_AS_CLIENT, True)
+        sock.set_hostname(hostname)
+        sock.set_auth_certificate_callback(auth_callback)
+        return sock
+
+    async def transport_echo(self):
+        listen_sock, net_addr = self.listen_socket()
+        server = await aio.start_server(EchoProtocol, listen_sock)
+
+        sock = self.client_socket(net_addr)
+        messages = [b'hello ', b'world', b'!' * 100000]
+        expected = b''.join(messages)
+        transport, protocol = await aio.create_connection(
+            lambda: CollectProtocol(len(expected)), sock, net_addr
+        )
+        # The handshake completed before the protocol was attached.
+        self.assertEqual(self.auth_socks, [sock])
+        self.assertTrue(sock.get_ssl_channel_info().protocol_version)
+
+        for message in messages:
+            transport.write(message)
+        received = await asyncio.wait_for(protocol.done, timeout_secs)
+
+        transport.close()
+        await protocol.closed
+        await self.close_server(server)
+        return received
+
+    def test_transport_echo(self):
+        received = self.loop.run_until_complete(self.transport_echo())
+        self.assertEqual(received, b'hello world' + b'!' * 100000)
+
+    async def socket_echo(self):
+        listen_sock, net_addr = self.listen_socket()
+        server = await aio.start_server(EchoProtocol, listen_sock)
+
+        asock = aio.AsyncSocket(self.client_socket(net_addr))
+        await asock.connect(net_addr)
+        await asock.handshake()
+        self.assertEqual(self.auth_socks, [asock.sock])
+
+        payload = bytes(range(256)) * 4096
+        sender = asyncio.ensure_future(asock.sendall(payload))
+        received = bytearray()
+        while len(received) < len(payload):
+            data = await asock.recv(65536)
+            self.assertTrue(data)
+            received += data
+        await sender
+
+        asock.close()
+        await self.close_server(server)
+        return received == payload
+
+    def test_socket_echo(self):
+        self.assertTrue(self.loop.run_until_complete(self.socket_echo()))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,10 @@
 from __future__ import absolute_import, print_function
 
+import hashlib
 import subprocess
 import sys
+import threading
+import time
 import unittest
 
 from nss import nss
@@ -9,6 +12,11 @@ from nss import nss
 verbose = False
 in_filename = sys.argv[0]
 chunk_size = 128
+bench_data_size = 4 * 1024 * 1024
+bench_iterations = 8
+bench_threads = 4
+bench_n_blobs = 50000
+bench_blob_size = 64
 
 
 class TestDigest(unittest.TestCase):
@@ -83,6 +91,20 @@ class TestDigest(unittest.TestCase):
             % (hash_oid_name, reference_digest, test_digest),
         )
 
+        # Run the test using digest_file which maps the file itself.
+        test_digest = nss.data_to_hex(
+            nss.digest_file(in_filename, hash_oid), separator=None
+        )
+        if verbose:
+            print('nss.digest_file %s\n%s' % (hash_oid_name, test_digest))
+
+        self.assertEqual(
+            test_digest,
+            reference_digest,
+            msg='nss.digest_file %s test failed reference=%s test=%s'
+            % (hash_oid_name, reference_digest, test_digest),
+        )
+
         # Run the test using the lowest level hashing functions by specifying
         # the hash algorithm.
         # The entire input data is supplied all at once in a single call.
@@ -143,5 +165,96 @@ class TestDigest(unittest.TestCase):
         )
 
 
+def digest_throughput(digest_func, data, n_threads, iterations):
+    """
+    Run digest_func over data iterations times in each of n_threads
+    threads. Returns (MB/s, digests).
+    """
+    results = [None] * n_threads
+
+    def worker(index):
+        for _ in range(iterations):
+            results[index] = digest_func(data)
+
+    threads = [
+        threading.Thread(target=worker, args=(i,)) for i in range(n_threads)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    n_bytes = len(data) * iterations * n_threads
+    return n_bytes / elapsed / (1024 * 1024), results
+
+
+class TestDigestThroughput(unittest.TestCase):
+    """
+    Compare nss and hashlib digest throughput single threaded and with
+    several threads. Large buffers are digested with the GIL released
+    so the threaded nss rate should scale with the number of cores.
+    Run with verbose set to see the numbers.
+    """
+
+    def setUp(self):
+        nss.nss_init_nodb()
+
+    def tearDown(self):
+        nss.nss_shutdown()
+
+    def test_sha256_threads(self):
+        data = bytearray(b'\x5a' * bench_data_size)
+        reference_digest = hashlib.sha256(data).digest()
+
+        for name, digest_func in (
+            ('nss.sha256_digest', nss.sha256_digest),
+            ('hashlib.sha256', lambda d: hashlib.sha256(d).digest()),
+        ):
+            for n_threads in (1, bench_threads):
+                rate, digests = digest_throughput(
+                    digest_func, memoryview(data), n_threads, bench_iterations
+                )
+                if verbose:
+                    print('%s threads=%d %.1f MB/s' % (name, n_threads, rate))
+                for digest in digests:
+                    self.assertEqual(digest, reference_digest)
+
+    def test_digest_many(self):
+        blobs = [
+            i.to_bytes(4, 'big') * (bench_blob_size // 4)
+            for i in range(bench_n_blobs)
+        ]
+        reference_digests = [hashlib.sha256(blob).digest() for blob in blobs]
+
+        # Per call loop over the convenience function.
+        start = time.time()
+        digests = [nss.sha256_digest(blob) for blob in blobs]
+        loop_elapsed = time.time() - start
+        self.assertEqual(digests, reference_digests)
+
+        # One batched call reusing a single digest context.
+        start = time.time()
+        digests = nss.digest_many(nss.SEC_OID_SHA256, blobs)
+        many_elapsed = time.time() - start
+        self.assertEqual(digests, reference_digests)
+
+        packed = nss.digest_many(nss.SEC_OID_SHA256, blobs, packed=True)
+        self.assertEqual(packed, b''.join(reference_digests))
+
+        if verbose:
+            print(
+                'sha256 of %d %d octet blobs: '
+                'sha256_digest loop %.0f/s, digest_many %.0f/s'
+                % (
+                    bench_n_blobs,
+                    bench_blob_size,
+                    bench_n_blobs / loop_elapsed,
+                    bench_n_blobs / many_elapsed,
+                )
+            )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,20 @@
 from __future__ import absolute_import, print_function
 
+import time
 import unittest
 
 from nss import nss
-from nss.error import NSPRError
+from nss.error import CertVerifyError, NSPRError
 
+verbose = False
+bench_iterations = 1000
 db_name = 'sql:pki'
+db_passwd = 'DB_passwd'
+server_nickname = 'test_server'
+
+
+def password_callback(slot, retry):
+    return db_passwd
 
 
 # At the moment the OCSP tests are weak, we just test we can
@@ -71,5 +80,193 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(nss.set_use_pkix_for_validation(value), not value)
 
 
+class TestVerifyCache(unittest.TestCase):
+    def setUp(self):
+        nss.nss_init_read_write(db_name)
+        nss.set_password_callback(password_callback)
+        self.certdb = nss.get_default_certdb()
+        self.cert = nss.find_cert_from_nickname(server_nickname)
+        self.usage = nss.certificateUsageSSLServer
+        nss.set_verify_cache_settings(16)
+
+    def tearDown(self):
+        nss.set_verify_cache_settings(0)
+        del self.cert
+        nss.nss_shutdown()
+
+    def stats_delta(self, before):
+        after = nss.get_verify_cache_stats()
+        return dict(
+            (name, after[name] - before[name])
+            for name in ('hits', 'misses', 'evictions', 'invalidations')
+        )
+
+    def test_hits(self):
+        before = nss.get_verify_cache_stats()
+        usages = self.cert.verify_now(self.certdb, True, self.usage)
+        self.assertEqual(
+            self.cert.verify_now(self.certdb, True, self.usage), usages
+        )
+        self.assertEqual(
+            self.cert.verify(self.certdb, True, self.usage, None), usages
+        )
+        delta = self.stats_delta(before)
+        self.assertEqual(delta['misses'], 1)
+        self.assertEqual(delta['hits'], 2)
+        self.assertEqual(nss.get_verify_cache_stats()['entries'], 1)
+
+        # Different parameters are cached separately.
+        self.cert.verify_now(self.certdb, False, self.usage)
+        self.assertEqual(nss.get_verify_cache_stats()['entries'], 2)
+
+        # A time outside the certificate's validity is never a hit.
+        with self.assertRaises(CertVerifyError):
+            self.cert.verify(
+                self.certdb,
+                True,
+                self.usage,
+                self.cert.valid_not_after + 1000000,
+            )
+
+    def test_invalidation(self):
+        self.cert.verify_now(self.certdb, True, self.usage)
+        before = nss.get_verify_cache_stats()
+        nss.clear_ocsp_cache()
+        stats = nss.get_verify_cache_stats()
+        self.assertEqual(stats['entries'], 0)
+        self.assertEqual(stats['invalidations'], before['invalidations'] + 1)
+
+        # Distrusting the CA must not be masked by a cached result.
+        self.cert.verify_now(self.certdb, True, self.usage)
+        ca_cert = self.cert.get_cert_chain()[-1]
+        ca_cert.set_trust_attributes(',,', self.certdb, None)
+        try:
+            with self.assertRaises(CertVerifyError):
+                self.cert.verify_now(self.certdb, True, self.usage)
+        finally:
+            ca_cert.set_trust_attributes('CT,,CT', self.certdb, None)
+            del ca_cert
+        self.cert.verify_now(self.certdb, True, self.usage)
+
+    def test_eviction(self):
+        nss.set_verify_cache_settings(1)
+        before = nss.get_verify_cache_stats()
+        self.cert.verify_now(self.certdb, True, self.usage)
+        self.cert.verify_now(self.certdb, False, self.usage)
+        self.cert.verify_now(self.certdb, True, self.usage)
+        delta = self.stats_delta(before)
+        self.assertEqual(delta['misses'], 3)
+        self.assertEqual(delta['evictions'], 2)
+        self.assertEqual(nss.get_verify_cache_stats()['entries'], 1)
+
+        nss.set_verify_cache_settings(0)
+        self.assertFalse(nss.get_verify_cache_stats()['enabled'])
+        before = nss.get_verify_cache_stats()
+        self.cert.verify_now(self.certdb, True, self.usage)
+        self.assertEqual(self.stats_delta(before)['misses'], 0)
+
+    def test_verify_benchmark(self):
+        def verify_loop():
+            start = time.time()
+            for _ in range(bench_iterations):
+                self.cert.verify_now(self.certdb, True, self.usage)
+            return time.time() - start
+
+        # Before: every call builds and checks the chain.
+        nss.set_verify_cache_settings(0)
+        uncached_elapsed = verify_loop()
+
+        # After: calls after the first are answered from the cache.
+        nss.set_verify_cache_settings(16)
+        before = nss.get_verify_cache_stats()
+        cached_elapsed = verify_loop()
+        self.assertEqual(
+            self.stats_delta(before)['hits'], bench_iterations - 1
+        )
+
+        if verbose:
+            print(
+                'verify_now x%d: uncached %.4fs cached %.4fs'
+                % (bench_iterations, uncached_elapsed, cached_elapsed)
+            )
+
+
+class TestVerifyCertificates(unittest.TestCase):
+    def setUp(self):
+        nss.nss_init_read_write(db_name)
+        self.certdb = nss.get_default_certdb()
+        self.cert = nss.find_cert_from_nickname(server_nickname)
+        self.ca_cert = self.cert.get_cert_chain()[-1]
+        self.usage = nss.certificateUsageSSLServer
+
+    def tearDown(self):
+        del self.cert
+        del self.ca_cert
+        nss.nss_shutdown()
+
+    def test_results(self):
+        usages = self.cert.verify(self.certdb, True, self.usage, None)
+        certs = [self.cert, self.cert.der_data, b'not a certificate']
+        certs.append(self.ca_cert)
+
+        for workers in (0, 1, 3):
+            results = nss.verify_certificates(
+                certs, self.certdb, True, self.usage, workers=workers
+            )
+            self.assertEqual(len(results), len(certs))
+            self.assertEqual(results[0], (usages, 0))
+            self.assertEqual(results[1], (usages, 0))
+            self.assertEqual(results[2][0], 0)
+            self.assertNotEqual(results[2][1], 0)
+            # The CA is not valid for server usage.
+            self.assertNotEqual(results[3][1], 0)
+
+        # Any iterable is accepted, certs is copied before verifying.
+        self.assertEqual(
+            nss.verify_certificates(
+                iter(certs), self.certdb, True, self.usage
+            ),
+            results,
+        )
+
+        self.assertEqual(
+            nss.verify_certificates([], self.certdb, True, self.usage), []
+        )
+        with self.assertRaises(TypeError):
+            nss.verify_certificates([1], self.certdb, True, self.usage)
+
+    def test_log(self):
+        results = nss.verify_certificates(
+            [self.cert, self.ca_cert], self.certdb, True, self.usage, log=True
+        )
+        usages, err, log = results[0]
+        self.assertEqual(err, 0)
+        self.assertEqual(len(log), 0)
+        usages, err, log = results[1]
+        self.assertNotEqual(err, 0)
+        self.assertGreater(len(log), 0)
+
+    def test_verify_certificates_benchmark(self):
+        certs = [self.cert] * bench_iterations
+
+        # Before: one verify call per certificate.
+        start = time.time()
+        for cert in certs:
+            cert.verify(self.certdb, True, self.usage, None)
+        loop_elapsed = time.time() - start
+
+        # After: a single call verifying on all processors.
+        start = time.time()
+        results = nss.verify_certificates(certs, self.certdb, True, self.usage)
+        batch_elapsed = time.time() - start
+        self.assertEqual(sum(1 for result in results if result[1]), 0)
+
+        if verbose:
+            print(
+                'verify x%d: loop %.4fs verify_certificates %.4fs'
+                % (bench_iterations, loop_elapsed, batch_elapsed)
+            )
+
+
 if __name__ == '__main__':
     unittest.main()
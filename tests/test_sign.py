@@ -0,0 +1,62 @@
+from __future__ import absolute_import, print_function
+
+import unittest
+
+from nss import nss
+
+verbose = False
+mechanism = nss.CKM_SHA256_RSA_PKCS
+message = b'Sign me!'
+
+
+class TestSignVerify(unittest.TestCase):
+    def setUp(self):
+        nss.nss_init_nodb()
+        key_gen_mechanism = nss.CKM_RSA_PKCS_KEY_PAIR_GEN
+        slot = nss.get_best_slot(key_gen_mechanism)
+        self.pub_key, self.priv_key = slot.generate_key_pair(
+            key_gen_mechanism, nss.RSAGenParams(), False, False
+        )
+
+    def tearDown(self):
+        del self.pub_key
+        del self.priv_key
+        nss.nss_shutdown()
+
+    def test_sign_verify(self):
+        signature = self.priv_key.sign(mechanism, message)
+        if verbose:
+            print(
+                "Signature:\n%s" % (nss.data_to_hex(signature, separator=':'))
+            )
+
+        self.assertTrue(self.pub_key.verify(mechanism, signature, message))
+        self.assertTrue(
+            self.pub_key.verify(
+                mechanism, bytearray(signature), memoryview(message)
+            )
+        )
+        self.assertFalse(
+            self.pub_key.verify(mechanism, signature, message + b'!')
+        )
+        self.assertFalse(
+            self.pub_key.verify(mechanism, signature[:-1], message)
+        )
+
+    def test_verify_many(self):
+        messages = [message + str(i).encode() for i in range(20)]
+        items = [(m, self.priv_key.sign(mechanism, m)) for m in messages]
+
+        # Swap the signatures of the last two items so they fail.
+        items[-1], items[-2] = (
+            (items[-1][0], items[-2][1]),
+            (items[-2][0], items[-1][1]),
+        )
+
+        results = self.pub_key.verify_many(mechanism, items)
+        self.assertEqual(results, [True] * 18 + [False, False])
+        self.assertEqual(self.pub_key.verify_many(mechanism, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,299 @@
+from __future__ import absolute_import, print_function
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from nss import error, io
+
+verbose = False
+bench_file_size = 16 * 1024 * 1024
+bench_chunk_size = 64 * 1024
+
+
+def tcp_connection():
+    '''
+    Return a connected (client, server) pair of TCP sockets over the
+    loopback interface.
+    '''
+    addr = io.NetworkAddress(io.PR_IpAddrLoopback, 0)
+    listen_sock = io.Socket(addr.family)
+    listen_sock.bind(addr)
+    listen_sock.listen()
+    client = io.Socket(addr.family)
+    client.connect(listen_sock.get_sock_name())
+    server, client_addr = listen_sock.accept()
+    listen_sock.close()
+    return client, server
+
+
+def drain(sock, result):
+    '''
+    Read from sock until EOF, appending the number of bytes read to result.
+    '''
+    buf = bytearray(bench_chunk_size)
+    total = 0
+    while True:
+        n = sock.recv_into(buf)
+        if n == 0:
+            break
+        total += n
+    result.append(total)
+
+
+class TestRecvInto(unittest.TestCase):
+    def setUp(self):
+        self.writer, self.reader = io.Socket.new_tcp_pair()
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+
+    def test_recv_into(self):
+        self.writer.send(b'line1\nline2\nrest of data')
+
+        # readline() leaves the tail buffered in the readahead.
+        self.assertEqual(self.reader.readline(), b'line1\n')
+
+        buf = bytearray(4)
+        self.assertEqual(self.reader.recv_into(buf), 4)
+        self.assertEqual(buf, b'line')
+        self.assertEqual(self.reader.readline(), b'2\n')
+
+        view = memoryview(bytearray(32))
+        self.assertEqual(self.reader.recv_into(view[8:], 5), 5)
+        self.assertEqual(view[8:13].tobytes(), b'rest ')
+
+        with self.assertRaises(ValueError):
+            self.reader.recv_into(bytearray(2), 5)
+        with self.assertRaises(TypeError):
+            self.reader.recv_into(b'read only')
+
+    def test_partial_readahead(self):
+        self.writer.send(b'line1\npartial')
+        self.assertEqual(self.reader.readline(), b'line1\n')
+
+        # The buffered bytes are returned although no more data arrives
+        # before the timeout.
+        buf = bytearray(32)
+        timeout = io.milliseconds_to_interval(50)
+        self.assertEqual(self.reader.recv_into(buf, timeout=timeout), 7)
+        self.assertEqual(buf[:7], b'partial')
+
+        with self.assertRaises(error.NSPRError) as cm:
+            self.reader.recv_into(buf, timeout=timeout)
+        self.assertEqual(cm.exception.errno, error.PR_IO_TIMEOUT_ERROR)
+
+    def test_readinto(self):
+        data = b'0123456789' * 1000
+        self.writer.send(b'header\n' + data)
+        self.writer.shutdown()
+
+        self.assertEqual(self.reader.readline(), b'header\n')
+
+        received = bytearray()
+        buf = bytearray(1500)
+        while True:
+            n = self.reader.readinto(buf)
+            if n == 0:
+                break
+            received += buf[:n]
+        self.assertEqual(received, data)
+
+
+class TestSendv(unittest.TestCase):
+    def setUp(self):
+        self.writer, self.reader = io.Socket.new_tcp_pair()
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+
+    def test_sendv(self):
+        header = b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n'
+        body = bytearray(b'hello')
+        n = self.writer.sendv([header, memoryview(body), b''])
+        self.assertEqual(n, len(header) + len(body))
+        self.assertEqual(self.reader.recv(n), header + body)
+
+        self.assertEqual(self.writer.sendv(()), 0)
+        with self.assertRaises(TypeError):
+            self.writer.sendv([b'ok', u'not a buffer'])
+        with self.assertRaises(TypeError):
+            self.writer.sendv(None)
+
+    def test_sendv_many(self):
+        # More buffers than a single PR_Writev call accepts.
+        buffers = [('%03d,' % i).encode('ascii') for i in range(100)]
+        data = b''.join(buffers)
+        self.assertEqual(self.writer.sendv(buffers), len(data))
+        self.writer.shutdown()
+        self.assertEqual(self.reader.read(), data)
+
+
+class TestSendfile(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(100000)
+        fd, self.filename = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+        self.client, self.server = tcp_connection()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+        os.unlink(self.filename)
+
+    def receive(self, n):
+        received = b''
+        while len(received) < n:
+            received += self.server.recv(n - len(received))
+        return received
+
+    def test_sendfile(self):
+        with open(self.filename, 'rb') as f:
+            n = self.client.sendfile(f, headers=b'HDR', trailers=b'TRL')
+            self.assertEqual(n, len(self.data) + 6)
+            self.assertEqual(f.tell(), len(self.data))
+            self.assertEqual(self.receive(n), b'HDR' + self.data + b'TRL')
+
+            n = self.client.sendfile(f.fileno(), offset=10, count=20)
+            self.assertEqual(n, 20)
+            self.assertEqual(self.receive(n), self.data[10:30])
+
+        with self.assertRaises(TypeError):
+            self.client.sendfile('not a file')
+
+    def test_sendfile_limits(self):
+        with open(self.filename, 'rb') as f:
+            with self.assertRaises(ValueError):
+                self.client.sendfile(f, count=-1)
+
+            n = self.client.sendfile(f, count=0, headers=b'HDR')
+            self.assertEqual(n, 3)
+            self.assertEqual(self.receive(n), b'HDR')
+
+    def test_sendfile_large_file(self):
+        # A sparse file larger than a single call can send. Where the
+        # file system does not support sparse files it would really be
+        # written, check a smaller hole is not allocated first.
+        with open(self.filename, 'r+b') as f:
+            f.truncate(64 * 2**20)
+            if os.fstat(f.fileno()).st_blocks * 512 >= 2**20:
+                self.skipTest('the file system does not support sparse files')
+            try:
+                f.truncate(3 * 2**30)
+            except OSError as e:
+                self.skipTest('cannot create a 3GB sparse file: %s' % e)
+            with self.assertRaises(OverflowError):
+                self.client.sendfile(f)
+            n = self.client.sendfile(f, offset=2**31, count=10)
+            self.assertEqual(self.receive(n), bytes(10))
+
+    def test_sendfile_benchmark(self):
+        with open(self.filename, 'wb') as f:
+            f.write(os.urandom(bench_file_size))
+
+        def read_sendall(sock, f):
+            while True:
+                data = f.read(bench_chunk_size)
+                if not data:
+                    break
+                sock.sendall(data)
+
+        def sendfile(sock, f):
+            sock.sendfile(f)
+
+        for name, send in (
+            ('read+sendall', read_sendall),
+            ('sendfile', sendfile),
+        ):
+            client, server = tcp_connection()
+            result = []
+            reader = threading.Thread(target=drain, args=(server, result))
+            reader.start()
+            start = time.time()
+            with open(self.filename, 'rb') as f:
+                send(client, f)
+            client.shutdown()
+            reader.join()
+            elapsed = time.time() - start
+            client.close()
+            server.close()
+
+            self.assertEqual(result, [bench_file_size])
+            if verbose:
+                print(
+                    '%s: %.1f MB/s' % (name, bench_file_size / elapsed / 1e6)
+                )
+
+
+class TestPollSet(unittest.TestCase):
+    def setUp(self):
+        self.poll_set = io.PollSet()
+        self.pairs = [io.Socket.new_tcp_pair() for i in range(40)]
+
+    def tearDown(self):
+        for writer, reader in self.pairs:
+            writer.close()
+            reader.close()
+
+    def test_poll(self):
+        for writer, reader in self.pairs:
+            self.poll_set.register(reader, io.PR_POLL_READ)
+        self.assertEqual(len(self.poll_set), len(self.pairs))
+        self.assertEqual(self.poll_set.poll(io.PR_INTERVAL_NO_WAIT), [])
+
+        for writer, reader in self.pairs[::3]:
+            writer.send(b'x')
+        ready = self.poll_set.poll(io.PR_INTERVAL_NO_WAIT)
+        self.assertEqual(
+            [sock for sock, flags in ready],
+            [reader for writer, reader in self.pairs[::3]],
+        )
+        self.assertTrue(all(flags & io.PR_POLL_READ for sock, flags in ready))
+
+        # Unregistering fills the hole with the last socket.
+        for writer, reader in self.pairs[::2]:
+            self.poll_set.unregister(reader)
+            self.assertNotIn(reader, self.poll_set)
+        ready = self.poll_set.poll(io.PR_INTERVAL_NO_WAIT)
+        self.assertEqual(
+            set(sock for sock, flags in ready),
+            set(reader for writer, reader in self.pairs[3::6]),
+        )
+
+        writer, reader = self.pairs[1]
+        self.poll_set.modify(reader, io.PR_POLL_WRITE)
+        self.assertIn(
+            (reader, io.PR_POLL_WRITE),
+            self.poll_set.poll(io.PR_INTERVAL_NO_WAIT),
+        )
+
+        with self.assertRaises(ValueError):
+            self.poll_set.register(reader)
+        with self.assertRaises(ValueError):
+            self.poll_set.unregister(self.pairs[0][1])
+        with self.assertRaises(TypeError):
+            self.poll_set.register(object())
+
+    def test_wakeup(self):
+        writer, reader = self.pairs[0]
+        self.poll_set.register(reader, io.PR_POLL_READ)
+
+        timer = threading.Timer(0.1, self.poll_set.wakeup)
+        timer.start()
+        self.assertEqual(self.poll_set.poll(), [])
+        timer.join()
+
+    def test_closed(self):
+        writer, reader = self.pairs[0]
+        self.poll_set.register(writer, io.PR_POLL_READ)
+        writer.close()
+        self.assertEqual(self.poll_set.poll(), [(writer, io.PR_POLL_NVAL)])
+
+
+if __name__ == '__main__':
+    unittest.main()